@@ -1,17 +1,43 @@
-from src.lib_tool import lib
 from argparse import ArgumentParser
+from importlib import import_module
+
+# subcommand -> (module, class), a module is imported only when its subcommand runs
+# cold start time of each one is tracked by src/startup_benchmark.py
+COMMANDS = {
+    'calc': ('src.calc_wallet', 'calculateWalletValue'),
+    'report': ('src.report_wallet', 'walletBalanceReport'),
+    'singleCrypto': ('src.report_crypto', 'cryptoBalanceReport'),
+    'backtest': ('src.backtest', 'rebalanceBacktest'),
+    'sweep': ('src.backtest_sweep', 'rebalanceSweep'),
+    'daemon': ('src.valuation_daemon', 'valuationDaemon'),
+    'serve': ('src.valuation_api', 'valuationServer'),
+    'compact': ('src.history_store', 'historyCompactor'),
+}
+
+# import the class of a subcommand
+def loadCommand(name: str):
+    module, attr = COMMANDS[name]
+    return getattr(import_module(module), attr)
 
 # parse arguments
-def get_args(): 
+def get_args():
     parser = ArgumentParser()
     parser.add_argument('--crypto', dest='crypto', action="store_true", help='view balance of crypto assets')
     parser.add_argument('--total', dest='total',action="store_true", help='view balance of fiat vs crypto assets')
     parser.add_argument('--calc', dest='calc',action="store_true", help='calculate wallet value')
     parser.add_argument('--report', dest='report',action="store_true", help='view wallet value over time')
     parser.add_argument('--privacy', dest='privacy', action='store_true', help='obscure total value when used combined with --calc')
+    parser.add_argument('--headless', dest='headless', action='store_true', help='do not open the pie chart when used combined with --calc, the image is saved in background if save_img is enabled')
     parser.add_argument('--load', dest='load', action='store_true', help='load one past date and view it')
     parser.add_argument('--singleCrypto', dest='singleCrypto', action='store_true', help='view balance of a crypto over time')
     parser.add_argument('--version', dest='version', action='store_true', help='')
+    parser.add_argument('--backtest', dest='backtest', action='store_true', help='replay walletValue.json history through the kucoin rebalancer')
+    parser.add_argument('--sweep', dest='sweep', action='store_true', help='backtest every portfolio_pct*.json profile with every sweep_min_rebalance in settings.json, using all cores')
+    parser.add_argument('--daemon', dest='daemon', action='store_true', help='keep running and calculate wallet value every daemon_interval seconds in settings.json, combined with --total or --crypto (default)')
+    parser.add_argument('--interval', dest='interval', type=float, default=None, help='override daemon_interval of settings.json when used combined with --daemon')
+    parser.add_argument('--serve', dest='serve', action='store_true', help='serve valuations, history and rebalance plans as json on api_port in settings.json, combined with --total or --crypto (default)')
+    parser.add_argument('--compact', dest='compact', action='store_true', help='rewrite walletValue.json and report.json with one record per line in chronological order, while nothing else is using them')
+    parser.add_argument('--min-rebalance', dest='min_rebalance', type=float, default=None, help='override min_rebalance of portfolio_pct.json when used combined with --backtest')
     parser.add_argument(
         '--rebalance-mode',
         dest='rebalance_mode',
@@ -22,50 +48,42 @@ def get_args():
     option = parser.parse_args()
     return option
 
-if __name__ == '__main__':
-    option = get_args()
-    run = False
-    rebalance_mode_arg = option.rebalance_mode
-
+# map arguments to (subcommand, args, kwargs), None if there is nothing to run
+def get_command(option):
     if option.calc:
-        from src.calc_wallet import calculateWalletValue
+        kwargs = {'privacy': option.privacy, 'rebalance_mode_override': option.rebalance_mode, 'headless': option.headless}
         if option.load:
-            if option.privacy: 
-                main = calculateWalletValue('crypto', privacy=True, load=True, rebalance_mode_override=rebalance_mode_arg)
-                run = True
-            else:
-                main = calculateWalletValue('crypto', privacy=False, load=True, rebalance_mode_override=rebalance_mode_arg)
-                run = True
-
+            return 'calc', ('crypto',), {'load': True, **kwargs}
         elif option.crypto:
-            if option.privacy:
-                main = calculateWalletValue('crypto', privacy=True, load=False, rebalance_mode_override=rebalance_mode_arg)
-                run = True
-            else:
-                main = calculateWalletValue('crypto', privacy=False, load=False, rebalance_mode_override=rebalance_mode_arg)
-                run = True
+            return 'calc', ('crypto',), {'load': False, **kwargs}
         elif option.total:
-            if option.privacy:
-                main = calculateWalletValue('total', privacy=True, load=False, rebalance_mode_override=rebalance_mode_arg)
-                run = True
-            else:
-                main = calculateWalletValue('total', privacy=False, load=False, rebalance_mode_override=rebalance_mode_arg)
-                run = True
-
+            return 'calc', ('total',), {'load': False, **kwargs}
     elif option.report:
         if option.crypto:
-            from src.report_wallet import walletBalanceReport
-            main = walletBalanceReport('crypto')
-            run = True
+            return 'report', ('crypto',), {}
         elif option.total:
-            from src.report_wallet import walletBalanceReport
-            main = walletBalanceReport('total')
-            run = True
+            return 'report', ('total',), {}
         elif option.singleCrypto:
-            from src.report_crypto import cryptoBalanceReport
-            main = cryptoBalanceReport()
-            run = True
+            return 'singleCrypto', (), {}
+    elif option.backtest:
+        return 'backtest', (), {'min_rebalance': option.min_rebalance}
+    elif option.sweep:
+        return 'sweep', (), {}
+    elif option.daemon:
+        return 'daemon', ('total' if option.total else 'crypto',), {'interval': option.interval}
+    elif option.serve:
+        return 'serve', ('total' if option.total else 'crypto',), {}
+    elif option.compact:
+        return 'compact', (), {}
+    return None
+
+if __name__ == '__main__':
+    option = get_args()
+    command = get_command(option)
+    if command is not None:
+        name, args, kwargs = command
+        main = loadCommand(name)(*args, **kwargs)
+        main.run()
     elif option.version:
-        print(lib.getConfig()['version'])
-    if run:
-        main.run()
\ No newline at end of file
+        from src.lib_tool import lib
+        print(lib.getConfig()['version'])
\ No newline at end of file
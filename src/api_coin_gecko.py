@@ -1,16 +1,22 @@
 try:
     from src.lib_tool import lib
+    from src.lib_http import httpClient, getHttpClient
 except:
     from lib_tool import lib
+    from lib_http import httpClient, getHttpClient
 from typing import Any
-from time import sleep
-from requests import get, Response
+from requests import Response
+from requests.exceptions import RequestException
 from json import dumps, loads
 from os import getcwd
-from os.path import join
+from os.path import join, exists, getmtime
 
 class cg_api_n():
-    def __init__(self, currency: str) -> None:
+    # symbol -> [ids] index, loaded once per process and shared by every instance
+    # key: index file path, value: {symbol: [id, ...]}
+    symbol_index: dict[str, dict[str, list[str]]] = dict()
+
+    def __init__(self, currency: str, http: httpClient | None = None) -> None:
         """Initialize CoinGecko API wrapper.
         
         Sets up cache files and loads symbol mappings. CoinGecko uses its own IDs 
@@ -19,12 +25,14 @@ class cg_api_n():
         
         Args:
             currency (str): Currency for price quotes (e.g., 'usd', 'eur')
+            http (httpClient | None, optional): Transport to use. Defaults to the shared one, see getHttpClient().
             
         Raises:
             SystemExit: If cache files cannot be created or accessed
         """
         self.currency = currency.lower()
         self.baseurl = 'https://api.coingecko.com/api/v3/'
+        self.http = http if http is not None else getHttpClient()
 
         # create cache file
         files = lib.createCacheFile()
@@ -33,6 +41,7 @@ class cg_api_n():
         cwd = getcwd()
         self.cacheFile = join(cwd, 'cache', 'cached_id_CG.json')
         self.all_id_path = join(cwd, 'cache', 'all_id_CG.json')
+        self.index_path = join(cwd, 'cache', 'index_id_CG.pickle') # precomputed symbol -> [ids], see buildSymbolIndex
         cg_cache = lib.loadJsonFile(self.cacheFile)
         self.fixedSymbol = cg_cache['fixed']
         self.usedSymbol = cg_cache['used']
@@ -55,16 +64,62 @@ class cg_api_n():
         Saves results to the all_id_CG.json cache file.
         """
         path = 'coins/list'
-        coin = get(self.baseurl+path).json()
+        coin = self.http.get(self.baseurl+path, provider='cg').json()
 
         with open(self.all_id_path, 'w') as f:
-            f.write(dumps(coin, indent=4))
+            f.write(dumps(coin))
+        if isinstance(coin, list): # skip error responses, e.g. rate limit
+            self.buildSymbolIndex(coin)
         lib.printOk('Coin list successfully fetched and saved')
 
+    def buildSymbolIndex(self, coin: list[dict]) -> dict[str, list[str]]:
+        """Build the symbol -> [ids] index from coins/list and save it next to all_id_CG.json.
+        
+        Args:
+            coin (list[dict]): coins/list response [{'id': .., 'symbol': .., 'name': ..}, ...]
+            
+        Returns:
+            dict[str, list[str]]: symbol -> ids, in the same order of coins/list
+        """
+        index = dict()
+        for crypto in coin:
+            index.setdefault(crypto['symbol'], []).append(crypto['id'])
+        lib.dumpPickleFile(self.index_path, index)
+        cg_api_n.symbol_index[self.index_path] = index
+        return index
+
+    def getSymbolIndex(self) -> dict[str, list[str]]:
+        """Return the symbol -> [ids] index, loading it once per process.
+        
+        The index is rebuilt from all_id_CG.json if missing or older than it.
+        
+        Returns:
+            dict[str, list[str]]: symbol -> ids
+        """
+        if self.index_path in cg_api_n.symbol_index:
+            return cg_api_n.symbol_index[self.index_path]
+
+        if exists(self.index_path) and getmtime(self.index_path) >= getmtime(self.all_id_path):
+            index = lib.loadPickleFile(self.index_path)
+            if isinstance(index, dict):
+                cg_api_n.symbol_index[self.index_path] = index
+                return index
+
+        while True:
+            with open(self.all_id_path, 'r') as f:
+                filedata = loads(f.read())
+                
+            # Check for rate limit error in the file
+            if 'status' in filedata and filedata['status'].get('error_code') == 429:
+                lib.printWarn('Rate limit error in cached data, fetching it again')
+                self.fetchID()  # Refetch the data, waiting for the rate limiter
+                continue
+            return self.buildSymbolIndex(filedata)
+
     def convertSymbol2ID(self, find: list[str]) -> tuple[dict[str, str], set]:
         """Convert crypto tickers to CoinGecko IDs.
         
-        Checks cached mappings first, then searches all_id_CG.json for matches.
+        Checks cached mappings first, then looks up the symbol -> [ids] index built from all_id_CG.json.
         Handles cases where multiple IDs exist for a symbol using fixed mappings.
         Updates used symbols cache after conversion.
         
@@ -88,28 +143,12 @@ class cg_api_n():
                 res[crypto] = self.usedSymbol[crypto]
                 find.pop(find.index(crypto))
 
-        # retrieve all possible id from all_id_CG.json file
+        # retrieve all possible id from the symbol -> [ids] index
         temp = dict()
-        while True:
-            with open(self.all_id_path, 'r') as f:
-                filedata = loads(f.read())
-                
-                # Check for rate limit error in the file
-                if 'status' in filedata and filedata['status'].get('error_code') == 429:
-                    lib.printWarn('Rate limit error in cached data, retrying after 60 seconds')
-                    sleep(60)
-                    self.fetchID()  # Refetch the data
-                    continue
-                    
-                # If no error, process the data
-                for crypto in filedata:
-                    if crypto['symbol'] in find:
-                        # add if new, append if other possible valid id were found 
-                        if crypto['symbol'] not in temp.keys():
-                            temp[crypto['symbol']] = [crypto['id']]
-                        else:
-                            temp[crypto['symbol']].append(crypto['id'])
-                break  # Exit the loop if data processing is successful
+        index = self.getSymbolIndex()
+        for crypto in find:
+            if crypto in index:
+                temp[crypto] = list(index[crypto])
 
         # extract correct id using cached_id_CG.json['fixed'], otherwise print error
         err_count = 0
@@ -221,8 +260,9 @@ class cg_api_n():
     def makeRequest(self, url: str, param: dict[str, Any]) -> Response:
         """Make HTTP request to CoinGecko API with retry logic.
         
-        Handles various error cases including rate limits and server errors.
-        Implements exponential backoff for retries.
+        Requests wait for the CoinGecko rate limiter (rate_limits in settings.json),
+        rate limits and server errors are retried with jittered exponential backoff,
+        honouring Retry-After, see httpClient.request().
         
         Args:
             url (str): API endpoint URL
@@ -231,33 +271,16 @@ class cg_api_n():
         Returns:
             Response: API response object
             
-        Note:
-            Will retry indefinitely on errors, with warnings after 5 failures
+        Raises:
+            SystemExit: If no successful response is received before http_deadline
         """
-        error_count = 0
-        sleep_time = 0
-        msg = ''
-
-        while True:
-            res = get(url=url, params=param)
-            if res.status_code == 200: # all good
-                return res
-
-            elif res.status_code == 429: # rate limit
-                sleep_time = 110
-                error_count +=1
-                msg = 'you have been rate limited'
-
-            elif str(res.status_code)[0] == '5': # server errors
-                error_count +=1
-                sleep_time = 20
-                msg = 'server error'
-
-            else: # all other possible errors
-                error_count +=1
-                sleep_time = 30
+        try:
+            res = self.http.get(url, provider='cg', params=param)
+        except RequestException as e:
+            lib.printFail(f'CoinGecko api may be down, please visit https://status.coingecko.com/ error: {e}')
+            exit()
 
-            if error_count > 5:
-                lib.printFail("CoinGecko api may be down, please visit https://status.coingecko.com/")
-            lib.printWarn(f'Error {res.status_code}, {msg}{", " if msg != "" else ""}retrying after {sleep_time} seconds')
-            sleep(sleep_time)
\ No newline at end of file
+        if res.status_code != 200:
+            lib.printFail(f'CoinGecko error {res.status_code}, please visit https://status.coingecko.com/')
+            exit()
+        return res
\ No newline at end of file
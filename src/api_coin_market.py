@@ -1,20 +1,23 @@
 try:
     from src.lib_tool import lib
+    from src.lib_http import httpClient, getHttpClient
 except:
     from lib_tool import lib
-from time import sleep
+    from lib_http import httpClient, getHttpClient
 from json import dumps, loads
-from requests import Session
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
-from random import randrange
-from os.path import join
+from requests.exceptions import ConnectionError, Timeout, TooManyRedirects, RequestException
+from os.path import join, exists, getmtime
 from os import getcwd
 
 #
 # CoinMarketCap Api
 #
 class cmc_api:
-    def __init__(self, currency: str, api_key: str) -> None:
+    # symbol -> id index, loaded once per process and shared by every instance
+    # key: index file path, value: {symbol: id}
+    symbol_index: dict[str, dict[str, str]] = dict()
+
+    def __init__(self, currency: str, api_key: str, http: httpClient | None = None) -> None:
         if len(api_key) == 0:
             lib.printFail('CMC API error, no api key provided')
             exit()        
@@ -24,19 +27,18 @@ class cmc_api:
         cwd = getcwd()
         self.cacheFile = join(cwd, 'cache', 'cached_id_CMC.json')
         self.all_id_path = join(cwd, 'cache', 'all_id_CMC.json')
+        self.index_path = join(cwd, 'cache', 'index_id_CMC.pickle') # precomputed symbol -> id, see buildSymbolIndex
         # create cache file
         files = lib.createCacheFile()
         if not files: exit()
         self.cachedSymbol = lib.loadJsonFile(self.cacheFile)    
         
-        headers = { 
+        # sent with every request, the session of self.http is shared with other providers
+        self.headers = { 
             'Accepts': 'application/json',
-            'Accept-Encoding': 'deflate, gzip',
             'X-CMC_PRO_API_KEY': self.key,
         }
-
-        self.session = Session()
-        self.session.headers.update(headers)
+        self.http = http if http is not None else getHttpClient()
 
         if not self.isKeyValid():
             lib.printFail('CMC API error, api key provided is not valid')
@@ -63,49 +65,73 @@ class cmc_api:
             return False
 
         path = 'key/info'
-        while True:
-            res = self.session.get(self.baseurl+path)
-            if res.status_code == 200:
-                return True
-            elif res.status_code == 429:
-                lib.printWarn('You have been rate limited, sleeping for 60 second')
-                sleep(60)
-            elif res.status_code == 500:
-                x = randrange(range(50,160))
-                lib.printWarn(f'Server error, sleeping for {x}')
-                sleep(x)
-            else: # all others status code means that key is not valid
-                return False
+        # rate limits and server errors are retried, see httpClient.request()
+        try:
+            res = self.http.get(self.baseurl+path, provider='cmc', headers=self.headers)
+        except RequestException:
+            return False
+        # all others status code means that key is not valid
+        return res.status_code == 200
 
     # fetch all id, symbol and name from CMC, run only once in a while to update it
     def fetchID(self) -> int:
         url = 'cryptocurrency/map'
-        res = self.session.get(self.baseurl+url) # add error handling TODO
-        open(self.all_id_path, 'w').write(dumps(res.json(), indent=4))
+        res = self.http.get(self.baseurl+url, provider='cmc', headers=self.headers) # add error handling TODO
+        data = res.json()
+        with open(self.all_id_path, 'w') as f:
+            f.write(dumps(data))
+        if 'data' in data:
+            self.buildSymbolIndex(data['data'])
         lib.printOk('Coin list successfully fetched and saved')
 
+    # build symbol -> id index from cryptocurrency/map and save it next to all_id_CMC.json
+    # if a symbol has more than one id, the first one is kept
+    # @param data list of dict eg. [{"id": 1, "symbol": "BTC", ...}, ]
+    # @return dict eg. {"BTC": "1", }
+    def buildSymbolIndex(self, data: list) -> dict:
+        index = {}
+        for crypto in data:
+            index.setdefault(crypto['symbol'], str(crypto['id']))
+        lib.dumpPickleFile(self.index_path, index)
+        cmc_api.symbol_index[self.index_path] = index
+        return index
+
+    # return symbol -> id index, loaded once per process
+    # rebuilt from all_id_CMC.json if missing or older than it
+    def getSymbolIndex(self) -> dict:
+        if self.index_path in cmc_api.symbol_index:
+            return cmc_api.symbol_index[self.index_path]
+
+        if exists(self.index_path) and getmtime(self.index_path) >= getmtime(self.all_id_path):
+            index = lib.loadPickleFile(self.index_path)
+            if isinstance(index, dict):
+                cmc_api.symbol_index[self.index_path] = index
+                return index
+
+        data = lib.loadJsonFile(self.all_id_path)['data'] # once in a while run fetchID() to update it
+        return self.buildSymbolIndex(data)
+
     # convert 'symbols' in CMC ids
     # @param symbols list of crypto tickers ["BTC", "ETH"]
     # @return dict eg. {"BTC": "1", }
     def convertSymbols2ID(self, symbols: list) -> dict:
         id = {}
+        missing = []
 
         # check if there are some cached symbol
-        for i, symb in enumerate(symbols):
+        for symb in symbols:
             if symb in self.cachedSymbol:
                 id[symb] = self.cachedSymbol[symb]
-                symbols.pop(i) # remove from searching list
+            else: missing.append(symb)
 
-        if len(symbols) > 0: 
+        if len(missing) > 0: 
             found = 0
-            data = loads(open(self.all_id_path, 'r').read())['data'] # once in a while run fetchID() to update it
+            index = self.getSymbolIndex()
 
-            # check for every symbol in data
-            for i in range(len(data)):
-                if data[i]['symbol'] in symbols:
-                    id[data[i]['symbol']] = str(data[i]['id'])
+            for symb in missing:
+                if symb in index:
+                    id[symb] = index[symb]
                     found +=1
-                    symbols.pop(symbols.index(data[i]['symbol']))
 
             if found > 0:
                 self.cachedSymbol.update(id)
@@ -136,7 +162,7 @@ class cmc_api:
         }
 
         try:
-            response = self.session.get(self.baseurl+path, params=parameters)
+            response = self.http.get(self.baseurl+path, provider='cmc', params=parameters, headers=self.headers)
             data = loads(response.text)
             for symb, id in convertedSymbol.items():
                 toReturn[symb] = data['data'][id]["quote"][self.currency]["price"] # store only price
@@ -1,21 +1,58 @@
 try:
     from src.lib_tool import lib
+    from src.lib_http import httpClient, getHttpClient
 except:
     from lib_tool import lib
+    from lib_http import httpClient, getHttpClient
 from time import time
-from requests import get, post
 from json import dumps, loads
 from base64 import b64encode
 from hashlib import sha256
 from time import time
 from hmac import new
-from pandas import DataFrame
+from pandas import DataFrame, read_feather, read_pickle, to_numeric
 from kucoin.client import Trade, User
 from os.path import join
-from os import getcwd
+from os import getcwd, replace
+from importlib.util import find_spec
+
+# kucoin symbols are cached as feather if pyarrow is installed (optional, not in requirements.txt), otherwise as pickle
+KC_SYMBOL_FORMAT = 'feather' if find_spec('pyarrow') is not None else 'pickle'
+# fields of /api/v2/symbols sent as numeric strings and used by the rebalancer, see kucoinAutoBalance.buildPairIndex()
+KC_SYMBOL_NUMERIC = ['baseMinSize', 'baseIncrement', 'quoteIncrement', 'priceIncrement']
+
+def parseSymbols(data: list[dict]) -> DataFrame:
+    """Kucoin symbols as a DataFrame, numeric strings of KC_SYMBOL_NUMERIC converted to numbers.
+
+    Args:
+        data (list[dict]): 'data' of the /api/v2/symbols response
+    """
+    df = DataFrame.from_records(data, 
+        exclude=['market', 'quoteMinSize', 'name',
+                'baseMaxSize', 'quoteMaxSize',
+                'priceLimitRate', 'isMarginEnabled'])
+    for column in KC_SYMBOL_NUMERIC:
+        if column in df.columns:
+            df[column] = to_numeric(df[column])
+    return df
+
+def dumpSymbols(df: DataFrame, path: str, format_: str = KC_SYMBOL_FORMAT) -> None:
+    """Save symbols atomically, format_ is 'feather' or 'pickle'."""
+    temp_path = f'{path}.tmp'
+    if format_ == 'feather':
+        df.reset_index(drop=True).to_feather(temp_path)
+    else:
+        df.to_pickle(temp_path)
+    replace(temp_path, path)
+
+def readSymbols(path: str, format_: str = KC_SYMBOL_FORMAT) -> DataFrame:
+    """Load symbols saved by dumpSymbols()."""
+    if format_ == 'feather':
+        return read_feather(path)
+    return read_pickle(path)
 
 class kc_api:
-    def __init__(self, currency: str) -> None:
+    def __init__(self, currency: str, http: httpClient | None = None, base_url: str = '') -> None:
         """Initialize Kucoin API wrapper with authentication and configuration.
         
         Loads API credentials from kc_info.json and initializes Trade and User clients.
@@ -23,6 +60,8 @@ class kc_api:
         
         Args:
             currency (str): Base currency for price quotes (e.g., 'USD', 'EUR')
+            http (httpClient | None, optional): Transport to use. Defaults to the shared one, see getHttpClient().
+            base_url (str, optional): Kucoin API url, e.g. a local kucoinSimulator. Defaults to https://api.kucoin.com.
             
         Attributes:
             error (bool): True if initialization failed (e.g., missing API credentials)
@@ -33,12 +72,14 @@ class kc_api:
         self.api_secret: str = self.kc_info['secret']
         self.api_passphrase: str = self.kc_info['passphrase']
         self.symbol_blacklist: list[str] = self.kc_info['symbol_blacklist']
-        self.base = 'https://api.kucoin.com'
+        self.base = base_url.rstrip('/') if base_url != '' else 'https://api.kucoin.com'
+        self.symbol_path = join(getcwd(), 'cache', f'kucoin_symbol.{KC_SYMBOL_FORMAT}') # see getSymbols()
+        self.http = http if http is not None else getHttpClient()
         self.error = False
         self.currency = currency.upper()
         # KC client to make orders
-        self.client = Trade(key=self.api_key, secret=self.api_secret, passphrase=self.api_passphrase, is_sandbox=False, url='')
-        self.user = User(key=self.api_key, secret=self.api_secret, passphrase=self.api_passphrase, is_sandbox=False, url='')
+        self.client = Trade(key=self.api_key, secret=self.api_secret, passphrase=self.api_passphrase, is_sandbox=False, url=self.base)
+        self.user = User(key=self.api_key, secret=self.api_secret, passphrase=self.api_passphrase, is_sandbox=False, url=self.base)
         # self.kcMarket = Market(key=self.api_key, secret=self.api_secret, passphrase=self.api_passphrase, is_sandbox=False, url='')
 
         checklist = [len(x.replace(' ', ''))>0 for x in [self.api_key, self.api_passphrase, self.api_secret] ]
@@ -54,7 +95,7 @@ class kc_api:
         """
         endpoint = '/api/v1/timestamp'
         url = self.base + endpoint
-        res = get(url)
+        res = self.http.get(url, provider='kc')
         body = loads(res)
 
         if res.status_code == 200 and body['code'] == '200000': return True
@@ -117,8 +158,8 @@ class kc_api:
         
         endpoint = '/api/v1/accounts'
         url = self.base+endpoint
-        now = int(time() * 1000)
-        res = get(url, headers=self.__getHeader(endpoint, now))
+        # signed at every attempt, kucoin rejects a timestamp a few seconds old
+        res = self.http.get(url, provider='kc', sign=lambda: self.__getHeader(endpoint, int(time() * 1000)))
         body = loads(res.text) # load response body data
         try:
             if res.status_code == 200 or body['code'] != '200000':
@@ -153,7 +194,8 @@ class kc_api:
     def getSymbols(self):
         """Retrieve all tradable pairs from Kucoin.
         
-        Downloads and saves trading pair information to cache/kucoin_symbol.csv.
+        Downloads and saves trading pair information to cache/kucoin_symbol.feather
+        (cache/kucoin_symbol.pickle if pyarrow is not installed), see loadSymbols().
         
         Returns:
             bool: True if successful, False if error occurred
@@ -161,29 +203,31 @@ class kc_api:
         endpoint = '/api/v2/symbols'
         url = self.base + endpoint
         
-        res = get(url)
+        res = self.http.get(url, provider='kc')
         body = loads(res.text)
 
         if res.status_code == 200 and body['code'] == '200000':
-            data = body['data']
-            df = DataFrame.from_records(data, 
-                exclude=['market', 'quoteMinSize', 'name',
-                        'baseMaxSize', 'quoteMaxSize',
-                        'priceIncrement', 'priceLimitRate', 'isMarginEnabled'])
-            
-            df.to_csv(join(getcwd(), 'cache', 'kucoin_symbol.csv'), sep=',', index=False)
+            dumpSymbols(parseSymbols(body['data']), self.symbol_path)
             return True
         
         lib.printFail(f'Kucoin: unable to download symbols error: {body["msg"]}')
         return False
 
+    def loadSymbols(self) -> DataFrame:
+        """Load trading pairs saved by getSymbols().
+        
+        Returns:
+            DataFrame: Kucoin symbols
+        """
+        return readSymbols(self.symbol_path)
+
     def getFiatPrice(self, numerator_assets: list[str], currency: str = '', include_currency: bool = False) -> dict[str, float]:
         """Get Kucoin's prices for specified assets.
         
         Note: Should not be used as price oracle like CoinGecko, as prices are specific to Kucoin markets.
         
         Args:
-            numerator_assets (list[str]): List of assets to get prices for (e.g., ['btc', 'eth'])
+            numerator_assets (list[str]): List of assets to get prices for (e.g., ['btc', 'eth']), empty for every asset
             currency (str, optional): Override default currency. Defaults to self.currency.
             include_currency (bool, optional): Include currency in response. Defaults to False.
             
@@ -199,13 +243,13 @@ class kc_api:
             'base': currency if currency != '' else self.currency # BASE refer to the asset at denominator 1/3 <-
         }
 
-        res = get(url, params=param)
+        res = self.http.get(url, provider='kc', params=param)
         body = loads(res.text)
         
         if res.status_code == 200 and body['code'] == '200000':
             data: dict = body['data']
 
-            if len(data) != len(numerator_assets) and len(data) > 0:
+            if len(data) != len(numerator_assets) and len(data) > 0 and len(numerator_assets) > 0:
                 # NOT all fine, NOT all good broda
                 missing = list(set(numerator_assets)-set(data.keys()))
                 lib.printFail(f'Kucoin: unable to retrieve all fiat prices, missing: [{len(missing)}] {missing}')
@@ -237,7 +281,7 @@ class kc_api:
         endpoint = '/api/v1/market/stats'
         url = self.base + endpoint
         param = {'symbol': symbol}
-        res = get(url, params=param)
+        res = self.http.get(url, provider='kc', params=param)
         body = loads(res.text)
 
         if res.status_code == 200 and body['code'] == '200000':
@@ -301,11 +345,10 @@ class kc_api:
 
         if self.error:
             return False
-        now = int(time() * 1000)
         endpoint = f'/api/v1/orders?currentPage=1' # 
         url = self.base+endpoint
 
-        res = get(url, headers=self.__getHeader(endpoint, now)) # open('test_kc_api.json', 'w').write(json.dumps(json.loads(res.text), indent=4))
+        res = self.http.get(url, provider='kc', sign=lambda: self.__getHeader(endpoint, int(time() * 1000))) # open('test_kc_api.json', 'w').write(json.dumps(json.loads(res.text), indent=4))
 
         orders = DataFrame({
             'id': [],
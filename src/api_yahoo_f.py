@@ -3,7 +3,13 @@ try:
 except:
     from lib_tool import lib
 from pandas_datareader import _utils
+from pandas import DataFrame
 from yfinance import download, Ticker
+from datetime import datetime, timedelta
+from bisect import bisect_right
+from json import dumps
+from os import getcwd, makedirs
+from os.path import join, exists
 
 def yahooGetPriceOf(symbol: str):
     """Retrieve current price of a financial symbol from Yahoo Finance.
@@ -29,6 +35,40 @@ def yahooGetPriceOf(symbol: str):
         lib.printFail(f'Error getting price of {symbol}')
         return False
 
+def yahooGetPricesOf(symbols: list[str]) -> dict[str, float]:
+    """Retrieve current prices of multiple financial symbols from Yahoo Finance in one request.
+    
+    Same as yahooGetPriceOf, but every symbol is downloaded by a single yfinance call.
+    
+    Args:
+        symbols (list[str]): Yahoo Finance symbols (e.g., ["EURUSD=X", "EURGBP=X"])
+        
+    Returns:
+        dict[str, float]: symbol -> most recent closing price, False if symbol cannot be found
+        
+    Example:
+        >>> yahooGetPricesOf(["EURUSD=X", "EURGBP=X"])
+        {'EURUSD=X': 1.0876, 'EURGBP=X': 0.8571}
+    """
+    if len(symbols) == 0:
+        return {}
+    prices = dict()
+    try:
+        close = download(tickers = symbols, period ='1d', interval = '1m', progress=False)['Close']
+    except (_utils.RemoteDataError, KeyError):
+        close = None
+
+    for symbol in symbols:
+        try:
+            # single ticker downloads may return a Series instead of one column per ticker
+            serie = close[symbol] if isinstance(close, DataFrame) else close
+            prices[symbol] = float(serie.dropna().iloc[-1])
+        except (KeyError, IndexError, TypeError, AttributeError):
+            # if symbol cannot be found
+            lib.printFail(f'Error getting price of {symbol}')
+            prices[symbol] = False
+    return prices
+
 def getTicker(ticker: str, start: str, end: str) -> float:
     """Retrieve historical price data for a ticker within a date range.
     
@@ -52,3 +92,124 @@ def getTicker(ticker: str, start: str, end: str) -> float:
     else: 
         print('error')
         return 0
+
+class yahooFxCache:
+    """Historical daily forex rates from Yahoo Finance, memoized and persisted under cache/.
+
+    A whole daily series is downloaded in one request the first time a pair is needed
+    (from the requested date to today), saved in cache/fx_<FROM><TO>.json and
+    extended only when a date outside the cached period is requested.
+    Afterwards every conversion is a dictionary lookup.
+
+    Attributes:
+        rates (dict): key: (from, to), value: {'yyyy-mm-dd': rate}
+        covered (dict): key: (from, to), value: [first, last] 'yyyy-mm-dd' dates downloaded
+    """
+    DATE_FORMAT = '%Y-%m-%d'
+    MAX_QUOTE_AGE = 5 # days, covers weekends and holidays
+
+    def __init__(self) -> None:
+        self.cache_dir = join(getcwd(), 'cache')
+        self.rates: dict[tuple[str, str], dict[str, float]] = dict()
+        self.sorted_dates: dict[tuple[str, str], list[str]] = dict()
+        self.covered: dict[tuple[str, str], list[str]] = dict()
+        self.memo: dict[tuple[str, str, str], float] = dict() # key: (from, to, 'yyyy-mm-dd')
+        self.failed: set[tuple[str, str]] = set() # pairs not downloadable, do not retry on every record
+        self.stale: set[tuple[str, str]] = set() # pairs already warned about a missing recent quote
+
+    def getCachePath(self, from_: str, to: str) -> str:
+        """Return cache/fx_<FROM><TO>.json path."""
+        return join(self.cache_dir, f'fx_{from_}{to}.json')
+
+    def loadPair(self, from_: str, to: str) -> None:
+        """Load cached series of a pair from disk, once per process."""
+        pair = (from_, to)
+        if pair in self.rates: return
+        self.rates[pair] = dict()
+        self.covered[pair] = []
+        path = self.getCachePath(from_, to)
+        if exists(path):
+            cached = lib.loadJsonFile(path)
+            self.rates[pair] = cached['rates']
+            self.covered[pair] = cached['covered']
+        self.sorted_dates[pair] = sorted(self.rates[pair].keys())
+
+    def fetchPair(self, from_: str, to: str, start: datetime, end: datetime) -> bool:
+        """Download the daily series of a pair between start and end in one request, merge and persist it.
+
+        Returns:
+            bool: True if some rate has been downloaded
+        """
+        pair = (from_, to)
+        symbol = f'{from_}{to}=X'
+        try:
+            data = download(tickers=symbol, start=start.strftime(self.DATE_FORMAT), end=(end + timedelta(days=1)).strftime(self.DATE_FORMAT), interval='1d', progress=False)
+            close = data['Close']
+            if hasattr(close, 'columns'): close = close.iloc[:, 0] # multi ticker format
+            close = close.dropna()
+        except Exception as e:
+            lib.printFail(f'Error getting forex rates of {symbol}, {e}')
+            self.failed.add(pair)
+            return False
+        if len(close) == 0:
+            lib.printFail(f'Error getting forex rates of {symbol}')
+            self.failed.add(pair)
+            return False
+
+        for day, rate in close.items():
+            self.rates[pair][day.strftime(self.DATE_FORMAT)] = float(rate)
+        self.sorted_dates[pair] = sorted(self.rates[pair].keys())
+        first, last = start.strftime(self.DATE_FORMAT), end.strftime(self.DATE_FORMAT)
+        if len(self.covered[pair]) == 2:
+            first, last = min(first, self.covered[pair][0]), max(last, self.covered[pair][1])
+        self.covered[pair] = [first, last]
+
+        makedirs(self.cache_dir, exist_ok=True)
+        with open(self.getCachePath(from_, to), 'w') as f:
+            f.write(dumps({'covered': self.covered[pair], 'rates': self.rates[pair]}))
+        return True
+
+    def getRate(self, from_: str, to: str, date: datetime):
+        """Get the rate to convert 1 unit of from_ into to, on date.
+
+        Days without a quote (e.g. weekends) use the last previous quote,
+        if not older than MAX_QUOTE_AGE days (e.g. when the download of recent rates failed).
+
+        Args:
+            from_ (str): Currency to convert from (e.g. 'USD')
+            to (str): Currency to convert to (e.g. 'EUR')
+            date (datetime): Date of the conversion
+
+        Returns:
+            float: Rate
+            False: If rates cannot be retrieved
+        """
+        from_, to = from_.upper(), to.upper()
+        if from_ == to: return 1.0
+        day = date.strftime(self.DATE_FORMAT)
+        if (from_, to, day) in self.memo: return self.memo[(from_, to, day)]
+
+        pair = (from_, to)
+        self.loadPair(from_, to)
+        covered = self.covered[pair]
+        if pair not in self.failed and (len(covered) != 2 or day < covered[0] or day > covered[1]):
+            # download everything from date (a week before, to have a previous quote) up to today in one batch
+            start, end = date - timedelta(days=7), max(date, datetime.today())
+            if len(covered) == 2 and day > covered[1]: # only the days after the cached period
+                start = datetime.strptime(covered[1], self.DATE_FORMAT) - timedelta(days=7)
+            elif len(covered) == 2 and day < covered[0]: # only the days before the cached period
+                end = datetime.strptime(covered[0], self.DATE_FORMAT)
+            self.fetchPair(from_, to, start, end)
+
+        i = bisect_right(self.sorted_dates[pair], day)
+        if i == 0:
+            return False
+        quote_day = self.sorted_dates[pair][i-1]
+        if (date - datetime.strptime(quote_day, self.DATE_FORMAT)).days > self.MAX_QUOTE_AGE:
+            if pair not in self.stale:
+                self.stale.add(pair)
+                lib.printFail(f'No {from_}{to} rate within {self.MAX_QUOTE_AGE} days of {day}, last one is of {quote_day}')
+            return False
+        rate = self.rates[pair][quote_day]
+        self.memo[(from_, to, day)] = rate
+        return rate
@@ -0,0 +1,239 @@
+try:
+    from src.lib_tool import lib
+    from src.history_store import getHistoryStore
+    from src.rebalance_core import rebalanceCore
+except:
+    from lib_tool import lib
+    from history_store import getHistoryStore
+    from rebalance_core import rebalanceCore
+from pydantic import BaseModel
+from numpy import ndarray, array, full, zeros, nan, isnan, where, errstate
+from datetime import datetime
+from os.path import join, exists
+from typing import Iterable, Iterator
+
+#
+# Backtest of the Kucoin rebalancer over walletValue.json history
+# holdings of the first record are replayed through every later record:
+#   each asset is priced with the record's value / quantity (last known price if missing)
+#   orders are planned with the same drift and min_rebalance logic of kucoinAutoBalance.loadOrders(), see rebalanceCore
+#   sells and buys settle in cash, buys are funded by sells and stablecoins like calcBuyPower()
+# records are streamed from the history backend, one at a time
+#
+# fee model, backtest_fees in settings.json:
+#   taker     fraction of each order value, default kucoin_taker_fee or 0.001
+#   slippage  fraction of each order value, default 0
+#   fixed     wallet currency per order, default 0
+#
+
+class BacktestResult(BaseModel):
+    """Model for the outcome of a backtest"""
+    min_rebalance: float
+    records: int = 0
+    start_value: float = 0
+    end_value: float = 0
+    hold_value: float = 0           # end value without rebalancing
+    turnover: float = 0             # value traded, in wallet currency
+    trades: int = 0
+    fees: float = 0
+    equity: list[float] = []        # wallet value at each record, after rebalancing
+    dates: list[str] = []
+
+def simulateRebalance(symbols: list[str], qta: ndarray, rows: Iterable[ndarray], targets: dict[str, float], min_rebalance: float, fees: dict[str, float], excluded: Iterable[str] = (), dates: Iterable[str] | None = None) -> BacktestResult:
+    """Rebalance the holdings at each price row.
+
+    Module level so it can run in worker processes, see rebalanceSweep.
+
+    Args:
+        symbols (list[str]): Symbol index
+        qta (ndarray): Initial quantities, aligned to symbols
+        rows (Iterable[ndarray]): Prices of each record aligned to symbols, nan if missing
+        targets (dict[str, float]): Asset -> target percentage
+        min_rebalance (float): Minimum percentage of the wallet an order must move
+        fees (dict[str, float]): Fee model, see module header
+        excluded (Iterable[str], optional): Stablecoins and blacklisted assets. Defaults to ().
+        dates (Iterable[str] | None, optional): Date of each row, stored in the result if given. Defaults to None.
+
+    Returns:
+        BacktestResult: Equity curve, turnover, trades and fees
+    """
+    core = rebalanceCore({x: 0.0 for x in symbols}, {k: v for k, v in targets.items() if k in symbols}, 1, excluded)
+    stable = ~core.tradable
+    cost = fees['taker'] + fees['slippage']
+    fixed = fees['fixed']
+
+    qta = qta.astype(float)
+    hold_qta = qta.copy()
+    last = full(len(symbols), nan)
+    price = zeros(len(symbols))
+    cash = 0.0
+    records, trades, turnover, paid_fees, start_value = 0, 0, 0.0, 0.0, 0.0 # kept local, setting BacktestResult fields is slow
+    equity: list[float] = []
+    for row in rows:
+        last = where(isnan(row), last, row)
+        priced = ~isnan(last)
+        price = where(priced, last, 0)
+        values = qta * price
+        total = values.sum() + cash
+        records += 1
+        if records == 1: start_value = float(total)
+        if total <= 0:
+            equity.append(0.0)
+            continue
+
+        core.update(values, total)
+        drift = core.drift()
+        mask = core.orderMask(drift, min_rebalance) & priced & (drift != 0)
+        if not mask.any(): # most records, nothing to rebalance
+            equity.append(float(total))
+            continue
+        sells = where(mask & (drift < 0), -drift, 0)
+        buys = where(mask & (drift > 0), drift, 0)
+        sells = where(sells > values, values, sells) # can not sell more than held
+
+        # sells settle in cash, then buys are funded by cash and stablecoins
+        n_sells, n_buys = int((sells > 0).sum()), int((buys > 0).sum())
+        cash += sells.sum() * (1 - cost) - fixed * n_sells
+        with errstate(divide='ignore', invalid='ignore'):
+            qta = qta - where(price > 0, sells / price, 0)
+        stable_value = values[stable].sum()
+        need = buys.sum()
+        if need > 0 and need > cash + stable_value:
+            buys = buys * max(cash + stable_value, 0) / need
+        cash -= buys.sum()
+        if cash < 0 and stable_value > 0:
+            qta[stable] *= 1 + cash / stable_value # draw the rest from stablecoins
+            cash = 0.0
+        with errstate(divide='ignore', invalid='ignore'):
+            qta = qta + where((buys > 0) & (price > 0), (buys * (1 - cost) - fixed).clip(0) / price, 0)
+
+        traded = float(sells.sum() + buys.sum())
+        trades += n_sells + n_buys
+        turnover += traded
+        paid_fees += traded * cost + fixed * (n_sells + n_buys)
+        equity.append(float((qta * price).sum() + cash))
+
+    return BacktestResult(
+        min_rebalance=min_rebalance, records=records,
+        start_value=start_value,
+        end_value=equity[-1] if records > 0 else 0,
+        hold_value=float((hold_qta * price).sum()),
+        turnover=turnover, trades=trades, fees=paid_fees,
+        equity=equity, dates=list(dates) if dates is not None else []
+    )
+
+class rebalanceBacktest:
+    """Replay walletValue.json records through the rebalancer planning logic.
+
+    Attributes:
+        targets (dict[str, float]): Asset -> target percentage, portfolio_pct.json by default
+        min_rebalance (float): Minimum percentage of the wallet an order must move
+        fees (dict[str, float]): Fee model, see module header
+        excluded (set[str]): Stablecoins and blacklisted assets, never traded
+    """
+    DEFAULT_FEES = {'taker': 0.001, 'slippage': 0, 'fixed': 0}
+
+    def __init__(self, min_rebalance: float | None = None, targets: dict[str, float] | None = None, start: datetime | None = None, end: datetime | None = None) -> None:
+        """Load settings, targets and the history backend.
+
+        Args:
+            min_rebalance (float | None, optional): Override min_rebalance of portfolio_pct.json. Defaults to None.
+            targets (dict[str, float] | None, optional): Override targets of portfolio_pct.json. Defaults to None.
+            start (datetime | None, optional): First record to replay. Defaults to None.
+            end (datetime | None, optional): Last record to replay. Defaults to None.
+        """
+        self.settings = lib.getSettings()
+        self.store = getHistoryStore(self.settings, 'wallet')
+        self.start = start
+        self.end = end
+
+        portfolio_pct = lib.loadJsonFile('portfolio_pct.json') if targets is None or min_rebalance is None else {}
+        self.min_rebalance = min_rebalance if min_rebalance is not None else portfolio_pct['min_rebalance']
+        self.targets = targets if targets is not None else {k: v for k, v in portfolio_pct.items() if k != 'min_rebalance'}
+        self.fees = {**rebalanceBacktest.DEFAULT_FEES, 'taker': self.settings.get('kucoin_taker_fee', 0.001), **self.settings.get('backtest_fees', {})}
+
+        self.excluded = set(x.upper() for x in lib.getConfig()['supportedStablecoin'])
+        if exists('kc_info.json'):
+            self.excluded.update(x.upper() for x in lib.loadJsonFile('kc_info.json').get('symbol_blacklist', []))
+        self.output_path = join(self.settings['path'], 'backtest_equity.csv')
+
+    def iterSnapshots(self) -> Iterator[tuple[str, dict[str, float], dict[str, float]]]:
+        """Stream records as (date, symbol -> price, symbol -> quantity), assets with no quantity are skipped."""
+        for record in self.store.iterRecords(self.start, self.end):
+            prices, qta = dict(), dict()
+            for symbol, quantity, value in (item[:3] for item in record['crypto'][1:]):
+                if quantity > 0:
+                    prices[symbol.upper()] = value / quantity
+                    qta[symbol.upper()] = quantity
+            yield record['date'], prices, qta
+
+    def buildIndex(self, first_qta: dict[str, float]) -> list[str]:
+        """Symbol index of the backtest: assets held in the first record and target assets."""
+        return list(dict.fromkeys(list(self.targets) + list(first_qta)))
+
+    @staticmethod
+    def priceRow(symbols: list[str], prices: dict[str, float]) -> ndarray:
+        """Align prices to symbols, nan if missing."""
+        return array([prices.get(x, nan) for x in symbols], dtype=float)
+
+    def simulate(self, symbols: list[str], qta: ndarray, rows: Iterable[ndarray], dates: Iterable[str] | None = None, min_rebalance: float | None = None, targets: dict[str, float] | None = None) -> BacktestResult:
+        """Rebalance the holdings at each price row with this backtest's fees, see simulateRebalance().
+
+        Args:
+            symbols (list[str]): Symbol index
+            qta (ndarray): Initial quantities, aligned to symbols
+            rows (Iterable[ndarray]): Prices of each record aligned to symbols, nan if missing
+            dates (Iterable[str] | None, optional): Date of each row, stored in the result if given. Defaults to None.
+            min_rebalance (float | None, optional): Defaults to self.min_rebalance.
+            targets (dict[str, float] | None, optional): Defaults to self.targets.
+
+        Returns:
+            BacktestResult: Equity curve, turnover, trades and fees
+        """
+        return simulateRebalance(
+            symbols, qta, rows,
+            self.targets if targets is None else targets,
+            self.min_rebalance if min_rebalance is None else min_rebalance,
+            self.fees, self.excluded, dates
+        )
+
+    def saveEquity(self, result: BacktestResult) -> None:
+        """Write date, equity to self.output_path."""
+        with open(self.output_path, 'w') as f:
+            f.write('date,equity\n')
+            for date, value in zip(result.dates, result.equity):
+                f.write(f'{date},{round(value, 2)}\n')
+
+    def printResult(self, result: BacktestResult) -> None:
+        """Print value, trades, turnover and fees of result."""
+        currency = self.settings.get('currency', '')
+        lib.printWelcome(f'--- Backtest, min_rebalance {result.min_rebalance}% over {result.records} records ---')
+        lib.printWarn(f'start value:   {result.start_value:.2f} {currency}')
+        lib.printWarn(f'end value:     {result.end_value:.2f} {currency} (without rebalancing {result.hold_value:.2f} {currency})')
+        lib.printWarn(f'trades:        {result.trades}')
+        lib.printWarn(f'turnover:      {result.turnover:.2f} {currency}')
+        lib.printWarn(f'fees:          {result.fees:.2f} {currency}')
+
+    def run(self) -> BacktestResult:
+        """Stream walletValue.json records through simulate(), print the result and save the equity curve."""
+        snapshots = self.iterSnapshots()
+        first = next(snapshots, None)
+        if first is None:
+            lib.printFail('BACKTEST: no record found in walletValue.json')
+            return BacktestResult(min_rebalance=self.min_rebalance)
+
+        date, prices, qta = first
+        symbols = self.buildIndex(qta)
+        dates = [date]
+        def rows() -> Iterator[ndarray]:
+            yield self.priceRow(symbols, prices)
+            for date, prices_, _ in snapshots:
+                dates.append(date)
+                yield self.priceRow(symbols, prices_)
+
+        result = self.simulate(symbols, array([qta.get(x, 0) for x in symbols]), rows())
+        result.dates = dates
+        self.printResult(result)
+        self.saveEquity(result)
+        lib.printOk(f'Equity curve saved in {self.output_path}')
+        return result
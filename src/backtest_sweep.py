@@ -0,0 +1,126 @@
+try:
+    from src.lib_tool import lib
+    from src.backtest import rebalanceBacktest, simulateRebalance
+except:
+    from lib_tool import lib
+    from backtest import rebalanceBacktest, simulateRebalance
+from numpy import ndarray, array, load, float64
+from numpy.lib.format import open_memmap
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from os import getcwd, cpu_count
+from os.path import join, basename
+
+#
+# Parameter sweep of the rebalancer backtest, see rebalanceBacktest
+# every (portfolio profile, min_rebalance) scenario runs in a process pool:
+#   walletValue.json is parsed once into a (records, symbols) price matrix saved in cache/backtest_prices.npy
+#   workers memory-map it read-only, so the history is shared instead of copied into each process
+# results are ranked by end value and saved in backtest_sweep.csv inside path (settings.json)
+#
+
+DEFAULT_MIN_REBALANCE = [1, 2.5, 5, 7.5, 10]
+
+# set in each worker by initWorker()
+_prices: ndarray | None = None
+_symbols: list[str] = []
+_qta: ndarray | None = None
+
+def initWorker(prices_path: str, symbols: list[str], qta: ndarray) -> None:
+    """Memory-map the price matrix once per worker process."""
+    global _prices, _symbols, _qta
+    _prices = load(prices_path, mmap_mode='r')
+    _symbols = symbols
+    _qta = qta
+
+def runScenario(profile: str, targets: dict[str, float], min_rebalance: float, fees: dict[str, float], excluded: list[str]) -> dict:
+    """Backtest one scenario in a worker, see simulateRebalance().
+
+    Returns:
+        dict: Result without the equity curve, plus profile
+    """
+    result = simulateRebalance(_symbols, _qta, _prices, targets, min_rebalance, fees, excluded)
+    return {'profile': profile, **result.model_dump(exclude={'equity', 'dates'})}
+
+class rebalanceSweep:
+    """Backtest every combination of portfolio profiles and min_rebalance values in parallel.
+
+    Attributes:
+        profiles (dict[str, dict[str, float]]): Profile file name -> targets
+        min_rebalance (list[float]): Thresholds to test
+    """
+
+    def __init__(self, min_rebalance: list[float] | None = None, profiles: list[str] | None = None, workers: int | None = None) -> None:
+        """Load profiles and settings.
+
+        Args:
+            min_rebalance (list[float] | None, optional): Thresholds to test. Defaults to sweep_min_rebalance in settings.json or DEFAULT_MIN_REBALANCE.
+            profiles (list[str] | None, optional): Portfolio profile files. Defaults to portfolio_pct.json and every portfolio_pct_*.json.
+            workers (int | None, optional): Worker processes. Defaults to the number of cores.
+        """
+        self.backtest = rebalanceBacktest(min_rebalance=0, targets={})
+        self.settings = self.backtest.settings
+        self.min_rebalance = min_rebalance if min_rebalance is not None else self.settings.get('sweep_min_rebalance', DEFAULT_MIN_REBALANCE)
+        files = profiles if profiles is not None else ['portfolio_pct.json'] + sorted(glob('portfolio_pct_*.json'))
+        self.profiles = dict()
+        for file in files:
+            data = lib.loadJsonFile(file)
+            self.profiles[basename(file)] = {k: v for k, v in data.items() if k != 'min_rebalance'}
+        self.workers = workers if workers is not None else cpu_count()
+        self.prices_path = join(getcwd(), 'cache', 'backtest_prices.npy')
+        self.output_path = join(self.settings['path'], 'backtest_sweep.csv')
+
+    def buildPriceMatrix(self) -> tuple[list[str], ndarray, int]:
+        """Stream walletValue.json into cache/backtest_prices.npy.
+
+        Returns:
+            tuple[list[str], ndarray, int]: (symbol index, initial quantities, records)
+        """
+        count = self.backtest.store.getRecordCount()
+        snapshots = self.backtest.iterSnapshots()
+        first = next(snapshots, None)
+        if first is None or count == 0:
+            return [], array([]), 0
+        _, prices, qta = first
+        targets = [symbol for profile in self.profiles.values() for symbol in profile]
+        symbols = list(dict.fromkeys(targets + list(qta)))
+
+        # written row by row, the history is never loaded as a whole
+        matrix = open_memmap(self.prices_path, mode='w+', dtype=float64, shape=(count, len(symbols)))
+        matrix[0] = rebalanceBacktest.priceRow(symbols, prices)
+        for i, (_, prices, _) in enumerate(snapshots, start=1):
+            matrix[i] = rebalanceBacktest.priceRow(symbols, prices)
+        matrix.flush()
+        del matrix
+        return symbols, array([qta.get(x, 0) for x in symbols], dtype=float64), count
+
+    def run(self) -> list[dict]:
+        """Run every scenario, print the best ones and save the ranked table."""
+        symbols, qta, records = self.buildPriceMatrix()
+        if records == 0:
+            lib.printFail('SWEEP: no record found in walletValue.json')
+            return []
+
+        scenarios = [(profile, targets, m) for profile, targets in self.profiles.items() for m in self.min_rebalance]
+        lib.printWarn(f'SWEEP: {len(scenarios)} scenarios over {records} records, {self.workers} workers')
+        excluded = list(self.backtest.excluded)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=initWorker, initargs=(self.prices_path, symbols, qta)) as executor:
+            futures = [executor.submit(runScenario, profile, targets, m, self.backtest.fees, excluded) for profile, targets, m in scenarios]
+            results = [future.result() for future in futures]
+
+        results.sort(key=lambda item: item['end_value'], reverse=True)
+        self.saveResults(results)
+        currency = self.settings.get('currency', '')
+        lib.printWelcome('--- Sweep, best scenarios ---')
+        for rank, item in enumerate(results[:10], start=1):
+            lib.printWarn(f"{rank}. {item['profile']} min_rebalance {item['min_rebalance']}%: {item['end_value']:.2f} {currency}, {item['trades']} trades, fees {item['fees']:.2f} {currency}")
+        lib.printOk(f'Results saved in {self.output_path}')
+        return results
+
+    def saveResults(self, results: list[dict]) -> None:
+        """Write the ranked table to self.output_path."""
+        with open(self.output_path, 'w') as f:
+            f.write('rank,profile,min_rebalance,end_value,return_pct,hold_value,trades,turnover,fees\n')
+            for rank, item in enumerate(results, start=1):
+                ret = (item['end_value'] / item['start_value'] - 1) * 100 if item['start_value'] > 0 else 0
+                f.write(f"{rank},{item['profile']},{item['min_rebalance']},{round(item['end_value'], 2)},{round(ret, 2)},{round(item['hold_value'], 2)},{item['trades']},{round(item['turnover'], 2)},{round(item['fees'], 2)}\n")
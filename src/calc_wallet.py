@@ -1,28 +1,67 @@
 try:
-    from src.api_yahoo_f import *
     from src.lib_tool import lib
-    from src.api_coin_market import cmc_api
-    from src.api_coin_gecko import cg_api_n
-    from src.api_kucoin import kc_api
-    from src.rebalancer import kucoinAutoBalance
+    from src.history_store import getHistoryStore
+    from src.price_cache import priceCache
+    from src.wallet_holdings import walletHoldings
 except:
-    from api_yahoo_f import *
     from lib_tool import lib
-    from api_coin_market import cmc_api
-    from api_coin_gecko import cg_api_n
-    from api_kucoin import kc_api
-    from rebalancer import kucoinAutoBalance
+    from history_store import getHistoryStore
+    from price_cache import priceCache
+    from wallet_holdings import walletHoldings
+# price providers, yahoo finance, kucoin, the rebalancer and matplotlib are slow to import
+# they are imported by the methods that use them, only if needed
 
 from pandas import read_csv, concat
 from datetime import datetime
-from numpy import array
 from math import isnan
-from matplotlib.pyplot import figure, pie, legend, title, savefig, show
-from seaborn import set_style
-from json import dumps, loads
+from json import dumps
 from os.path import join
 from os import getcwd
 from typing import Tuple
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait
+from multiprocessing import get_context
+
+def drawPie(labels: list, values: list, plt_title: str) -> None:
+    """Draw the wallet pie chart on a new matplotlib figure.
+    
+    Args:
+        labels (list): Symbols
+        values (list): Value of each symbol in currency
+        plt_title (str): Title, see calculateWalletValue.getPltTitle()
+    """
+    from matplotlib.pyplot import figure, pie, legend, title
+    from seaborn import set_style
+    from numpy import array
+    y = array(values)# numpy.array()
+
+    # grafic settings
+    set_style('whitegrid')
+    #sns.color_palette('pastel')
+    # define size of the image
+    figure(figsize=(7, 6), tight_layout=True)
+    # create a pie chart with value in 'xx.x%' format
+    pie(y, labels = labels, autopct='%.2f', startangle=90, shadow=False)
+
+    # add legend and title to pie chart
+    legend(title = "Symbols:")
+    title(plt_title, fontsize=13, weight='bold')
+
+def renderPie(labels: list, values: list, plt_title: str, path_: str) -> str:
+    """Save the wallet pie chart with the Agg backend, no window is opened.
+    
+    Module level so it can run in a worker process, see calculateWalletValue.renderPltAsync().
+    
+    Returns:
+        str: path_
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.pyplot import savefig, close
+    drawPie(labels, values, plt_title)
+    savefig(path_)
+    close('all')
+    return path_
 
 # 
 # Calculate your wallet value 
@@ -34,7 +73,7 @@ from typing import Tuple
 # 
 class calculateWalletValue:
     # Initialization variable and general settings
-    def __init__(self, type_: str, load = False, privacy = False, rebalance_mode_override: str | None = None) -> None:
+    def __init__(self, type_: str, load = False, privacy = False, rebalance_mode_override: str | None = None, headless = False) -> None:
         """Initialize the wallet calculator with general settings and configurations.
         
         Args:
@@ -42,6 +81,7 @@ class calculateWalletValue:
             load (bool, optional): Option to load data from JSON. Defaults to False.
             privacy (bool, optional): Enable privacy mode to hide total values. Defaults to False.
             rebalance_mode_override (str | None, optional): Override rebalancer mode from CLI. Defaults to None.
+            headless (bool, optional): Never open a chart window, the image is saved by a worker process. Defaults to headless in settings.json or False.
         """
         self.settings = lib.getSettings()
         self.config = lib.getConfig()
@@ -53,15 +93,25 @@ class calculateWalletValue:
         self.supportedStablecoin = self.config['supportedStablecoin']
         self.load = load # option to load data from json, see calculateWalletValue.genPltFromJson()
         self.privacy = privacy
+        # headless: valuation is saved and printed as json, the pie chart image (if save_img) is rendered
+        # in a worker process and does not delay the rebalancer, see calculateWalletValue.renderPltAsync()
+        self.headless = headless or self.settings.get('headless', False)
+        self.plt_executor: ProcessPoolExecutor | None = None
         self.wallet = {
-            # { asset: [[symbol,qta,value, ('crypto' | 'stable' | 'fiat')],] , total_invested: 0, currency: ''}
-            # { asset: [['ATOM', 2, 30, 'crypto'], ['USDC', 21.4, 21.4, 'fiat']]}
-            'asset' : dict(),
+            # { asset: walletHoldings, symbol -> assetHolding(symbol, qta, value, ('crypto' | 'stable' | 'fiat')), total_invested: 0, currency: ''}
+            # { asset: {'ATOM': assetHolding('ATOM', 2, 30, 'crypto'), 'USDC': assetHolding('USDC', 21.4, 21.4, 'stable')}}
+            'asset' : walletHoldings(),
             'total_invested': 0,
             'currency': self.settings['currency'],
             'kucoin_asset': dict()
         }
         self.wallet_liquid_stake = set() # list of asset that are liquid staked asset, see calculateWalletValue.handle_liquid_stake()
+        # network requests (kucoin balance, prices, forex, NCIS) run concurrently, see calculateWalletValue.fetchPrices()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='calc_wallet')
+        self.kc_balance = None # Future of kc_api.getBalance(), joined in loadCSV()
+        self.ncis = None # NCIS price retrieved by fetchPrices(), saved by updateReportJson()
+        # prices retrieved less than price_cache_ttl seconds ago are not requested again, see priceCache
+        self.price_cache = priceCache(self.settings.get('price_cache_ttl', 60), self.settings.get('price_cache_stale', 600))
         lib.printWelcome(f'Welcome to Calculate Wallet Value!')
         lib.printWarn(f'Currency: {self.wallet["currency"]}')
         lib.printWarn(f'Privacy: {"ON" if self.privacy else "OFF"}')
@@ -76,17 +126,28 @@ class calculateWalletValue:
         files = lib.createWorkingFile(basePath)
         if not files: exit()
         self.settings['grafico_path'], self.settings['wallet_path'], self.settings['report_path'] = files
+        # history backend selected in settings.json, see getHistoryStore
+        self.wallet_store = getHistoryStore(self.settings, 'wallet')
+        self.report_store = getHistoryStore(self.settings, 'report')
 
         # create input.csv file
         lib.createFile(f'input.csv', 'symbol,qta,label', False)
 
         # set price provider
         if self.settings['provider'] == 'cg':
+            try:
+                from src.api_coin_gecko import cg_api_n
+            except:
+                from api_coin_gecko import cg_api_n
             lib.printWarn('Api Provider: CoinGecko')
             self.provider = 'cg'
             self.cg = cg_api_n(self.wallet["currency"])
             lib.createFile(self.cg.all_id_path)
         elif self.settings['provider'] == 'cmc':
+            try:
+                from src.api_coin_market import cmc_api
+            except:
+                from api_coin_market import cmc_api
             lib.printWarn('Api Provider: CoinMarketCap')
             self.provider = 'cmc'
             self.cmc = cmc_api(self.wallet["currency"], self.settings['CMC_key'])
@@ -113,15 +174,34 @@ class calculateWalletValue:
         
         if self.settings['retrieve_kc_balance']:
             try:
-                self.kc = kc_api(self.wallet['currency'])
+                from src.api_kucoin import kc_api
+            except:
+                from api_kucoin import kc_api
+            try:
+                self.kc = kc_api(self.wallet['currency'], base_url=self.settings.get('kucoin_base_url', ''))
                 if self.kc.error:
                     raise Exception
-                if not self.kc.getBalance(): # try to update balance, if fail raise Exception
-                    raise Exception
+                # update balance in background while input.csv is loaded
+                self.kc_balance = self.executor.submit(self.kc.getBalance)
             except Exception as e:
                 self.settings['retrieve_kc_balance'] = False
                 lib.printFail(f'Failed to update Kucoin balance, reason: {e}')
 
+    def waitKucoinBalance(self) -> None:
+        """Wait for the Kucoin balance update started in __init__.
+        
+        On failure Kucoin balance is disabled for this run, like a failed update in __init__.
+        """
+        if self.kc_balance is None:
+            return
+        try:
+            if not self.kc_balance.result(timeout=self.settings.get('price_deadline', 60)): # if fail raise Exception
+                raise Exception
+        except Exception as e:
+            self.settings['retrieve_kc_balance'] = False
+            lib.printFail(f'Failed to update Kucoin balance, reason: {e}')
+        self.kc_balance = None
+
     def loadCSV(self) -> list:
         """Acquire data from input CSV file and convert it to a list.
         
@@ -137,6 +217,7 @@ class calculateWalletValue:
         if self.settings['input_custom'] and isfile(self.settings['input_path']):
             input_file = self.settings['input_path']
         df = read_csv(input_file, parse_dates=True) # pandas.read_csv()
+        self.waitKucoinBalance() # input_kc.csv is written by kc_api.getBalance()
         if self.settings['retrieve_kc_balance']:        
             df_kc = read_csv(f'input_kc.csv') # read kucoin asset
             df = concat([df, df_kc], axis=0, ignore_index=True)
@@ -157,12 +238,13 @@ class calculateWalletValue:
             SystemExit: If incorrect price provider is specified
         """
         if self.provider == 'cg': # coingecko
-            price, missingSet1, missingSet2 = self.cg.getPriceOf(symbol)
-            if len(missingSet1) > 0:
-                self.invalid_sym.append(list(missingSet1))
-            if len(missingSet2) > 0:
-                self.invalid_sym.append(list(missingSet2))
-            return price
+            def fetch(symbol: list[str]) -> dict:
+                return self.cg.getPriceOf(symbol)[0] # missing symbols are printed by cg_api_n.getPriceOf()
+            # only missing or expired prices are requested to CoinGecko
+            prices = self.price_cache.getPrices('cg', self.wallet['currency'], symbol, fetch)
+            # fetch may also run in a background refresh, invalid symbols are collected here
+            self.invalid_sym.extend(x for x in symbol if x.upper() not in prices)
+            return prices
 
         lib.printFail('Unexpected error, incorrect price provider')
         exit()
@@ -182,17 +264,17 @@ class calculateWalletValue:
             SystemExit: If incorrect price provider is specified or unable to retrieve prices
         """
         if self.provider == 'cmc': #CoinMarketCap
+            def fetch(symbol: list) -> dict:
+                return self.cmc.getPriceOf(symbol)[0] # missing prices are not in the dict, see api_coin_market.py
             symbol = [x.upper() for x in symbol] 
-            temp = self.cmc.getPriceOf(symbol)
-            if not temp[1]: # if temp[1] is false, it means that one or more prices are missing, see api.py for more info
-                (dict, _, missing, _) = temp
-                self.invalid_sym.extend(list(missing))
-                if len(dict) <= 0: # check if all price are missing
-                    lib.printFail('Unexpected error, unable to retrieve price data')
-                    exit()
-            else:
-                (dict, _) = temp
-            return dict
+            # only missing or expired prices are requested to CoinMarketCap
+            prices = self.price_cache.getPrices('cmc', self.wallet['currency'], symbol, fetch)
+            # fetch may also run in a background refresh, invalid symbols are collected here
+            self.invalid_sym.extend(x for x in symbol if x not in prices)
+            if len(prices) <= 0: # check if all price are missing
+                lib.printFail('Unexpected error, unable to retrieve price data')
+                exit()
+            return prices
         lib.printFail('Unexpected error, incorrect price provider')
         exit()
     
@@ -204,6 +286,10 @@ class calculateWalletValue:
         Returns:
             float: Current NCIS price
         """
+        try:
+            from src.api_yahoo_f import getTicker
+        except:
+            from api_yahoo_f import getTicker
         date_format = '%Y-%m-%d'
         current_date = lib.getCurrentDay(date_format)
         return getTicker(
@@ -273,42 +359,19 @@ class calculateWalletValue:
                 if str(liquid_stake).replace(' ', '').lower() == 'yes':
                     self.wallet_liquid_stake.add(symbol)
 
-            # this block of 3 if statement sort the symbol 
-            # in fiat, stablecoin crypto
-            if symbol.lower() in self.supportedFiat:  # FIAT
-                if symbol.upper() in self.getAssetFromWallet(['fiat']):
-                    # when symbol is already in wallet
-                    # add new qta (+=)
-                    self.wallet['asset'][str(symbol).upper()][0] += qta
-                else: 
-                    # when symbol is NOT in wallet
-                    if self.load:
-                        # when self.load is true add qta and value directly
-                        # without += operator since, it get wallet data 
-                        # from walletValue.json record
-                        # this implies that qta and value is correct
-                        self.wallet['asset'][str(symbol).upper()] = [qta, value, 'fiat']
-                    else: 
-                        # add qta, value will be calculated later
-                        self.wallet['asset'][str(symbol).upper()] = [qta, 0.0, 'fiat']
-
-            elif symbol.lower() in self.supportedStablecoin: # STABLE
-                if symbol.upper() in self.getAssetFromWallet(['stable']):
-                    self.wallet['asset'][str(symbol).upper()][0] += qta
-                else: 
-                    if self.load:
-                        self.wallet['asset'][str(symbol).upper()] = [qta, value, 'stable']
-                    else: self.wallet['asset'][str(symbol).upper()] = [qta, 0.0, 'stable']
-
-            else: # CRYPTO
-                if symbol.upper() in self.getAssetFromWallet(['crypto']):
-                    self.wallet['asset'][str(symbol).upper()][0] += qta
-                else: 
-                    if self.load:
-                        self.wallet['asset'][str(symbol).upper()] = [qta, value, 'crypto']
-                    else: self.wallet['asset'][str(symbol).upper()] = [qta, 0.0, 'crypto']
+            # sort the symbol in fiat, stablecoin crypto
+            if symbol.lower() in self.supportedFiat: type_ = 'fiat'
+            elif symbol.lower() in self.supportedStablecoin: type_ = 'stable'
+            else: type_ = 'crypto'
+
+            # when symbol is already in wallet add new qta (+=)
+            # when symbol is NOT in wallet:
+            #   if self.load is true add qta and value directly, since it get wallet data 
+            #   from walletValue.json record, this implies that qta and value is correct
+            #   else add qta, value will be calculated later
+            self.wallet['asset'].add(str(symbol).upper(), qta, value if self.load else 0.0, type_)
         
-        if self.wallet['asset'] == {}:
+        if len(self.wallet['asset']) == 0:
             lib.printFail('File input.csv is empty or have some columns missing')
             exit()
         if err > 0:
@@ -326,28 +389,15 @@ class calculateWalletValue:
         Returns:
             list[list]: Filtered list of assets in requested format
         """
-        if set(typeOfAsset).intersection(set(['crypto', 'stable', 'fiat', 'all'])): # empty set are evaluated False
-            listOfAsset = list()
-            isAll = False
-
-            if 'all' in typeOfAsset: isAll = True
-            for item in self.wallet['asset'].items():
-                
-                item = list(item)
-                item = [item[0]]+item[1]
-                # final result
-                # item=['ATOM', 1.0, 12.5, 'crypto']
-                #       symbol, qta,    value,  type
-                if item[3] in typeOfAsset or isAll: 
-                    if fullItem: listOfAsset.append(item); continue
-                    elif getQta and getValue: listOfAsset.append([item[0], item[1], item[2]]); continue
-                    elif getQta: listOfAsset.append([item[0], item[1]]); continue
-                    elif getValue: listOfAsset.append([item[0], item[2]]); continue
-                    else: listOfAsset.append(item[0]); continue
-
-            return listOfAsset
-
-        else: return []
+        # item=['ATOM', 1.0, 12.5, 'crypto']
+        #       symbol, qta,    value,  type
+        # inside this class prefer the iterators of walletHoldings, this builds a new list
+        items = self.wallet['asset'].iterType(typeOfAsset)
+        if fullItem: return [[x.symbol, x.qta, x.value, x.type] for x in items]
+        elif getQta and getValue: return [[x.symbol, x.qta, x.value] for x in items]
+        elif getQta: return [[x.symbol, x.qta] for x in items]
+        elif getValue: return [[x.symbol, x.value] for x in items]
+        else: return [x.symbol for x in items]
 
     def aggregateAssetValue(self, stable: bool = False, crypto: bool = False, fiat: bool = False, custom: list = []):
         """Aggregate asset values by type.
@@ -364,13 +414,13 @@ class calculateWalletValue:
         if not isinstance(custom, list): return {}
 
         data = []
-        if stable: data.extend(self.getAssetFromWallet(['stable'], getValue=True))
-        if crypto: data.extend(self.getAssetFromWallet(['crypto'], getValue=True))
-        if fiat: data.extend(self.getAssetFromWallet(['fiat'], getValue=True))
+        if stable: data.extend(self.wallet['asset'].values(['stable']))
+        if crypto: data.extend(self.wallet['asset'].values(['crypto']))
+        if fiat: data.extend(self.wallet['asset'].values(['fiat']))
         if len(custom) > 0: 
             for c in custom:
-                if c in self.wallet['asset'].keys() and c not in data:
-                    data.extend([[c, self.wallet['asset'][c][1]]])
+                if c in self.wallet['asset'] and c not in data:
+                    data.append((c, self.wallet['asset'][c].value))
 
         total_value = 0
         asset = []
@@ -381,84 +431,113 @@ class calculateWalletValue:
                 asset.append(symbol)  
         return {"asset": asset, 'total_value': total_value}
         
-    def CMCcalcValue(self):
-        """Calculate asset values using CoinMarketCap prices.
+    def fetchPrices(self) -> Tuple[dict, dict]:
+        """Retrieve crypto prices, forex rates and NCIS concurrently.
         
-        Retrieves current prices for crypto and stable assets from CoinMarketCap.
-        Calculates fiat values using Yahoo Finance exchange rates.
-        Updates wallet with calculated values and totals.
+        The crypto provider request, a single batched forex request and the NCIS request
+        (only if update_report is enabled in settings.json) are submitted together,
+        then waited for at most price_deadline seconds (settings.json, default 60).
+        Crypto prices and forex rates are served from priceCache when recently retrieved.
+        
+        price_deadline bounds how long the valuation waits, and the CoinGecko/CoinMarketCap
+        requests of the jobs: they stop retrying at the deadline (see httpClient.capDeadline()),
+        a request in flight ends within its own timeout. Yahoo requests (forex, NCIS) are not
+        sent by httpClient, a late one keeps its worker busy until it ends, also at exit.
+        Jobs still queued at the deadline are cancelled.
+        
+        Returns:
+            Tuple[dict, dict]: Tuple containing:
+                - Crypto and stable prices with symbols as keys
+                - Forex rates with fiat symbols as keys, False if rate is missing
+                
+        Raises:
+            TimeoutError: If crypto prices cannot be retrieved before the deadline
         """
-        tot = 0.0
-        tot_crypto_stable = 0.0
+        try:
+            from src.api_yahoo_f import yahooGetPricesOf
+        except:
+            from api_yahoo_f import yahooGetPricesOf
+        try:
+            from src.lib_http import getHttpClient
+        except:
+            from lib_http import getHttpClient
         lib.printWarn('Retriving current price...')
+        deadline = self.settings.get('price_deadline', 60)
+        currency = self.wallet['currency']
+        http = getHttpClient()
+        until = monotonic() + deadline
 
-        # get prices of crypto and stable
-        cryptoList = self.getAssetFromWallet(['crypto'])
-        stableList = self.getAssetFromWallet(['stable'])
-        rawData = self.CMCgetPriceOf(cryptoList+stableList)
+        def bounded(fn, *args):
+            with http.capDeadline(until):
+                return fn(*args)
 
-        # unpack value and divide it back to crypto and stable
-        for (symbol, price) in rawData.items():
-            value = round(price * self.wallet['asset'][symbol][0] ,2) # price * qta
-            self.wallet['asset'][symbol][1] = value
-            tot += value
-            tot_crypto_stable += value
+        if self.provider == 'cg':
+            crypto_job = self.executor.submit(bounded, self.CGgetPriceOf, list(self.wallet['asset'].symbols(['crypto', 'stable'])))
+        else:
+            crypto_job = self.executor.submit(bounded, self.CMCgetPriceOf, list(self.wallet['asset'].symbols(['crypto', 'stable'])))
+
+        # fiat to exchange into the currency in settings
+        fiat = [symbol for symbol in self.wallet['asset'].symbols(['fiat']) if symbol.upper() != currency and symbol.lower() in self.supportedFiat]
+        fx_job = self.executor.submit(bounded, self.price_cache.getPrices, 'yahoo', currency, [f'{currency}{symbol}=X' for symbol in fiat], yahooGetPricesOf)
+        jobs = [crypto_job, fx_job]
+        ncis_job = None
+        if self.settings.get('update_report', False):
+            ncis_job = self.executor.submit(bounded, self.getCryptoIndex)
+            jobs.append(ncis_job)
+
+        _, not_done = wait(jobs, timeout=deadline)
+        for job in not_done:
+            job.cancel()
+
+        if crypto_job in not_done:
+            lib.printFail(f'Unable to retrieve price data in {deadline} seconds')
+            # running jobs can not be cancelled, the workers are released to end them in background
+            # and a new pool is ready for the next valuation (valuationDaemon)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='calc_wallet')
+            raise TimeoutError(f'price data not retrieved in {deadline} seconds')
+        prices = crypto_job.result() # re-raise SystemExit of CGgetPriceOf and CMCgetPriceOf
+
+        rates = {symbol: False for symbol in fiat}
+        if fx_job in not_done:
+            lib.printFail(f'Unable to retrieve forex rates in {deadline} seconds')
+        elif fx_job.exception() is not None:
+            # fiat is not converted, like a missing rate
+            lib.printFail(f'Unable to retrieve forex rates, reason: {fx_job.exception()}')
+        else:
+            fx = fx_job.result()
+            for symbol in fiat:
+                rates[symbol] = fx[f'{currency}{symbol}=X']
 
-        for symbol, qta in self.getAssetFromWallet(['fiat'], getQta=True):
-            # if symbol is the main currency -> return the qta
-            if symbol.upper() == self.wallet["currency"]:
-                value = round(qta, 2)
-                tot += value
-                self.wallet['asset'][symbol][1] = value
-
-            # you want to exchange the other fiat currency into the currency in settings
-            elif symbol.lower() in self.supportedFiat:
-                price = yahooGetPriceOf(f'{self.wallet["currency"]}{symbol}=X')
-                value = round(price * qta, 2)
-                self.wallet['asset'][symbol][1] = value
-                tot += value 
-            else:
-                self.invalid_sym.append(symbol)
+        if ncis_job is not None:
+            if ncis_job in not_done or ncis_job.exception() is not None:
+                lib.printFail('Unable to retrieve NCIS price')
+            else: self.ncis = ncis_job.result()
 
-        self.wallet['total_value'] = round(tot, 2)
-        self.wallet['total_crypto_stable'] = round(tot_crypto_stable, 2)
-        self.wallet['date'] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        return prices, rates
 
-    def CGcalcValue(self):
-        """Calculate asset values using CoinGecko prices.
+    def calcValue(self):
+        """Calculate asset values using the selected price provider.
         
-        Retrieves current prices for crypto and stable assets from CoinGecko.
-        Calculates fiat values using Yahoo Finance exchange rates.
+        Retrieves current prices for crypto and stable assets and Yahoo Finance exchange rates,
+        see calculateWalletValue.fetchPrices().
         Updates wallet with calculated values and totals.
         """
-        tot = 0.0
-        tot_crypto_stable = 0.0
-        lib.printWarn('Retriving current price...')
-
-        cryptoList = self.getAssetFromWallet(['crypto'])
-        stableList = self.getAssetFromWallet(['stable'])
+        rawData, rates = self.fetchPrices()
+        # value = price * qta of every crypto and stable at once, see walletHoldings.updateValues()
+        tot_crypto_stable = self.wallet['asset'].updateValues({symbol.upper(): price for symbol, price in rawData.items()})
 
-        rawData = self.CGgetPriceOf(cryptoList+stableList)
-        for symbol, value in rawData.items():
-            value = round(value * self.wallet['asset'][symbol.upper()][0] ,2)
-            self.wallet['asset'][symbol.upper()][1] = value
-            tot += value
-            tot_crypto_stable += value
-
-        for symbol, qta in self.getAssetFromWallet(['fiat'], getQta=True):
+        fiat_prices = dict()
+        for symbol in self.wallet['asset'].symbols(['fiat']):
             # if symbol is the main currency, just return the qta
             if symbol.upper() == self.wallet["currency"]:
-                price = 1
-            elif symbol.lower() in self.supportedFiat:
+                fiat_prices[symbol] = 1
+            elif symbol in rates:
                 # you want to exchange the other fiat currency into the currency in settings
-                price = yahooGetPriceOf(f'{self.wallet["currency"]}{symbol}=X')
+                fiat_prices[symbol] = rates[symbol]
             else:
                 self.invalid_sym.append(symbol)
-                continue
-
-            value = round(price*qta, 2)
-            self.wallet['asset'][symbol][1] = value
-            tot += value
+        tot = tot_crypto_stable + self.wallet['asset'].updateValues(fiat_prices)
 
         self.wallet['total_value'] = round(tot, 2)
         self.wallet['total_crypto_stable'] = round(tot_crypto_stable, 2)
@@ -482,6 +561,37 @@ class calculateWalletValue:
      
         return base_asset
     
+    @staticmethod
+    def rebalancerData(assets: walletHoldings, ls_asset: dict) -> dict:
+        """Value of crypto and stablecoins for the rebalancer, liquid staked assets are counted in their base token.
+        
+        Args:
+            assets (walletHoldings): Holdings of a valuation, e.g. self.wallet['asset']
+            ls_asset (dict): Liquid staked assets and their base tokens, see handleLiquidStake()
+            
+        Returns:
+            dict: Dictionary with symbols as keys and values as values, debt positions and 0 value assets excluded
+        """
+        value_to_add = {}
+        for ls, base in ls_asset.items():
+            base = base.upper()
+            value_to_add[base] = value_to_add.get(base, 0) + assets[ls.upper()].value
+
+        # remove debt positions (if any) and 0 value crypto (if any)
+        kucoin_rebalancer_data = {symbol: value for symbol, value in assets.values(['stable', 'crypto']) if value > 0}
+        
+        # add Liquid Staked asset values to base asset counting
+        avoid_double_sum = []
+        for symbol, _ in kucoin_rebalancer_data.items():
+            if symbol.lower() in ls_asset.keys():
+                base_symbol = ls_asset[symbol.lower()].upper()
+                if base_symbol in avoid_double_sum: continue
+                avoid_double_sum.append(base_symbol)
+                kucoin_rebalancer_data[base_symbol] += value_to_add[base_symbol]
+
+        # delete liquid staked asset
+        return {k: v for k, v in kucoin_rebalancer_data.items() if k.lower() not in ls_asset.keys()}
+
     def handleDataPlt(self) -> Tuple[list, dict]:
         """Format data for pie chart visualization.
         
@@ -506,15 +616,11 @@ class calculateWalletValue:
         if self.type == 'crypto':
             # Handle stablecoins aggregation
             if self.settings['aggregate_stablecoin']:
-                stable = self.getAssetFromWallet(['stable'], getValue=True)
-                stable_value = 0
-                for symbol, value in stable:
-                    stable_value += value
-                
-                temp = self.getAssetFromWallet(['crypto'], getValue=True)
-                temp.append(['STABLEs', stable_value])
+                stable_value = self.wallet['asset'].totalValue(['stable'])
+                temp = list(self.wallet['asset'].values(['crypto']))
+                temp.append(('STABLEs', stable_value))
             else: 
-                temp = self.getAssetFromWallet(['stable', 'crypto'], getValue=True)
+                temp = self.wallet['asset'].values(['stable', 'crypto'])
 
             # Process liquid staking assets first
             value_to_add = {}
@@ -524,27 +630,13 @@ class calculateWalletValue:
                 # add as value: liquid stake asset's value
                 base = base.upper()
                 if base in value_to_add:
-                    value_to_add[base] += self.wallet['asset'][ls.upper()][1]
+                    value_to_add[base] += self.wallet['asset'][ls.upper()].value
                 else:
-                    value_to_add[base] = self.wallet['asset'][ls.upper()][1]
+                    value_to_add[base] = self.wallet['asset'][ls.upper()].value
 
             # Handle Kucoin rebalancer data if enabled
             if self.settings['kucoin_enable_autobalance']:
-                kucoin_rebalancer_data = self.getAssetFromWallet(['stable', 'crypto'], getValue=True)
-                # remove debt positions (if any) and 0 value crypto (if any)
-                kucoin_rebalancer_data = {symbol: value for symbol, value in kucoin_rebalancer_data if value > 0}
-                
-                # add Liquid Staked asset values to base asset counting
-                avoid_double_sum = []
-                for symbol, _ in kucoin_rebalancer_data.items():
-                    if symbol.lower() in ls_asset.keys():
-                        base_symbol = ls_asset[symbol.lower()].upper()
-                        if base_symbol in avoid_double_sum: continue
-                        avoid_double_sum.append(base_symbol)
-                        kucoin_rebalancer_data[base_symbol] += value_to_add[base_symbol]
-
-                # delete liquid staked asset
-                kucoin_rebalancer_data = {k: v for k, v in kucoin_rebalancer_data.items() if k.lower() not in ls_asset.keys()}
+                kucoin_rebalancer_data = self.rebalancerData(self.wallet['asset'], ls_asset)
 
             # Combine base assets with their liquid staked values
             combined_assets = {}
@@ -574,8 +666,7 @@ class calculateWalletValue:
             symbol_to_visualize = [
                 ['Crypto', 0.0], ['Fiat', 0.0]
             ]
-            temp = self.getAssetFromWallet(['all'], getValue=True)
-            for symbol, value in temp:
+            for symbol, value in self.wallet['asset'].values(['all']):
                 if symbol.lower() not in self.supportedFiat and symbol.lower() not in self.supportedStablecoin:
                     # crypto
                     symbol_to_visualize[0][1] += value
@@ -597,37 +688,43 @@ class calculateWalletValue:
         Args:
             symbol_to_visualize (list): List of [symbol, value] pairs to visualize
         """
+        from matplotlib.pyplot import savefig, show
         lib.printWarn('Creating pie chart...')
+        drawPie(*self.getPltData(symbol_to_visualize), self.getPltTitle())
+
+        if not self.load:
+            # when load is enabled it get data from past record from walletValue.json
+            # so you do NOT need to save the img and do NOT need to update json file
+            if self.settings['save_img']:
+                path_ = self.getPltPath()
+                savefig(path_) # save image
+                lib.printOk(f'Pie chart image successfully saved in {path_}')
+            self.saveSnapshot()
+
+        show()
+
+    def getPltData(self, symbol_to_visualize: list) -> Tuple[list, list]:
+        """Split [symbol, value] pairs into labels and values, sorted by symbol."""
         mylabels = [] # symbols
         val = [] # value in currency of symbols
-
         for (symb, value) in sorted(symbol_to_visualize):
             mylabels.append(symb)
             val.append(value)
+        return mylabels, val
 
-        y = array(val)# numpy.array()
-
-        # grafic settings
-        set_style('whitegrid')
-        #sns.color_palette('pastel')
-        # define size of the image
-        figure(figsize=(7, 6), tight_layout=True)
-        # create a pie chart with value in 'xx.x%' format
-        pie(y, labels = mylabels, autopct='%.2f', startangle=90, shadow=False)
-
-        # add legend and title to pie chart
-        legend(title = "Symbols:")
+    def getPltTitle(self) -> str:
+        """Title of the pie chart: balance (hidden in privacy mode), change from total_invested, date and stablecoin percentage."""
         stable_percentage = self.getStableCoinPercentage()
         title_stablePercentage = f'Stablecoin Percentage: {" " if stable_percentage < 0 else stable_percentage}%'
         if self.privacy:
             # do not show total value
-            title(f'{self.type.capitalize()} Balance: ***** {self.wallet["currency"]} | {self.wallet["date"]}\n{title_stablePercentage}', fontsize=13, weight='bold')
+            return f'{self.type.capitalize()} Balance: ***** {self.wallet["currency"]} | {self.wallet["date"]}\n{title_stablePercentage}'
  
         elif self.type == 'crypto' and self.wallet['total_invested'] > 0:
             # if type == crypto AND total_invested > 0
             # show total value and percentage of change given total_invested
             increasePercent = round((self.wallet['total_crypto_stable'] - self.wallet['total_invested'])/self.wallet['total_invested'] *100, 2)
-            title(f'{self.type.capitalize()} Balance: {self.wallet["total_crypto_stable"]} {self.wallet["currency"]} ({increasePercent}% {"↑" if increasePercent>0 else "↓"}) | {self.wallet["date"]}\n{title_stablePercentage}', fontsize=13, weight='bold')
+            return f'{self.type.capitalize()} Balance: {self.wallet["total_crypto_stable"]} {self.wallet["currency"]} ({increasePercent}% {"↑" if increasePercent>0 else "↓"}) | {self.wallet["date"]}\n{title_stablePercentage}'
         else:
             # if type == total OR
             # if type == crypto AND total_invested <= 0
@@ -638,25 +735,56 @@ class calculateWalletValue:
             else: exit()
 
             # show total value
-            title(f'{self.type.capitalize()} Balance: {total} {self.wallet["currency"]} | {self.wallet["date"]}\n{title_stablePercentage}', fontsize=13, weight='bold')
+            return f'{self.type.capitalize()} Balance: {total} {self.wallet["currency"]} | {self.wallet["date"]}\n{title_stablePercentage}'
 
+    def getPltPath(self) -> str:
+        """Image path of the pie chart, named after the valuation date."""
         # format filename using current date
         filename = self.wallet['date'].replace("/",'_').replace(':','_').replace(' ',' T')+'.png'
+        return join(self.settings["grafico_path"], f'{"C_" if self.type == "crypto" else "T_" if self.type == "total" else ""}{filename}')
 
-        if not self.load:
-            # when load is enabled it get data from past record from walletValue.json
-            # so you do NOT need to save the img and do NOT need to update json file
-            if self.settings['save_img']:
-                path_ = join(self.settings["grafico_path"], f'{"C_" if self.type == "crypto" else "T_" if self.type == "total" else ""}{filename}')
-                savefig(path_) # save image
-                lib.printOk(f'Pie chart image successfully saved in {path_}')
-            self.updateWalletValueJson()
+    def renderPltAsync(self, symbol_to_visualize: list) -> Future:
+        """Save the pie chart image in a worker process with the Agg backend, see renderPie().
+        
+        Args:
+            symbol_to_visualize (list): List of [symbol, value] pairs to visualize
             
-            #self.updateReportJson()
-            # It's useless until, volatility is implemented
-            # search 'def getCryptoIndex'
-
-        show()
+        Returns:
+            Future: Path of the image, joined by waitPlt()
+        """
+        if self.plt_executor is None:
+            # spawn: a forked child would inherit the locks held by the worker threads of self.executor
+            self.plt_executor = ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'))
+        return self.plt_executor.submit(renderPie, *self.getPltData(symbol_to_visualize), self.getPltTitle(), self.getPltPath())
+
+    def waitPlt(self, render: Future) -> None:
+        """Wait the pie chart image started by renderPltAsync(), a failure is reported but never raised."""
+        try:
+            lib.printOk(f'Pie chart image successfully saved in {render.result()}')
+        except Exception as e:
+            lib.printFail(f'Failed to create pie chart image, reason: {e}')
+        self.plt_executor.shutdown()
+        self.plt_executor = None
+
+    def saveSnapshot(self) -> None:
+        """Append the valuation to walletValue.json and, if NCIS was retrieved, to report.json."""
+        self.updateWalletValueJson()
+        
+        # NCIS is retrieved only if update_report is enabled in settings.json
+        # It's useless until, volatility is implemented
+        # search 'def getCryptoIndex'
+        if self.ncis is not None:
+            self.updateReportJson()
+
+    def emitValuation(self) -> None:
+        """Print date, currency and totals as one json line, for scripts reading stdout in headless mode."""
+        print(dumps({
+            'date': self.wallet['date'],
+            'currency': self.wallet['currency'],
+            'total_value': '*****' if self.privacy else self.wallet['total_value'],
+            'total_crypto_stable': '*****' if self.privacy else self.wallet['total_crypto_stable'],
+            'stable_percentage': self.getStableCoinPercentage(),
+        }))
 
     def getWalletAsList(self) -> list:
         """Convert wallet data to a list format.
@@ -664,11 +792,7 @@ class calculateWalletValue:
         Returns:
             list: List of [symbol, qta, value] for all assets in wallet
         """
-        li = list()
-        temp = self.getAssetFromWallet(['all'], getQta=True, getValue=True) # merge dict
-        for symbol, qta, value in temp:
-            li.append([symbol, qta, value]) # convert dict to list
-        return li
+        return [[x.symbol, x.qta, x.value] for x in self.wallet['asset']]
     
     def getStableCoinPercentage(self) -> float:
         """Calculate stablecoin percentage of portfolio.
@@ -679,9 +803,7 @@ class calculateWalletValue:
         Raises:
             SystemExit: If wallet type is invalid
         """
-        tot_stable = 0
-        for _ , value in self.getAssetFromWallet(['stable'], getValue=True):
-            tot_stable += value
+        tot_stable = self.wallet['asset'].totalValue(['stable'])
 
         if self.type == 'crypto':
             return round(tot_stable/self.wallet['total_crypto_stable'] * 100, 2)
@@ -700,9 +822,9 @@ class calculateWalletValue:
         temp = dumps({
             'date': self.wallet['date'],
             'currency': self.wallet['currency'],
-            'NCIS': round(self.getCryptoIndex(), 2), # Nasdaq Crypto Index Settlement
+            'NCIS': round(self.ncis, 2), # Nasdaq Crypto Index Settlement, see calculateWalletValue.fetchPrices()
         })
-        res = lib.updateJson(self.settings['report_path'], self.wallet['date'], temp)
+        res = self.report_store.updateRecord(self.wallet['date'], temp)
         if res[0]:
             lib.printOk(f'Data successfully saved in {self.settings["report_path"]}')            
         else:
@@ -729,12 +851,52 @@ class calculateWalletValue:
             'crypto': [['COIN, QTA, VALUE IN CURRENCY']]+self.getWalletAsList(), # all symbols
             }
         )
-        res = lib.updateJson(self.settings['wallet_path'], self.wallet['date'], temp)
+        res = self.wallet_store.updateRecord(self.wallet['date'], temp)
         if res[0]:
             lib.printOk(f'Data successfully saved in {self.settings["wallet_path"]}')            
         else:
             lib.printFail(f"Failed to update {self.settings['wallet_path']}")
 
+    def resetWallet(self) -> None:
+        """Clear assets, totals and invalid symbols of the previous valuation, see calculateWalletValue.revalue()."""
+        self.invalid_sym = []
+        self.wallet_liquid_stake = set()
+        self.ncis = None
+        self.wallet['asset'] = walletHoldings()
+        self.wallet['kucoin_asset'] = dict()
+        self.wallet['total_invested'] = 0
+
+    def revalue(self, persist: bool = True) -> dict:
+        """Value input.csv (and Kucoin balance) again and append the snapshot to the history.
+        
+        Providers, symbol indexes, HTTP connections and history indexes built in __init__ are reused,
+        no chart is created and the rebalancer does not run, see valuationDaemon.
+        
+        Args:
+            persist (bool, optional): Save the snapshot (walletValue.json, report.json), False to value in memory only. Defaults to True.
+        
+        Returns:
+            dict: self.wallet, with totals and date of this valuation
+            
+        Raises:
+            SystemExit: If input.csv is empty or the provider returns no prices, like run()
+            TimeoutError: If crypto prices cannot be retrieved within price_deadline
+        """
+        self.resetWallet()
+        # the balance of the first valuation is already requested by __init__
+        kc = getattr(self, 'kc', None)
+        if self.kc_balance is None and kc is not None and not kc.error:
+            self.settings['retrieve_kc_balance'] = True # a failed update disables it for one valuation only
+            self.kc_balance = self.executor.submit(kc.getBalance)
+
+        self.checkInput(self.loadCSV())
+        self.calcValue()
+        if self.invalid_sym:
+            self.showInvalidSymbol()
+        if persist:
+            self.saveSnapshot()
+        return self.wallet
+
     def genPltFromJson(self):
         """Generate pie chart from historical wallet data.
         
@@ -748,10 +910,9 @@ class calculateWalletValue:
         lib.printWelcome('Select one of the following date to load data from.')
         record = []
 
-        # load records of json file
-        with open(self.settings['wallet_path'], 'r') as f:
-            for line in f:
-                record.append(loads(line))
+        # load records of json file, in chronological order
+        for line in self.wallet_store.iterRecords():
+            record.append(line)
         # print all date of records
         for (i, rec) in enumerate(record):
             print(f"[{i}] {rec['date']}", end='\n')
@@ -794,13 +955,17 @@ class calculateWalletValue:
         self.wallet['currency'] = record['currency']
 
         self.checkInput(record['crypto'][1:], True) # skip the first element, it's ["COIN, QTA, VALUE IN CURRENCY"]
-        newdict = self.handleDataPlt()
+        crypto, _ = self.handleDataPlt()
         # if total invested is in the input.csv
         if 'total_invested' in record.keys():
             self.wallet['total_invested'] = record['total_invested']
         else: self.wallet['total_invested'] = 0
 
-        self.genPlt(newdict)
+        if self.headless:
+            # a past record is not saved again, there is no chart to open
+            self.emitValuation()
+        else:
+            self.genPlt(crypto)
 
     def run(self) -> None:
         """Main execution method for wallet calculation and visualization.
@@ -819,15 +984,22 @@ class calculateWalletValue:
         else:
             rawCrypto = self.loadCSV()
             self.checkInput(rawCrypto)
-            if self.provider == 'cg':
-                self.CGcalcValue()
-            if self.provider == 'cmc':
-                self.CMCcalcValue()
+            try:
+                self.calcValue()
+            except TimeoutError:
+                exit() # reason already printed by fetchPrices()
             if self.invalid_sym:
                 self.showInvalidSymbol()
             
             crypto, wallet_for_kc = self.handleDataPlt()
-            self.genPlt(crypto)
+            render = None
+            if self.headless:
+                self.saveSnapshot()
+                self.emitValuation()
+                if self.settings['save_img']:
+                    render = self.renderPltAsync(crypto)
+            else:
+                self.genPlt(crypto)
             if self.settings['kucoin_enable_autobalance']: 
                 data = {
                     'kucoin_asset': self.wallet['kucoin_asset'], 
@@ -850,6 +1022,10 @@ class calculateWalletValue:
                     lib.printFail(f"Invalid rebalance_mode '{invalid_mode_from_settings}' found in settings.json. Defaulting to '{final_rebalance_mode}'.")
                 
                 # Pass determined mode to kucoinAutoBalance
+                try:
+                    from src.rebalancer import kucoinAutoBalance
+                except:
+                    from rebalancer import kucoinAutoBalance
                 auto = kucoinAutoBalance(
                     wallet=data, 
                     kucoin_api_obj=self.kc, 
@@ -858,3 +1034,15 @@ class calculateWalletValue:
                     execution_mode=final_rebalance_mode # Pass the final validated/defaulted mode here
                 )
                 auto.run()
+
+            # wait prices refreshed in background, so next run find them in cache
+            self.price_cache.join()
+            if self.settings.get('http_stats', False):
+                try:
+                    from src.lib_http import getHttpClient
+                except:
+                    from lib_http import getHttpClient
+                getHttpClient().printStats()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if render is not None:
+                self.waitPlt(render)
@@ -28,7 +28,7 @@
 #                            TODO compare portfolio volatility with btc and eth volatility or other crypto index
 #                            TODO [cryptoBalanceReport] [walletBalanceReport] implement volatility
 # TODO [main] fix arg parser logic for param: --calc --load ('--total' | '--crypto') to run genPltFromJson() with specified type
-# TODO [cg_api_n, cmc_api] add timeout to requests https://datagy.io/python-requests-timeouts/
+# DONE [cg_api_n, cmc_api] add timeout to requests https://datagy.io/python-requests-timeouts/
 # TODO [cryptoBalanceReport] [walletBalanceReport] add special keyword to choose date range (ytd ecc)
 # TODO [calculateWalletValue] fix handleDataPlt when one asset is a major % of self.wallet['total_crypto_stable']
 # TODO [walletBalanceReport] --load ask for user input to display only the last record for each day
@@ -122,3 +122,18 @@
 # DONE [api][kc_api] add market order
 # DONE [calculateWalletValue] create function to aggregate more symbols
 # DONE [kucoin] [calculateWalletValue] set percentage weight for each asset to auto adjust, sell and buy to rebalance autonomously
+# DONE [calculateWalletValue] save walletValue.json and report.json append-only, with a date -> offset index, see jsonHistoryStore
+# DONE [all] add sqlite history backend, select it with history_backend in settings.json
+# DONE [walletBalanceReport] convert records in other currencies with the historical forex rate, cached in cache/fx_<FROM><TO>.json
+# DONE [calculateWalletValue] retrieve kucoin balance, crypto prices, forex rates and NCIS concurrently, with price_deadline in settings.json
+# DONE [cg_api_n, cmc_api, kc_api] share keep-alive http sessions with timeouts, see httpClient in lib_http.py
+# DONE [calculateWalletValue] cache prices in cache/price_cache.json, see price_cache_ttl and price_cache_stale in settings.json
+# DONE [cg_api_n, cmc_api, kc_api] rate limit requests of each provider and retry with backoff until http_deadline, see rate_limits in settings.json
+# DONE [kucoin] buy assets without a direct pair through multi-hop routes, see routeEngine in route_engine.py
+# DONE [kucoin] backtest the rebalancer over walletValue.json history with --backtest, see rebalanceBacktest in backtest.py
+# DONE [kucoin] parallel backtest sweep of portfolio profiles and min_rebalance with --sweep, see rebalanceSweep in backtest_sweep.py
+# DONE [main] lazy imports of each command and startup benchmark, see COMMANDS in main.py and startup_benchmark.py
+# DONE [calculateWalletValue] daemon mode with --daemon, keeps providers and caches loaded between valuations, see valuationDaemon in valuation_daemon.py
+# DONE [calculateWalletValue] local json api with --serve, concurrent identical requests share one computation, see valuationServer in valuation_api.py
+# DONE [calculateWalletValue] headless mode with --headless, pie chart image rendered by a worker process with the Agg backend, see renderPie in calc_wallet.py
+# DONE [calculateWalletValue] wallet assets stored in walletHoldings (slotted, indexed by type), see wallet_holdings.py
@@ -0,0 +1,532 @@
+try:
+    from src.lib_tool import lib
+except:
+    from lib_tool import lib
+from json import loads, dumps, decoder
+from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from os import SEEK_END, replace
+from os.path import exists, getsize, join
+from threading import Lock
+from typing import Iterator
+import sqlite3
+
+#
+# History backends for walletValue.json and report.json records
+# the backend is selected with 'history_backend' in settings.json: "json" (default) or "sqlite"
+# see getHistoryStore()
+#
+# Every backend exposes the same methods:
+#   updateRecord(date, record)               insert or replace the record of that hour
+#   iterRecords(start, end, with_assets)     records in chronological order
+#   getTickers()                             every symbol ever recorded
+#   iterAssetHistory(symbols, start, end)    (date, [[symbol, qta, value], ...]) for each record
+#   getRecordCount()
+#
+
+def getHistoryStore(settings: dict, kind: str = 'wallet'):
+    """Return the history backend selected in settings.json.
+
+    Args:
+        settings (dict): settings.json content, 'path' and optionally 'history_backend'
+        kind (str, optional): 'wallet' for walletValue.json or 'report' for report.json. Defaults to 'wallet'.
+
+    Returns:
+        jsonHistoryStore | sqliteHistoryStore: History backend
+    """
+    json_path = join(settings['path'], 'walletValue.json' if kind == 'wallet' else 'report.json')
+    backend = settings.get('history_backend', 'json')
+    if backend == 'sqlite':
+        return sqliteHistoryStore(join(settings['path'], 'history.db'), kind, json_path)
+    if backend != 'json':
+        lib.printFail(f"Invalid history_backend '{backend}' found in settings.json. Defaulting to 'json'.")
+    return jsonHistoryStore(json_path)
+
+#
+# Append-only storage for walletValue.json and report.json
+# every record is one json line, new records are appended at the end of file
+# a sidecar index (<file>.idx) maps the 'dd/mm/yyyy HH' key of each record
+# to its byte offset, so replacing or inserting a record never rewrite the whole file
+# the file is compacted (one record per line, in chronological order) only on request: main.py --compact
+#
+class jsonHistoryStore:
+    """Append-only json lines history file with a date -> byte offset index.
+
+    Records are keyed by their hour ('dd/mm/yyyy HH'), as lib.updateJson did.
+    The data file keeps the one-json-per-line format, records are served in
+    chronological order through the index, regardless of their position in the file.
+    The file can hold records out of order (inserted for a past hour), records padded with spaces
+    and whitespace-only lines (superseded records), readers go through the index until compact() is requested.
+
+    The index file is append-only too, each line is: key,offset,length,data_file_size
+    the last line for a key wins. If data_file_size of the last line does not match
+    the actual size of the data file (e.g. file edited by hand or legacy file without index)
+    the index is rebuilt with a single scan of the data file.
+
+    Attributes:
+        file_path (str): Path to the json lines data file
+        index_path (str): Path to the sidecar index file
+        index (dict): key: 'dd/mm/yyyy HH', value: (offset, length) of the record in data file
+        lock (Lock): Serialize writes, index updates and record reads, the daemon and API threads share the store
+    """
+    KEY_FORMAT = '%d/%m/%Y %H'
+
+    def __init__(self, file_path: str) -> None:
+        """Open the history file and load (or rebuild) its index.
+
+        Args:
+            file_path (str): Path to walletValue.json or report.json
+        """
+        self.file_path = file_path
+        self.index_path = file_path + '.idx'
+        self.index: dict[str, tuple[int, int]] = dict()
+        self.sorted_keys: list[tuple[datetime, str]] = []  # [(parsed key, key), ...] sorted by date
+        self.lock = Lock()
+        lib.createFile(self.file_path)
+        self.loadIndex()
+
+    @staticmethod
+    def toKey(date: str) -> str:
+        """Convert a record date 'dd/mm/yyyy HH:MM:SS' to its index key 'dd/mm/yyyy HH'.
+
+        Args:
+            date (str): Record date
+
+        Returns:
+            str: Index key
+        """
+        return date.split(':')[0]
+
+    def loadIndex(self) -> None:
+        """Load the sidecar index, rebuild it if it's missing or out of date."""
+        data_size = getsize(self.file_path)
+        last_size = 0
+        if exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    try:
+                        key, offset, length, last_size = line.rstrip('\n').split(',')
+                        self.index[key] = (int(offset), int(length))
+                        last_size = int(last_size)
+                    except ValueError: # truncated line, e.g. interrupted write
+                        last_size = -1
+
+        if last_size != data_size:
+            self.rebuildIndex()
+            return
+        self.sortKeys()
+
+    def rebuildIndex(self) -> None:
+        """Scan the data file once and write a fresh index."""
+        self.index = dict()
+        offset = 0
+        with open(self.file_path, 'rb') as f:
+            for line in f:
+                record = line.strip()
+                if len(record) > 0: # skip blank lines and superseded records
+                    try:
+                        key = self.toKey(loads(record)['date'])
+                        # length is the record without line terminator
+                        self.index[key] = (offset, len(line.rstrip(b'\r\n')))
+                    except (decoder.JSONDecodeError, KeyError) as e:
+                        lib.printFail(f'Json error, {self.file_path=} {e}')
+                offset += len(line)
+
+        data_size = getsize(self.file_path)
+        with open(self.index_path, 'w') as f:
+            for key, (offset, length) in self.index.items():
+                f.write(f'{key},{offset},{length},{data_size}\n')
+        self.sortKeys()
+
+    def sortKeys(self) -> None:
+        """Sort index keys by date, used to serve records in chronological order."""
+        self.sorted_keys = sorted((datetime.strptime(key, self.KEY_FORMAT), key) for key in self.index.keys())
+
+    def isCompact(self) -> bool:
+        """True if the data file is one record per line in chronological order, without blank lines."""
+        expected = 0
+        for _, key in self.sorted_keys:
+            offset, length = self.index[key]
+            if offset != expected:
+                return False
+            expected = offset + length + 1 # record and its \n
+        return expected == getsize(self.file_path)
+
+    def compact(self) -> bool:
+        """Rewrite the data file with one record per line in chronological order, then rebuild the index.
+
+        Superseded records, padding and blank lines are dropped. The new file replaces
+        the old one atomically, on failure the file is left as it is.
+        Run it offline (main.py --compact): an iterRecords() already running, here or in another process, keeps reading the old file.
+
+        Returns:
+            bool: True if the file has been rewritten
+        """
+        temp_path = f'{self.file_path}.tmp'
+        with self.lock:
+            try:
+                with open(self.file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                    for _, key in self.sorted_keys:
+                        offset, length = self.index[key]
+                        src.seek(offset)
+                        dst.write(src.read(length).rstrip() + b'\n')
+                replace(temp_path, self.file_path)
+            except OSError as e:
+                lib.printFail(f'Failed to compact {self.file_path}, {e}')
+                return False
+            self.rebuildIndex()
+        return True
+
+    def updateRecord(self, date_to_update: str, new_record: str) -> tuple[bool, str]:
+        """Insert or replace the record of date_to_update's hour.
+
+        A new hour is appended at the end of file, a record of the same hour
+        is overwritten in place when the new one fits in the old slot, otherwise
+        the old slot is blanked out and the new record is appended.
+        Only the affected record and one index line are written.
+
+        Args:
+            date_to_update (str): Date of the new record 'dd/mm/yyyy HH:MM:SS'
+            new_record (str): Json record, one line
+
+        Returns:
+            tuple: (success, error_content) - Success flag and content on error
+        """
+        key = self.toKey(date_to_update)
+        data = new_record.encode('utf-8')
+        with self.lock:
+            try:
+                with open(self.file_path, 'r+b') as f:
+                    if key in self.index and len(data) <= self.index[key][1]:
+                        # same hour, overwrite in place and pad with whitespace
+                        offset, length = self.index[key]
+                        f.seek(offset)
+                        f.write(data + b' ' * (length - len(data)))
+                    else:
+                        if key in self.index:
+                            # same hour but bigger record, blank out old one
+                            offset, length = self.index[key]
+                            f.seek(offset)
+                            f.write(b' ' * length)
+                        f.seek(0, SEEK_END)
+                        offset = f.tell()
+                        if offset > 0:
+                            # make sure the new record starts on a new line
+                            f.seek(offset - 1)
+                            if f.read(1) != b'\n':
+                                f.write(b'\n')
+                                offset += 1
+                        f.write(data + b'\n')
+                        length = len(data)
+                    f.seek(0, SEEK_END)
+                    data_size = f.tell()
+
+                with open(self.index_path, 'a') as f:
+                    f.write(f'{key},{offset},{length},{data_size}\n')
+            except OSError as e:
+                lib.printFail(f'Failed to write {self.file_path}, {e}')
+                return False, new_record # return new_record to eventually retry later
+
+            if key not in self.index:
+                insort(self.sorted_keys, (datetime.strptime(key, self.KEY_FORMAT), key))
+            self.index[key] = (offset, length)
+            return True, ''
+
+    def iterRecords(self, start: datetime | None = None, end: datetime | None = None, with_assets: bool = True) -> Iterator[dict]:
+        """Yield records in chronological order, optionally within [start, end].
+
+        Args:
+            start (datetime | None, optional): First hour to include. Defaults to None.
+            end (datetime | None, optional): Last hour to include. Defaults to None.
+            with_assets (bool, optional): Unused, every json record is parsed as a whole. Defaults to True.
+
+        Yields:
+            dict: Parsed record
+        """
+        with self.lock:
+            first = 0 if start is None else bisect_left(self.sorted_keys, start, key=lambda item: item[0])
+            last = len(self.sorted_keys) if end is None else bisect_right(self.sorted_keys, end, key=lambda item: item[0])
+            keys = self.sorted_keys[first:last]
+        with open(self.file_path, 'rb') as f:
+            for _, key in keys:
+                with self.lock: # a record of the same hour may be rewritten in place meanwhile
+                    offset, length = self.index[key]
+                    f.seek(offset)
+                    data = f.read(length)
+                yield loads(data)
+
+    def getTickers(self) -> set:
+        """Return every symbol ever recorded.
+
+        Returns:
+            set: Symbols
+        """
+        tickers = set()
+        for record in self.iterRecords():
+            for item in record['crypto'][1:]: # skip the first element, it's ["COIN, QTA, VALUE IN CURRENCY"]
+                tickers.add(item[0])
+        return tickers
+
+    def iterAssetHistory(self, symbols: list[str], start: datetime | None = None, end: datetime | None = None) -> Iterator[tuple[str, list]]:
+        """Yield, for each record, its date and the assets in symbols.
+
+        Args:
+            symbols (list[str]): Symbols to keep, compared as recorded
+            start (datetime | None, optional): First hour to include. Defaults to None.
+            end (datetime | None, optional): Last hour to include. Defaults to None.
+
+        Yields:
+            tuple: (date, [[symbol, qta, value], ...]), the list is empty when no symbol is held
+        """
+        symbols = set(symbols)
+        for record in self.iterRecords(start, end):
+            yield record['date'], [item for item in record['crypto'][1:] if item[0] in symbols]
+
+    def getRecordCount(self) -> int:
+        """Return the number of records stored.
+
+        Returns:
+            int: Number of records
+        """
+        return len(self.index)
+
+class historyCompactor:
+    """Offline maintenance of the json history files, run by main.py --compact."""
+
+    def __init__(self) -> None:
+        self.settings = lib.getSettings()
+
+    def run(self) -> None:
+        """Compact walletValue.json and report.json, see jsonHistoryStore.compact()."""
+        if self.settings.get('history_backend', 'json') == 'sqlite':
+            lib.printWarn('history_backend is sqlite, nothing to compact')
+            return
+        for kind in ['wallet', 'report']:
+            store = getHistoryStore(self.settings, kind)
+            if store.isCompact():
+                lib.printOk(f'{store.file_path} is already compact')
+            elif store.compact():
+                lib.printOk(f'{store.file_path} compacted, {store.getRecordCount()} records')
+
+#
+# SQLite storage for walletValue.json and report.json records
+# one database (history.db) for both kinds of record
+# wallet records are also split in per-asset rows, indexed by (symbol, ts)
+# so single ticker and date range queries do not parse every record
+#
+class sqliteHistoryStore:
+    """SQLite history backend with one-shot migration from the json files.
+
+    Records are keyed by their hour, stored as an integer yyyymmddhh (ts) to be
+    sortable and timezone independent. The complete record is kept as json in 'body',
+    the fields used by the reports are also stored in their own columns.
+
+    Attributes:
+        db_path (str): Path to history.db
+        kind (str): 'wallet' or 'report'
+        json_path (str): json file to import on first use
+    """
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS records (
+            kind TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            total_value REAL,
+            total_crypto_stable REAL,
+            total_invested REAL,
+            currency TEXT,
+            body TEXT NOT NULL,
+            PRIMARY KEY (kind, ts)
+        )""",
+        """CREATE TABLE IF NOT EXISTS assets (
+            ts INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            qta REAL,
+            value REAL
+        )""",
+        'CREATE INDEX IF NOT EXISTS assets_symbol_ts ON assets (symbol, ts)',
+        'CREATE INDEX IF NOT EXISTS assets_ts ON assets (ts)',
+    ]
+    SUMMARY_FIELDS = ['total_value', 'total_crypto_stable', 'total_invested', 'currency']
+
+    def __init__(self, db_path: str, kind: str, json_path: str) -> None:
+        """Open (or create) history.db, import json_path if there are no records of this kind yet.
+
+        Args:
+            db_path (str): Path to history.db
+            kind (str): 'wallet' or 'report'
+            json_path (str): Path to walletValue.json or report.json
+        """
+        self.db_path = db_path
+        self.kind = kind
+        self.json_path = json_path
+        self.lock = Lock() # serialize writes, the connection may be shared between threads
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+
+        if self.getRecordCount() == 0 and exists(json_path) and getsize(json_path) > 0:
+            self.importJson(json_path)
+
+    @staticmethod
+    def toTs(date: str) -> int:
+        """Convert a record date 'dd/mm/yyyy HH:MM:SS' to its key yyyymmddhh.
+
+        Args:
+            date (str): Record date
+
+        Returns:
+            int: Record key
+        """
+        return int(datetime.strptime(jsonHistoryStore.toKey(date), jsonHistoryStore.KEY_FORMAT).strftime('%Y%m%d%H'))
+
+    @staticmethod
+    def datetimeToTs(date: datetime) -> int:
+        """Convert a datetime to its key yyyymmddhh.
+
+        Args:
+            date (datetime): Date
+
+        Returns:
+            int: Record key
+        """
+        return int(date.strftime('%Y%m%d%H'))
+
+    def importJson(self, json_path: str) -> None:
+        """One-shot migration of a json history file into history.db.
+
+        Args:
+            json_path (str): Path to walletValue.json or report.json
+        """
+        lib.printWarn(f'Importing {json_path} into {self.db_path}...')
+        count = 0
+        with self.lock, self.conn:
+            for record in jsonHistoryStore(json_path).iterRecords():
+                self.__insert(record)
+                count += 1
+        lib.printOk(f'{count} records successfully imported in {self.db_path}')
+
+    def __insert(self, record: dict) -> None:
+        """Insert or replace a record, caller holds the lock and the transaction.
+
+        Args:
+            record (dict): Parsed record
+        """
+        ts = self.toTs(record['date'])
+        self.conn.execute('DELETE FROM records WHERE kind = ? AND ts = ?', (self.kind, ts))
+        self.conn.execute(
+            'INSERT INTO records (kind, ts, date, total_value, total_crypto_stable, total_invested, currency, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.kind, ts, record['date'], *[record.get(field) for field in self.SUMMARY_FIELDS], dumps(record))
+        )
+        if self.kind == 'wallet' and 'crypto' in record:
+            self.conn.execute('DELETE FROM assets WHERE ts = ?', (ts,))
+            self.conn.executemany(
+                'INSERT INTO assets (ts, symbol, qta, value) VALUES (?, ?, ?, ?)',
+                [(ts, item[0], item[1], item[2]) for item in record['crypto'][1:]]
+            )
+
+    def updateRecord(self, date_to_update: str, new_record: str) -> tuple[bool, str]:
+        """Insert or replace the record of date_to_update's hour.
+
+        Args:
+            date_to_update (str): Date of the new record 'dd/mm/yyyy HH:MM:SS'
+            new_record (str): Json record
+
+        Returns:
+            tuple: (success, error_content) - Success flag and content on error
+        """
+        try:
+            record = loads(new_record)
+            with self.lock, self.conn:
+                self.__insert(record)
+        except sqlite3.Error as e:
+            lib.printFail(f'Failed to write {self.db_path}, {e}')
+            return False, new_record # return new_record to eventually retry later
+        return True, ''
+
+    def __rangeWhere(self, start: datetime | None, end: datetime | None) -> tuple[str, list]:
+        """Build the ts range condition for records table.
+
+        Returns:
+            tuple: (sql condition, parameters)
+        """
+        where = 'r.kind = ?'
+        param = [self.kind]
+        if start is not None:
+            where += ' AND r.ts >= ?'
+            param.append(self.datetimeToTs(start))
+        if end is not None:
+            where += ' AND r.ts <= ?'
+            param.append(self.datetimeToTs(end))
+        return where, param
+
+    def iterRecords(self, start: datetime | None = None, end: datetime | None = None, with_assets: bool = True) -> Iterator[dict]:
+        """Yield records in chronological order, optionally within [start, end].
+
+        Args:
+            start (datetime | None, optional): First hour to include. Defaults to None.
+            end (datetime | None, optional): Last hour to include. Defaults to None.
+            with_assets (bool, optional): If False only date, totals and currency are returned,
+                without parsing the record body. Defaults to True.
+
+        Yields:
+            dict: Record
+        """
+        where, param = self.__rangeWhere(start, end)
+        if with_assets:
+            for (body,) in self.conn.execute(f'SELECT body FROM records r WHERE {where} ORDER BY r.ts', param):
+                yield loads(body)
+            return
+
+        fields = ', '.join(self.SUMMARY_FIELDS)
+        for row in self.conn.execute(f'SELECT date, {fields} FROM records r WHERE {where} ORDER BY r.ts', param):
+            # missing fields are not returned, as in the json records
+            record = {'date': row[0]}
+            record.update({field: value for field, value in zip(self.SUMMARY_FIELDS, row[1:]) if value is not None})
+            yield record
+
+    def getTickers(self) -> set:
+        """Return every symbol ever recorded.
+
+        Returns:
+            set: Symbols
+        """
+        return {symbol for (symbol,) in self.conn.execute('SELECT DISTINCT symbol FROM assets')}
+
+    def iterAssetHistory(self, symbols: list[str], start: datetime | None = None, end: datetime | None = None) -> Iterator[tuple[str, list]]:
+        """Yield, for each record, its date and the assets in symbols.
+
+        Uses the (symbol, ts) index, record bodies are not parsed.
+
+        Args:
+            symbols (list[str]): Symbols to keep, compared as recorded
+            start (datetime | None, optional): First hour to include. Defaults to None.
+            end (datetime | None, optional): Last hour to include. Defaults to None.
+
+        Yields:
+            tuple: (date, [[symbol, qta, value], ...]), the list is empty when no symbol is held
+        """
+        symbols = list(symbols)
+        if len(symbols) == 0: symbols = ['']
+        where, param = self.__rangeWhere(start, end)
+        query = f"""SELECT r.ts, r.date, a.symbol, a.qta, a.value FROM records r
+            LEFT JOIN assets a ON a.ts = r.ts AND a.symbol IN ({','.join('?' * len(symbols))})
+            WHERE {where} ORDER BY r.ts"""
+
+        last_ts, date, items = None, '', []
+        for ts, row_date, symbol, qta, value in self.conn.execute(query, symbols + param):
+            if ts != last_ts:
+                if last_ts is not None: yield date, items
+                last_ts, date, items = ts, row_date, []
+            if symbol is not None:
+                items.append([symbol, qta, value])
+        if last_ts is not None: yield date, items
+
+    def getRecordCount(self) -> int:
+        """Return the number of records stored.
+
+        Returns:
+            int: Number of records
+        """
+        return self.conn.execute('SELECT COUNT(*) FROM records WHERE kind = ?', (self.kind,)).fetchone()[0]
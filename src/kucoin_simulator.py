@@ -0,0 +1,303 @@
+try:
+    from src.lib_tool import lib
+    from src.lib_http import tokenBucket
+except:
+    from lib_tool import lib
+    from lib_http import tokenBucket
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from json import loads, dumps
+from threading import Lock, Thread
+from time import time, sleep, monotonic
+from random import uniform
+from uuid import uuid4
+from os.path import exists
+
+#
+# Local stand-in for the Kucoin REST API, to run kc_api and kucoinAutoBalance with no network
+# point kc_api at it with kucoin_base_url in settings.json, e.g. "http://127.0.0.1:8901"
+#
+# implemented endpoints:
+#   GET  /api/v1/timestamp
+#   GET  /api/v1/accounts                   balance ledger, main and trade accounts
+#   POST /api/v2/accounts/inner-transfer    main <-> trade
+#   GET  /api/v2/symbols
+#   GET  /api/v1/prices                     fiat prices
+#   GET  /api/v1/market/stats
+#   POST /api/v1/orders                     market orders only, matched against a synthetic order book
+#
+# private endpoints only check that KC-API-KEY is sent, signatures are not verified
+# every request waits latency (+- jitter) seconds and goes through a token bucket, 429 when it is empty
+#
+# market state is loaded from a json file with the same keys of DEFAULT_STATE, see kucoinSimulator.__init__
+#
+
+DEFAULT_STATE = {
+    # asset -> price in USD
+    'prices': {'BTC': 60000, 'ETH': 3000, 'SOL': 150, 'KCS': 10, 'USDT': 1, 'USDC': 1},
+    # fiat -> units per USD
+    'fiat': {'USD': 1, 'EUR': 0.92},
+    # enabled pairs
+    'pairs': ['BTC-USDT', 'ETH-USDT', 'SOL-USDT', 'KCS-USDT', 'BTC-USDC', 'ETH-USDC', 'USDC-USDT', 'ETH-BTC', 'SOL-BTC', 'KCS-BTC'],
+    # account -> asset -> balance
+    'balances': {
+        'main': {'USDC': 500},
+        'trade': {'USDT': 2000, 'BTC': 0.05, 'ETH': 1, 'SOL': 10},
+    },
+    'spread': 0.001,        # between best bid and best ask
+    'depth': 5000,          # USD available at each order book level
+    'level_step': 0.0005,   # price distance between levels
+    'fee': 0.001,           # taker fee, paid in the asset received
+}
+
+class kucoinSimulator:
+    """In-memory Kucoin exchange: balance ledger, prices and a market order matcher.
+
+    Attributes:
+        state (dict): Market state, see DEFAULT_STATE
+        orders (list[dict]): Filled orders
+    """
+
+    def __init__(self, state_file: str = '', latency: float = 0.05, jitter: float = 0.02, calls_per_minute: float = 1200, burst: int = 30) -> None:
+        """Load the market state.
+
+        Args:
+            state_file (str, optional): Json file overriding DEFAULT_STATE keys. Defaults to ''.
+            latency (float, optional): Seconds every request waits. Defaults to 0.05.
+            jitter (float, optional): Random seconds added or removed from latency. Defaults to 0.02.
+            calls_per_minute (float, optional): Rate limit. Defaults to 1200.
+            burst (int, optional): Requests allowed back to back. Defaults to 30.
+        """
+        self.state = loads(dumps(DEFAULT_STATE)) # deep copy
+        if state_file != '' and exists(state_file):
+            self.state.update(lib.loadJsonFile(state_file))
+        self.latency = latency
+        self.jitter = jitter
+        self.limiter = tokenBucket(calls_per_minute, burst)
+        self.lock = Lock()
+        self.orders: list[dict] = []
+        self.server: ThreadingHTTPServer | None = None
+
+    # --- market ---
+
+    def getPairs(self) -> list[dict]:
+        """Enabled pairs in /api/v2/symbols format."""
+        res = []
+        for pair in self.state['pairs']:
+            base, quote = pair.split('-')
+            price = self.state['prices'][base] / self.state['prices'][quote]
+            res.append({
+                'symbol': pair, 'name': pair, 'baseCurrency': base, 'quoteCurrency': quote, 'feeCurrency': quote, 'market': 'USDS',
+                'baseMinSize': str(self.roundIncrement(1 / self.state['prices'][base])), 'quoteMinSize': '0.1',
+                'baseMaxSize': '10000000000', 'quoteMaxSize': '99999999',
+                'baseIncrement': str(self.roundIncrement(0.01 / self.state['prices'][base])), 'quoteIncrement': str(self.roundIncrement(0.01 / self.state['prices'][quote])),
+                'priceIncrement': str(self.roundIncrement(price * 0.00001)),
+                'priceLimitRate': '0.1', 'minFunds': '0.1', 'isMarginEnabled': False, 'enableTrading': True,
+            })
+        return res
+
+    @staticmethod
+    def roundIncrement(value: float) -> float:
+        """Largest power of 10 <= value, e.g. 0.0042 -> 0.001."""
+        increment = 1.0
+        while increment > value and increment > 1e-10:
+            increment /= 10
+        while increment * 10 <= value:
+            increment *= 10
+        return float(f'{increment:.0e}') # drop float noise of the divisions
+
+    def getFiatPrice(self, currencies: list[str], base: str) -> dict[str, str]:
+        """Prices of currencies (all if empty) in fiat base."""
+        rate = self.state['fiat'].get(base.upper(), 1)
+        assets = currencies if len(currencies) > 0 else list(self.state['prices'])
+        return {x: str(self.state['prices'][x] * rate) for x in assets if x in self.state['prices']}
+
+    def getMarketStats(self, pair: str) -> dict:
+        """Market stats of pair in /api/v1/market/stats format."""
+        base, quote = pair.split('-')
+        last = self.state['prices'][base] / self.state['prices'][quote]
+        spread = self.state['spread'] / 2
+        return {
+            'time': int(time() * 1000), 'symbol': pair, 'buy': str(last * (1 - spread)), 'sell': str(last * (1 + spread)),
+            'changeRate': '0', 'changePrice': '0', 'high': str(last), 'low': str(last), 'vol': '0', 'volValue': '0',
+            'last': str(last), 'averagePrice': str(last), 'takerFeeRate': str(self.state['fee']), 'makerFeeRate': str(self.state['fee']),
+            'takerCoefficient': '1', 'makerCoefficient': '1',
+        }
+
+    def matchMarketOrder(self, pair: str, side: str, size: float = 0, funds: float = 0) -> tuple[float, float]:
+        """Walk the synthetic order book.
+
+        Levels start half spread away from the mid price, each one level_step further,
+        with depth USD of liquidity each.
+
+        Args:
+            pair (str): e.g. ETH-USDT
+            side (str): 'buy' spends funds of quote currency, 'sell' spends size of base currency
+            size (float, optional): Base currency to sell. Defaults to 0.
+            funds (float, optional): Quote currency to spend. Defaults to 0.
+
+        Returns:
+            tuple[float, float]: (base filled, quote filled)
+        """
+        base, quote = pair.split('-')
+        mid = self.state['prices'][base] / self.state['prices'][quote]
+        level_size = self.state['depth'] / self.state['prices'][base] # base currency at each level
+        base_filled, quote_filled, level = 0.0, 0.0, 0
+        remaining = funds if side == 'buy' else size
+        while remaining > 1e-12 and level < 1000:
+            offset = self.state['spread'] / 2 + level * self.state['level_step']
+            price = mid * (1 + offset) if side == 'buy' else mid * (1 - offset)
+            if side == 'buy':
+                fill = min(level_size, remaining / price)
+                remaining -= fill * price
+            else:
+                fill = min(level_size, remaining)
+                remaining -= fill
+            base_filled += fill
+            quote_filled += fill * price
+            level += 1
+        return base_filled, quote_filled
+
+    def placeOrder(self, params: dict) -> tuple[int, dict]:
+        """Fill a market order against the trade account.
+
+        Returns:
+            tuple[int, dict]: (http status, response body)
+        """
+        pair, side = params.get('symbol', ''), params.get('side', '')
+        if pair not in self.state['pairs'] or side not in ['buy', 'sell'] or params.get('type', 'market') != 'market':
+            return 400, {'code': '400100', 'msg': f'invalid order {pair} {side}'}
+        base, quote = pair.split('-')
+        size, funds = float(params.get('size') or 0), float(params.get('funds') or 0)
+        spends, amount = (quote, funds) if side == 'buy' else (base, size)
+        if amount <= 0:
+            return 400, {'code': '400100', 'msg': 'size or funds required'}
+
+        with self.lock:
+            trade = self.state['balances'].setdefault('trade', {})
+            if trade.get(spends, 0) < amount:
+                return 200, {'code': '200004', 'msg': 'Balance insufficient!'}
+            base_filled, quote_filled = self.matchMarketOrder(pair, side, size, funds)
+            fee = self.state['fee']
+            if side == 'buy':
+                trade[quote] -= funds
+                trade[base] = trade.get(base, 0) + base_filled * (1 - fee)
+            else:
+                trade[base] -= size
+                trade[quote] = trade.get(quote, 0) + quote_filled * (1 - fee)
+            order_id = uuid4().hex[:24]
+            self.orders.append({'id': order_id, 'symbol': pair, 'side': side, 'dealSize': base_filled, 'dealFunds': quote_filled, 'createdAt': int(time() * 1000)})
+        return 200, {'code': '200000', 'data': {'orderId': order_id}}
+
+    def innerTransfer(self, params: dict) -> tuple[int, dict]:
+        """Move balance between main and trade account."""
+        currency, payer, payee = params.get('currency', ''), params.get('from', ''), params.get('to', '')
+        amount = float(params.get('amount') or 0)
+        with self.lock:
+            balances = self.state['balances']
+            if payer not in balances or balances[payer].get(currency, 0) < amount or amount <= 0:
+                return 200, {'code': '200004', 'msg': 'Balance insufficient!'}
+            balances[payer][currency] -= amount
+            payee_balances = balances.setdefault(payee, {})
+            payee_balances[currency] = payee_balances.get(currency, 0) + amount
+        return 200, {'code': '200000', 'data': {'orderId': uuid4().hex[:24]}}
+
+    def getAccounts(self) -> list[dict]:
+        """Balance ledger in /api/v1/accounts format."""
+        with self.lock:
+            return [
+                {'id': uuid4().hex[:24], 'currency': currency, 'type': account, 'balance': str(balance), 'available': str(balance), 'holds': '0'}
+                for account, assets in self.state['balances'].items() for currency, balance in assets.items()
+            ]
+
+    # --- http ---
+
+    def handle(self, method: str, path: str, query: dict, body: dict, headers: dict) -> tuple[int, dict]:
+        """Route a request.
+
+        Returns:
+            tuple[int, dict]: (http status, response body)
+        """
+        sleep(max(0, self.latency + uniform(-self.jitter, self.jitter)))
+        if not self.limiter.acquire(monotonic()):
+            return 429, {'code': '429000', 'msg': 'Too Many Requests'}
+
+        private = ['/api/v1/accounts', '/api/v2/accounts/inner-transfer', '/api/v1/orders']
+        if path in private and headers.get('KC-API-KEY', '') == '':
+            return 401, {'code': '400001', 'msg': 'Please check the header of your request for KC-API-KEY'}
+
+        if method == 'GET' and path == '/api/v1/timestamp':
+            return 200, {'code': '200000', 'data': int(time() * 1000)}
+        if method == 'GET' and path == '/api/v1/accounts':
+            return 200, {'code': '200000', 'data': self.getAccounts()}
+        if method == 'POST' and path == '/api/v2/accounts/inner-transfer':
+            return self.innerTransfer(body)
+        if method == 'GET' and path == '/api/v2/symbols':
+            return 200, {'code': '200000', 'data': self.getPairs()}
+        if method == 'GET' and path == '/api/v1/prices':
+            currencies = [x for x in query.get('currencies', [''])[0].upper().split(',') if x != '']
+            return 200, {'code': '200000', 'data': self.getFiatPrice(currencies, query.get('base', ['USD'])[0])}
+        if method == 'GET' and path == '/api/v1/market/stats':
+            pair = query.get('symbol', [''])[0].upper()
+            if pair not in self.state['pairs']:
+                return 200, {'code': '900001', 'msg': 'Symbol Not Exists'}
+            return 200, {'code': '200000', 'data': self.getMarketStats(pair)}
+        if method == 'POST' and path == '/api/v1/orders':
+            return self.placeOrder(body)
+        return 404, {'code': '404000', 'msg': f'{method} {path} not implemented'}
+
+    def start(self, host: str = '127.0.0.1', port: int = 8901) -> str:
+        """Serve in a background thread.
+
+        Returns:
+            str: Base url to use as kucoin_base_url
+        """
+        simulator = self
+
+        class handler(BaseHTTPRequestHandler):
+            def respond(self, method: str):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = loads(self.rfile.read(length)) if length > 0 else {}
+                except ValueError:
+                    body = {}
+                status, data = simulator.handle(method, url.path, parse_qs(url.query), body, dict(self.headers))
+                payload = dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self): self.respond('GET')
+            def do_POST(self): self.respond('POST')
+            def log_message(self, format, *args): pass
+
+        self.server = ThreadingHTTPServer((host, port), handler)
+        Thread(target=self.server.serve_forever, name='kucoin_simulator', daemon=True).start()
+        return f'http://{host}:{self.server.server_address[1]}'
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Local Kucoin API simulator')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--state', default='', help='json file overriding the default market state')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds each request waits')
+    parser.add_argument('--rate', type=float, default=1200, help='requests per minute')
+    option = parser.parse_args()
+
+    sim = kucoinSimulator(option.state, latency=option.latency, calls_per_minute=option.rate)
+    url = sim.start(port=option.port)
+    lib.printOk(f'Kucoin simulator listening on {url}, set "kucoin_base_url": "{url}" in settings.json')
+    try:
+        while True: sleep(3600)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -0,0 +1,299 @@
+try:
+    from src.lib_tool import lib
+except:
+    from lib_tool import lib
+from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from threading import Lock, local
+from contextlib import contextmanager
+from time import monotonic, sleep
+from random import uniform
+from typing import Callable
+
+#
+# Shared HTTP transport for every price provider (CoinGecko, CoinMarketCap, Kucoin)
+# one keep-alive connection pool per host, connect/read timeouts and gzip
+# requests made with provider='cg' | 'cmc' | 'kc' wait for that provider's rate limiter
+# and are retried with jittered exponential backoff until http_deadline
+# see getHttpClient()
+#
+
+class tokenBucket:
+    """Thread safe token bucket, requests wait for a token instead of being rate limited by the provider.
+
+    Attributes:
+        rate (float): Tokens added per second
+        burst (int): Maximum tokens, requests that can go out back to back
+    """
+
+    def __init__(self, calls_per_minute: float, burst: int) -> None:
+        """Start with a full bucket.
+
+        Raises:
+            ValueError: If calls_per_minute is not positive
+        """
+        if calls_per_minute <= 0:
+            raise ValueError(f'calls_per_minute must be positive, got {calls_per_minute}')
+        self.rate = calls_per_minute / 60
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last = monotonic()
+        self.blocked_until = 0.0 # set by penalize() when the provider rate limited us anyway
+        self.lock = Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Wait for a token.
+
+        Args:
+            deadline (float): time.monotonic() after which to give up
+
+        Returns:
+            bool: True if a token has been taken, False if it would be available after deadline
+        """
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Stop every request of this provider for seconds, e.g. after a 429.
+
+        Args:
+            seconds (float): Seconds to wait
+        """
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, monotonic() + seconds)
+            self.tokens = 0
+
+class httpClient:
+    """Keep-alive HTTP client with per host connection pools and default timeouts.
+
+    Attributes:
+        session (Session): Session shared by every provider, do not set provider specific headers on it
+        timeout (tuple[float, float]): Default (connect, read) timeout in seconds
+        deadline (float): Seconds after which a request stops waiting and retrying
+        limiters (dict[str, tokenBucket]): Rate limiter of each provider
+        scope (local): Per thread deadline set by capDeadline()
+    """
+    # default rate_limits in settings.json
+    DEFAULT_RATE_LIMITS = {
+        'cg': {'calls_per_minute': 30, 'burst': 5},
+        'cmc': {'calls_per_minute': 30, 'burst': 5},
+        'kc': {'calls_per_minute': 300, 'burst': 20},
+    }
+    RETRY_STATUS = [429, 500, 502, 503, 504]
+    IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'] # retried by default, a POST may have been processed
+    BACKOFF_BASE = 1 # seconds, doubled at every retry
+    BACKOFF_MAX = 60
+
+    def __init__(self, timeout: tuple[float, float] = (5, 30), pool_maxsize: int = 10, rate_limits: dict | None = None, deadline: float = 120) -> None:
+        """Initialize session, connection pools and rate limiters.
+
+        Args:
+            timeout (tuple[float, float], optional): (connect, read) timeout in seconds. Defaults to (5, 30).
+            pool_maxsize (int, optional): Connections kept alive for each host. Defaults to 10.
+            rate_limits (dict, optional): provider -> {'calls_per_minute': .., 'burst': ..}. Defaults to DEFAULT_RATE_LIMITS.
+            deadline (float, optional): Seconds after which a request fails. Defaults to 120.
+        """
+        self.timeout = tuple(timeout)
+        self.deadline = deadline
+        self.scope = local()
+        self.limiters: dict[str, tokenBucket] = dict()
+        for provider, default in httpClient.DEFAULT_RATE_LIMITS.items():
+            limit = {**default, **(rate_limits or {}).get(provider, {})}
+            self.limiters[provider] = tokenBucket(limit['calls_per_minute'], limit['burst'])
+        self.session = Session()
+        self.adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+    @contextmanager
+    def capDeadline(self, until: float):
+        """Requests of the current thread stop waiting and retrying at until, if earlier than self.deadline.
+
+        Args:
+            until (float): time.monotonic() value
+        """
+        previous = getattr(self.scope, 'until', None)
+        self.scope.until = until if previous is None else min(previous, until)
+        try:
+            yield
+        finally:
+            self.scope.until = previous
+
+    def get(self, url: str, provider: str = '', **kwargs) -> Response:
+        """Send a GET request, using the default timeout if not specified.
+
+        Args:
+            url (str): Request url
+            provider (str, optional): 'cg', 'cmc' or 'kc' to rate limit and retry the request, see httpClient.request()
+            **kwargs: Same arguments of requests.get (params, headers, timeout...)
+
+        Returns:
+            Response: Response object
+        """
+        return self.request('GET', url, provider, **kwargs)
+
+    def post(self, url: str, provider: str = '', **kwargs) -> Response:
+        """Send a POST request, using the default timeout if not specified.
+
+        Args:
+            url (str): Request url
+            provider (str, optional): 'cg', 'cmc' or 'kc' to rate limit the request, retried only with retry=True, see httpClient.request()
+            **kwargs: Same arguments of requests.post (data, json, headers, timeout...)
+
+        Returns:
+            Response: Response object
+        """
+        return self.request('POST', url, provider, **kwargs)
+
+    def request(self, method: str, url: str, provider: str = '', retry: bool | None = None, sign: Callable[[], dict] | None = None, **kwargs) -> Response:
+        """Send a request through the provider's rate limiter.
+
+        On 429, 5xx, connection errors and timeouts a request that can be retried is sent again after
+        Retry-After (if sent by the server) or a jittered exponential backoff.
+        Once the next attempt would end after self.deadline (or the one of capDeadline()) the last response is returned,
+        or the last exception raised if no response was received.
+
+        Args:
+            method (str): 'GET' or 'POST'
+            url (str): Request url
+            provider (str, optional): 'cg', 'cmc' or 'kc', empty to send the request once without limits
+            retry (bool | None, optional): Retry the request, None to retry IDEMPOTENT_METHODS only. Defaults to None.
+            sign (Callable[[], dict] | None, optional): Build the headers of each attempt, for signed requests
+                whose timestamp would be expired after rate limit waits and backoff. Defaults to None.
+            **kwargs: Same arguments of requests.request
+
+        Returns:
+            Response: Response object
+
+        Raises:
+            ConnectionError | Timeout: If no response has been received before the deadline
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if provider not in self.limiters:
+            return self.session.request(method, url, **kwargs, **({'headers': sign()} if sign is not None else {}))
+
+        limiter = self.limiters[provider]
+        if retry is None:
+            retry = method.upper() in httpClient.IDEMPOTENT_METHODS
+        deadline = monotonic() + self.deadline
+        until = getattr(self.scope, 'until', None)
+        if until is not None:
+            deadline = min(deadline, until)
+        attempt = 0
+        res, error = None, None
+        while True:
+            if not limiter.acquire(deadline):
+                break
+            # a single attempt can not outlast the deadline
+            remaining = max(0.1, deadline - monotonic())
+            timeout = kwargs['timeout'] if isinstance(kwargs['timeout'], tuple) else (kwargs['timeout'], kwargs['timeout'])
+            attempt_kwargs = {**kwargs, 'timeout': tuple(min(t, remaining) for t in timeout)}
+            if sign is not None:
+                attempt_kwargs['headers'] = sign() # signed now, after any wait
+            try:
+                res, error = self.session.request(method, url, **attempt_kwargs), None
+                if res.status_code not in httpClient.RETRY_STATUS:
+                    return res
+                msg = f'error {res.status_code}'
+            except (ConnectionError, Timeout) as e:
+                error = e
+                msg = type(e).__name__
+
+            wait = self.getBackoff(attempt, res if error is None else None)
+            if error is None and res.status_code == 429:
+                limiter.penalize(wait) # every request to this provider waits
+            if not retry:
+                if error is not None:
+                    raise error
+                return res
+            if monotonic() + wait > deadline:
+                break
+            lib.printWarn(f'{provider}: {msg}, retrying after {round(wait, 1)} seconds')
+            sleep(wait)
+            attempt += 1
+
+        lib.printFail(f'{provider}: giving up on {url.split("?")[0]}, retrying would exceed the deadline')
+        if error is not None or res is None:
+            raise error if error is not None else Timeout(f'{provider}: rate limit wait exceeds deadline')
+        return res
+
+    def getBackoff(self, attempt: int, res: Response | None = None) -> float:
+        """Seconds to wait before retrying.
+
+        Args:
+            attempt (int): Number of retries already made
+            res (Response | None, optional): Last response, its Retry-After header is honoured. Defaults to None.
+
+        Returns:
+            float: Seconds to wait
+        """
+        if res is not None and 'Retry-After' in res.headers:
+            try:
+                return float(res.headers['Retry-After']) + uniform(0, 1)
+            except ValueError:
+                pass # http date format, use backoff
+        return uniform(0, min(httpClient.BACKOFF_MAX, httpClient.BACKOFF_BASE * 2 ** attempt)) + httpClient.BACKOFF_BASE
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return connection counters of each host pool.
+
+        Returns:
+            dict[str, dict[str, int]]: host -> {'requests': .., 'opened': .., 'reused': ..}
+                eg. {'api.coingecko.com': {'requests': 3, 'opened': 1, 'reused': 2}}
+        """
+        res = dict()
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None: continue
+            host = pool.host
+            temp = res.setdefault(host, {'requests': 0, 'opened': 0, 'reused': 0})
+            temp['requests'] += pool.num_requests
+            temp['opened'] += pool.num_connections
+            temp['reused'] = temp['requests'] - temp['opened']
+        return res
+
+    def printStats(self) -> None:
+        """Print connection counters of each host pool, see httpClient.stats()."""
+        for host, count in self.stats().items():
+            lib.printWarn(f'{host}: {count["requests"]} requests, {count["opened"]} connections opened, {count["reused"]} reused')
+
+_http_client = None
+_http_client_lock = Lock()
+
+def getHttpClient() -> httpClient:
+    """Return the httpClient shared by the whole process.
+
+    Created on first use, from settings.json:
+        http_timeout: [connect, read] seconds, default [5, 30]
+        http_deadline: seconds after which a request stops retrying, default 120
+        rate_limits: {provider: {'calls_per_minute': .., 'burst': ..}}, see httpClient.DEFAULT_RATE_LIMITS
+
+    Returns:
+        httpClient: Shared client
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            try:
+                settings = lib.getSettings()
+            except Exception:
+                settings = {}
+            _http_client = httpClient(
+                timeout=tuple(settings.get('http_timeout', [5, 30])),
+                rate_limits=settings.get('rate_limits', {}),
+                deadline=settings.get('http_deadline', 120)
+            )
+        return _http_client
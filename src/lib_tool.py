@@ -1,10 +1,8 @@
 from json import load, loads, decoder, dumps
 from datetime import datetime, timedelta
 from os import environ, path, getcwd, mkdir, name
-from pandas import DataFrame
-from numpy import log
-from numpy import sqrt
 from typing import Union
+from pickle import load as pickle_load, dump as pickle_dump, HIGHEST_PROTOCOL
 
 class lib:
     """Utility library providing common functionality for file operations, logging, and data handling.
@@ -245,6 +243,36 @@ class lib:
             return day
         return datetime.strptime(day.split(splitBy)[0], format)
 
+    @staticmethod
+    def fillHourlyGaps(dates: list, columns: dict, fill_gap: Union[list, None] = None) -> tuple[list, dict]:
+        """Forward-fill sparse hourly records onto a complete hourly index.
+
+        Every missing hour between the first and the last date gets the values
+        of the previous record, in a single reindex instead of one insert per hour.
+
+        Args:
+            dates (list): Sorted, unique, hour truncated datetimes of the records
+            columns (dict): key: column name, value: list of values, one for each date
+            fill_gap (Union[list, None], optional): One bool for each date, if False the missing hours
+                right before that record are not added. Defaults to None (fill every gap).
+
+        Returns:
+            tuple: (dates, columns) - complete hourly dates and forward-filled columns, as lists
+        """
+        if len(dates) == 0:
+            return [], {column: [] for column in columns}
+
+        from pandas import DataFrame, Series, date_range # deferred, pandas is slow to import
+        df = DataFrame(columns, index=dates)
+        hourly = df.reindex(date_range(dates[0], dates[-1], freq=timedelta(hours=1))).ffill()
+
+        if fill_gap is not None:
+            # a missing hour is kept only if the next actual record fills its gap
+            next_fills = Series([1.0 if x else 0.0 for x in fill_gap], index=dates).reindex(hourly.index).bfill()
+            hourly = hourly[hourly.index.isin(dates) | (next_fills.values == 1.0)]
+
+        return hourly.index.to_pydatetime().tolist(), {column: hourly[column].tolist() for column in columns}
+
     @staticmethod
     def calcAvgVolatility(total_value: list, avg_period: int = 30):
         """Calculate average volatility over a period.
@@ -264,6 +292,8 @@ class lib:
             lib.printFail(f"Specify a correct avg_period when calling {lib.calcAvgVolatility.__name__}")
             return None
 
+        from pandas import DataFrame # deferred, pandas is slow to import
+        from numpy import log, sqrt
         dataset = DataFrame(total_value) # pandas DF
         dataset = log(dataset/dataset.shift(1)) # numpy.log()
         dataset.fillna(0, inplace = True)
@@ -417,6 +447,34 @@ class lib:
             else: return False, new_file # return new_file to eventually retry later
         return True, ''
 
+    @staticmethod
+    def loadPickleFile(file: str):
+        """Load a precomputed index saved with lib.dumpPickleFile.
+        
+        Args:
+            file (str): Path to pickle file
+            
+        Returns:
+            Any: Loaded object
+            None: If file is missing or corrupted
+        """
+        try:
+            with open(file, 'rb') as f:
+                return pickle_load(f)
+        except Exception:
+            return None
+
+    @staticmethod
+    def dumpPickleFile(file: str, data) -> None:
+        """Save a precomputed index (e.g. symbol -> ids) in a fast-loading binary format.
+        
+        Args:
+            file (str): Path to pickle file
+            data (Any): Object to save
+        """
+        with open(file, 'wb') as f:
+            pickle_dump(data, f, protocol=HIGHEST_PROTOCOL)
+
     @staticmethod
     def loadLiquidStakeCache() -> dict:
         """Load liquid staking data from cache file.
@@ -0,0 +1,123 @@
+try:
+    from src.lib_tool import lib
+except:
+    from lib_tool import lib
+from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from time import perf_counter
+from typing import Callable, Literal
+
+#
+# Order execution engine used by kucoinAutoBalance in yolo and simulation mode
+# legs are queued with addLeg() and executed by run():
+#   a leg depends on every leg queued before it that produces the asset it spends
+#   e.g. sell SOL-USDT and swap USDC-USDT run before buy ETH-USDT
+#   legs without pending dependencies are placed concurrently, up to max_parallel at once
+#
+
+class OrderLeg(BaseModel):
+    """Model for a market order queued in orderEngine"""
+    id: int
+    pair: str                       # e.g. ETH-USDT
+    side: Literal['buy', 'sell']
+    size: float                     # in quote currency if buy, in base currency if sell
+    spends: str                     # asset spent, quote currency if buy, base currency if sell
+    receives: str                   # asset received
+    depends_on: list[int] = []      # ids of legs that must be completed before this one
+    success: bool | None = None     # None until executed
+    latency: float = 0              # seconds spent placing the order
+
+class orderEngine:
+    """Execute market orders respecting their funding dependencies, independent ones concurrently.
+
+    Attributes:
+        legs (list[OrderLeg]): Queued legs, in the order they were added
+    """
+
+    def __init__(self, place_order: Callable[[str, str, float], bool], max_parallel: int = 4, acquire: Callable[[], object] | None = None) -> None:
+        """Initialize the engine.
+
+        Args:
+            place_order (Callable[[str, str, float], bool]): Place an order (pair, side, size), return True if successful
+            max_parallel (int, optional): Maximum orders placed at the same time. Defaults to 4.
+            acquire (Callable[[], object] | None, optional): Called before placing each order, e.g. to wait for a rate limiter. Defaults to None.
+        """
+        self.place_order = place_order
+        self.max_parallel = max(1, max_parallel)
+        self.acquire = acquire
+        self.legs: list[OrderLeg] = []
+
+    def addLeg(self, pair: str, side: str, size: float) -> OrderLeg:
+        """Queue a market order.
+
+        Args:
+            pair (str): Trading pair e.g. ETH-USDT
+            side (str): 'buy' or 'sell'
+            size (float): Size in quote currency if buy, in base currency if sell
+
+        Returns:
+            OrderLeg: Queued leg
+        """
+        base, quote = pair.upper().split('-')
+        spends, receives = (quote, base) if side == 'buy' else (base, quote)
+        depends_on = [leg.id for leg in self.legs if leg.receives == spends]
+        leg = OrderLeg(id=len(self.legs), pair=pair, side=side, size=size, spends=spends, receives=receives, depends_on=depends_on)
+        self.legs.append(leg)
+        return leg
+
+    def executeLeg(self, leg: OrderLeg) -> OrderLeg:
+        """Place the order of leg, measuring its latency."""
+        if self.acquire is not None:
+            self.acquire()
+        start = perf_counter()
+        try:
+            leg.success = bool(self.place_order(leg.pair, leg.side, leg.size))
+        except Exception as e:
+            lib.printFail(f'ORDER_ENGINE: {leg.side.upper()} {leg.pair} raised {e}')
+            leg.success = False
+        leg.latency = perf_counter() - start
+        return leg
+
+    def run(self) -> list[OrderLeg]:
+        """Execute every queued leg.
+
+        A leg starts once all the legs it depends on are completed, successful or not,
+        since the asset it spends may be already available.
+
+        Returns:
+            list[OrderLeg]: Executed legs, with success and latency
+        """
+        if len(self.legs) == 0:
+            return []
+
+        start = perf_counter()
+        done = set()
+        pending = {leg.id: leg for leg in self.legs}
+        running = dict()
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='order_engine') as executor:
+            while len(pending) > 0 or len(running) > 0:
+                # submit legs with completed dependencies, keeping the order they were added
+                for id, leg in list(pending.items()):
+                    if len(running) >= self.max_parallel:
+                        break
+                    if all(dep in done for dep in leg.depends_on):
+                        running[executor.submit(self.executeLeg, leg)] = id
+                        del pending[id]
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    done.add(running.pop(future))
+
+        total = perf_counter() - start
+        self.printReport(total)
+        return self.legs
+
+    def printReport(self, total: float) -> None:
+        """Print latency of each leg and of the whole execution."""
+        lib.printWarn('ORDER_ENGINE: execution report')
+        for leg in self.legs:
+            status = 'OK' if leg.success else 'FAILED'
+            after = f' after {leg.depends_on}' if len(leg.depends_on) > 0 else ''
+            print(f'\t[{leg.id}] {leg.side.upper()} {leg.size} {leg.pair}{after}: {status} in {round(leg.latency * 1000, 1)} ms')
+        serial = sum(leg.latency for leg in self.legs)
+        lib.printWarn(f'ORDER_ENGINE: {len(self.legs)} orders in {round(total * 1000, 1)} ms (placing them one by one: {round(serial * 1000, 1)} ms)')
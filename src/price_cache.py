@@ -0,0 +1,162 @@
+try:
+    from src.lib_tool import lib
+except:
+    from lib_tool import lib
+from json import loads, dumps, decoder
+from time import time
+from threading import Lock, Thread
+from typing import Callable
+from os import getcwd, replace, getpid
+from os.path import join, exists
+
+#
+# On disk price cache for CoinGecko, CoinMarketCap and Yahoo Finance, saved in cache/price_cache.json
+# key: "<provider>:<currency>:<SYMBOL>", value: [price, unix time of retrieval]
+#
+# price age <= ttl                 -> served from cache
+# ttl < price age <= ttl + stale   -> served from cache and refreshed in background, see priceCache.join()
+# otherwise                        -> retrieved before returning
+#
+
+class priceCache:
+    """Persistent TTL price cache with stale-while-revalidate.
+
+    Attributes:
+        ttl (float): Seconds a price is considered fresh, 0 to disable the cache
+        stale (float): Seconds after ttl a price is still served while it is refreshed in background
+        prices (dict): key: "<provider>:<currency>:<SYMBOL>", value: [price, unix time]
+    """
+
+    def __init__(self, ttl: float = 60, stale: float = 600, file_path: str = '') -> None:
+        """Load cached prices.
+
+        Args:
+            ttl (float, optional): Seconds a price is considered fresh. Defaults to 60.
+            stale (float, optional): Seconds after ttl a price is served while refreshed. Defaults to 600.
+            file_path (str, optional): Cache file. Defaults to cache/price_cache.json.
+        """
+        self.ttl = ttl
+        self.stale = stale
+        self.file_path = file_path if file_path != '' else join(getcwd(), 'cache', 'price_cache.json')
+        self.lock = Lock()
+        self.refreshing: list[Thread] = []
+        self.pending = set() # keys being refreshed in background
+        self.prices: dict[str, list] = self.loadFile()
+
+    def loadFile(self) -> dict[str, list]:
+        """Read cache file.
+
+        Returns:
+            dict[str, list]: Cached prices, empty if file is missing or corrupted
+        """
+        if not exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, 'r') as f:
+                data = loads(f.read())
+            return data if isinstance(data, dict) else {}
+        except (OSError, decoder.JSONDecodeError):
+            return {}
+
+    def save(self) -> None:
+        """Write cache file atomically.
+
+        Entries written in the meantime by another run are kept if newer.
+        """
+        with self.lock:
+            for key, item in self.loadFile().items():
+                if key not in self.prices or self.prices[key][1] < item[1]:
+                    self.prices[key] = item
+            data = dumps(self.prices)
+            temp_path = f'{self.file_path}.{getpid()}.tmp'
+            try:
+                with open(temp_path, 'w') as f:
+                    f.write(data)
+                replace(temp_path, self.file_path)
+            except OSError as e:
+                lib.printFail(f'Failed to update {self.file_path}, {e}')
+
+    @staticmethod
+    def toKey(provider: str, currency: str, symbol: str) -> str:
+        return f'{provider}:{currency.upper()}:{symbol.upper()}'
+
+    def update(self, provider: str, currency: str, prices: dict[str, float]) -> None:
+        """Store retrieved prices, invalid prices (e.g. False) are skipped.
+
+        Args:
+            provider (str): 'cg', 'cmc' or 'yahoo'
+            currency (str): Currency of prices
+            prices (dict[str, float]): symbol -> price
+        """
+        now = time()
+        with self.lock:
+            for symbol, price in prices.items():
+                if type(price) in [int, float]:
+                    self.prices[self.toKey(provider, currency, symbol)] = [price, now]
+
+    def getPrices(self, provider: str, currency: str, symbols: list[str], fetch: Callable[[list[str]], dict[str, float]]) -> dict[str, float]:
+        """Return prices of symbols, retrieving with fetch only the missing or expired ones.
+
+        Args:
+            provider (str): 'cg', 'cmc' or 'yahoo'
+            currency (str): Currency of prices
+            symbols (list[str]): Symbols to get price of
+            fetch (Callable[[list[str]], dict[str, float]]): Retrieve prices from the provider, symbol -> price
+
+        Returns:
+            dict[str, float]: symbol (uppercase) -> price
+        """
+        if self.ttl <= 0:
+            return fetch(symbols)
+
+        now = time()
+        res, stale, missing = dict(), list(), list()
+        with self.lock:
+            for symbol in symbols:
+                key = self.toKey(provider, currency, symbol)
+                if key not in self.prices:
+                    missing.append(symbol)
+                    continue
+                price, timestamp = self.prices[key]
+                age = now - timestamp
+                if age <= self.ttl:
+                    res[symbol.upper()] = price
+                elif age <= self.ttl + self.stale:
+                    res[symbol.upper()] = price
+                    if key not in self.pending:
+                        self.pending.add(key)
+                        stale.append(symbol)
+                else: missing.append(symbol)
+
+        if len(stale) > 0:
+            thread = Thread(target=self.refresh, args=(provider, currency, stale, fetch), name=f'price_cache_{provider}')
+            thread.start()
+            with self.lock:
+                # finished refreshes are dropped, the daemon and the api call getPrices without join()
+                self.refreshing = [x for x in self.refreshing if x.is_alive()] + [thread]
+
+        if len(missing) > 0:
+            fetched = fetch(missing)
+            self.update(provider, currency, fetched)
+            self.save()
+            res.update({symbol.upper(): price for symbol, price in fetched.items()})
+        return res
+
+    def refresh(self, provider: str, currency: str, symbols: list[str], fetch: Callable[[list[str]], dict[str, float]]) -> None:
+        """Retrieve and store prices of symbols, run in background by getPrices."""
+        try:
+            self.update(provider, currency, fetch(symbols))
+            self.save()
+        except BaseException as e: # exit() of the providers must not stop the run
+            lib.printFail(f'Failed to refresh cached prices of {symbols}, {e}')
+        finally:
+            with self.lock:
+                for symbol in symbols:
+                    self.pending.discard(self.toKey(provider, currency, symbol))
+
+    def join(self) -> None:
+        """Wait for background refreshes started by getPrices."""
+        with self.lock:
+            refreshing, self.refreshing = self.refreshing, []
+        for thread in refreshing:
+            thread.join()
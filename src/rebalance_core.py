@@ -0,0 +1,125 @@
+from numpy import ndarray, array, zeros, round as np_round, abs as np_abs, where, atleast_2d
+from typing import Iterable
+
+#
+# Portfolio state of kucoinAutoBalance as aligned NumPy arrays over a fixed symbol index
+# index i of every array refers to symbols[i]
+#   actual      value in wallet currency, 0 for assets only in the targets
+#   actual_pct  weight in the wallet, rounded like kucoinAutoBalance always did (4 decimals of percentage)
+#   target      target weight (fraction), 0 for assets only in the wallet
+#   tradable    False for stablecoins and blacklisted assets, they are never rebalanced
+# drift, threshold filtering and order sizing are single vectorized expressions,
+# evaluateTargets() does the same for many candidate allocations at once
+#
+
+class rebalanceCore:
+    """Vectorized drift and order sizing of a portfolio.
+
+    Attributes:
+        symbols (list[str]): Symbol index, new assets (only in targets) first, then wallet assets
+        index (dict[str, int]): symbol -> position in the arrays
+        total (float): Wallet value used as 100%
+    """
+
+    def __init__(self, wallet_values: dict[str, float], targets_pct: dict[str, float], total: float, excluded: Iterable[str] = ()) -> None:
+        """Build the arrays.
+
+        Args:
+            wallet_values (dict[str, float]): Asset -> value in wallet currency, e.g. wallet['asset']
+            targets_pct (dict[str, float]): Asset -> target percentage (0-100), e.g. portfolio_pct.json without min_rebalance
+            total (float): Wallet value used as 100%, e.g. wallet['total_crypto_stable']
+            excluded (Iterable[str], optional): Assets that must not be traded (stablecoins, blacklisted). Defaults to ().
+        """
+        excluded = set(x.upper() for x in excluded)
+        self.symbols = [x for x in targets_pct if x not in wallet_values] + list(wallet_values)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.total = total
+
+        self.actual = array([wallet_values.get(x, 0) for x in self.symbols], dtype=float)
+        self.actual_pct = np_round(self.actual / total * 100, 4) / 100
+        self.target = array([targets_pct.get(x, 0) for x in self.symbols], dtype=float) / 100
+        self.tradable = array([x.upper() not in excluded for x in self.symbols], dtype=bool)
+
+    def update(self, actual: ndarray, total: float) -> None:
+        """Replace actual values and wallet total, e.g. at each step of a backtest.
+
+        Args:
+            actual (ndarray): Value of each asset in wallet currency, aligned to self.symbols
+            total (float): Wallet value used as 100%
+        """
+        self.actual = actual
+        self.total = total
+        self.actual_pct = np_round(actual / total * 100, 4) / 100
+
+    def targetsToArray(self, targets_pct: dict[str, float]) -> ndarray:
+        """Align a candidate allocation to the symbol index, unknown assets are ignored.
+
+        Args:
+            targets_pct (dict[str, float]): Asset -> target percentage (0-100)
+
+        Returns:
+            ndarray: Target weights (fraction)
+        """
+        target = zeros(len(self.symbols))
+        for symbol, pct in targets_pct.items():
+            if symbol in self.index:
+                target[self.index[symbol]] = pct / 100
+        return target
+
+    def expectedValues(self, target: ndarray | None = None) -> ndarray:
+        """Target value of each asset in wallet currency."""
+        return (self.target if target is None else target) * self.total
+
+    def drift(self, target: ndarray | None = None) -> ndarray:
+        """Value to buy (> 0) or sell (< 0) of each asset to reach target, in wallet currency.
+
+        Accepts a single target (n,) or candidates (k, n).
+        """
+        return np_round(self.expectedValues(target) - self.actual_pct * self.total, 10)
+
+    def orderMask(self, drift: ndarray, min_rebalance_pct: float) -> ndarray:
+        """True where the drift is at least min_rebalance_pct of the wallet and the asset is tradable."""
+        drift_pct = np_round(drift / self.total * 100, 10)
+        return (np_abs(drift_pct) >= abs(min_rebalance_pct)) & self.tradable
+
+    def orders(self, min_rebalance_pct: float, target: ndarray | None = None) -> tuple[dict[str, float], dict[str, float]]:
+        """Sell and buy orders needed to reach target.
+
+        Args:
+            min_rebalance_pct (float): Minimum percentage of the wallet an order must move
+            target (ndarray | None, optional): Target weights. Defaults to self.target.
+
+        Returns:
+            tuple[dict[str, float], dict[str, float]]: (sell, buy), asset -> value in wallet currency
+        """
+        drift = self.drift(target)
+        mask = self.orderMask(drift, min_rebalance_pct)
+        sell = {self.symbols[i]: float(-drift[i]) for i in where(mask & (drift < 0))[0]}
+        buy = {self.symbols[i]: float(drift[i]) for i in where(mask & (drift >= 0))[0]}
+        return sell, buy
+
+    def evaluateTargets(self, targets: ndarray, min_rebalance_pct: float, fee: float = 0.001) -> dict[str, ndarray]:
+        """Evaluate many candidate allocations at once.
+
+        Args:
+            targets (ndarray): Candidate target weights (fraction), shape (k, n) aligned to self.symbols
+            min_rebalance_pct (float): Minimum percentage of the wallet an order must move
+            fee (float, optional): Fee of each order. Defaults to 0.001.
+
+        Returns:
+            dict[str, ndarray]: Arrays of shape (k,)
+                trades: orders needed by each candidate
+                turnover: value traded, in wallet currency
+                fees: estimated fees, in wallet currency
+                residual: value still off target after the orders (drift below threshold)
+        """
+        drift = self.drift(atleast_2d(targets))
+        mask = self.orderMask(drift, min_rebalance_pct)
+        traded = np_abs(drift) * mask
+        turnover = traded.sum(axis=1)
+        return {
+            'trades': mask.sum(axis=1),
+            'turnover': turnover,
+            'fees': turnover * fee,
+            'residual': (np_abs(drift) * ~mask * self.tradable).sum(axis=1),
+        }
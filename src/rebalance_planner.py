@@ -0,0 +1,143 @@
+from pydantic import BaseModel
+from typing import Literal
+
+#
+# Netted rebalance planner used by kucoinAutoBalance
+# overweight assets (surplus) are traded directly into underweight ones (deficit)
+# instead of selling every surplus into a quote asset and buying every deficit from it
+#
+# solved as a min-cost flow (successive shortest path) on a transportation network:
+#   source -> surplus asset -> deficit asset -> sink
+#   surplus -> deficit costs 1 fee with a direct pair, 2 fees through the quote asset
+#   the quote asset absorbs the difference between total surplus and total deficit, 1 fee each
+#
+
+class NettedLeg(BaseModel):
+    """Model for a transfer of value planned by nettedPlanner"""
+    spends: str                     # asset sold
+    receives: str                   # asset bought
+    value: float                    # denominated in the wallet currency
+    pair: str = ''                  # e.g. SOL-ETH, empty if routed through the quote asset
+    side: Literal['buy', 'sell', ''] = ''
+    trades: int = 1                 # market orders needed, 2 if routed through the quote asset
+
+class nettedPlanner:
+    """Plan the transfers between surplus and deficit assets that cost less fees.
+
+    Attributes:
+        legs (list[NettedLeg]): Planned transfers, see plan()
+    """
+    EPSILON = 1e-9
+
+    def __init__(self, surplus: dict[str, float], deficit: dict[str, float], pairs: set[str], quote: str, fee: float = 0.001) -> None:
+        """Initialize the planner.
+
+        Args:
+            surplus (dict[str, float]): Asset -> value to sell, in wallet currency (Orders.sell)
+            deficit (dict[str, float]): Asset -> value to buy, in wallet currency (Orders.buy)
+            pairs (set[str]): Enabled trading pairs, e.g. {'SOL-ETH', 'ETH-USDT'}
+            quote (str): Asset the difference between surplus and deficit is sold to / bought from, e.g. USDT
+            fee (float, optional): Taker fee of each trade. Defaults to 0.001.
+        """
+        self.surplus = {k.upper(): v for k, v in surplus.items() if v > 0}
+        self.deficit = {k.upper(): v for k, v in deficit.items() if v > 0}
+        self.pairs = pairs
+        self.quote = quote.upper()
+        self.fee = fee
+        self.legs: list[NettedLeg] = []
+
+    def getTransfer(self, spends: str, receives: str) -> NettedLeg:
+        """Cheapest way to convert spends into receives, value is set by plan()."""
+        if f'{receives}-{spends}' in self.pairs:
+            return NettedLeg(spends=spends, receives=receives, value=0, pair=f'{receives}-{spends}', side='buy')
+        if f'{spends}-{receives}' in self.pairs:
+            return NettedLeg(spends=spends, receives=receives, value=0, pair=f'{spends}-{receives}', side='sell')
+        if self.quote in [spends, receives]:
+            return NettedLeg(spends=spends, receives=receives, value=0) # no pair with the quote asset, still 1 trade
+        return NettedLeg(spends=spends, receives=receives, value=0, trades=2)
+
+    def plan(self) -> list[NettedLeg]:
+        """Solve the transportation problem with successive shortest paths.
+
+        Returns:
+            list[NettedLeg]: Transfers with value > 0
+        """
+        supply = dict(self.surplus)
+        demand = dict(self.deficit)
+        diff = sum(supply.values()) - sum(demand.values())
+        if diff > self.EPSILON: # surplus left is sold to the quote asset
+            demand[self.quote] = demand.get(self.quote, 0) + diff
+        elif diff < -self.EPSILON: # deficit left is bought with the quote asset
+            supply[self.quote] = supply.get(self.quote, 0) - diff
+
+        # nodes: 0 source, 1 sink, then supply and demand assets
+        supply_nodes = list(supply.keys())
+        demand_nodes = list(demand.keys())
+        n = 2 + len(supply_nodes) + len(demand_nodes)
+        graph: list[list[list]] = [[] for _ in range(n)] # edge: [to, capacity, cost, reverse edge index]
+        transfers: dict[tuple[int, int], tuple[NettedLeg, list]] = dict()
+
+        def addEdge(u: int, v: int, capacity: float, cost: float) -> list:
+            graph[u].append([v, capacity, cost, len(graph[v])])
+            graph[v].append([u, 0.0, -cost, len(graph[u]) - 1])
+            return graph[u][-1]
+
+        for i, asset in enumerate(supply_nodes):
+            addEdge(0, 2 + i, supply[asset], 0)
+        for j, asset in enumerate(demand_nodes):
+            addEdge(2 + len(supply_nodes) + j, 1, demand[asset], 0)
+        for i, spends in enumerate(supply_nodes):
+            for j, receives in enumerate(demand_nodes):
+                if spends == receives: continue
+                leg = self.getTransfer(spends, receives)
+                edge = addEdge(2 + i, 2 + len(supply_nodes) + j, float('inf'), leg.trades * self.fee)
+                transfers[(i, j)] = (leg, edge)
+
+        while True:
+            # Bellman-Ford, residual edges have negative costs
+            dist = [float('inf')] * n
+            previous: list[tuple[int, int] | None] = [None] * n
+            dist[0] = 0
+            for _ in range(n - 1):
+                updated = False
+                for u in range(n):
+                    if dist[u] == float('inf'): continue
+                    for index, (v, capacity, cost, _) in enumerate(graph[u]):
+                        if capacity > self.EPSILON and dist[u] + cost < dist[v] - self.EPSILON:
+                            dist[v] = dist[u] + cost
+                            previous[v] = (u, index)
+                            updated = True
+                if not updated: break
+            if dist[1] == float('inf'):
+                break
+
+            # push the bottleneck capacity along the path
+            flow = float('inf')
+            v = 1
+            while v != 0:
+                u, index = previous[v]
+                flow = min(flow, graph[u][index][1])
+                v = u
+            v = 1
+            while v != 0:
+                u, index = previous[v]
+                edge = graph[u][index]
+                edge[1] -= flow
+                graph[v][edge[3]][1] += flow
+                v = u
+
+        self.legs = []
+        for (i, j), (leg, edge) in transfers.items():
+            value = graph[edge[0]][edge[3]][1] # flow is the capacity of the reverse edge
+            if value > self.EPSILON:
+                leg.value = value
+                self.legs.append(leg)
+        return self.legs
+
+    def countTrades(self) -> int:
+        """Market orders needed by the planned legs."""
+        return sum(leg.trades for leg in self.legs)
+
+    def estimateFees(self) -> float:
+        """Fees of the planned legs, in wallet currency."""
+        return sum(leg.value * leg.trades * self.fee for leg in self.legs)
@@ -1,20 +1,31 @@
 try:
     from src.api_kucoin import kc_api
     from src.lib_tool import lib
+    from src.order_engine import orderEngine
+    from src.route_engine import routeEngine, RouteLeg
+    from src.rebalance_planner import nettedPlanner
+    from src.rebalance_core import rebalanceCore
 except:
     from api_kucoin import kc_api
     from lib_tool import lib
+    from order_engine import orderEngine
+    from route_engine import routeEngine, RouteLeg
+    from rebalance_planner import nettedPlanner
+    from rebalance_core import rebalanceCore
 
-from pandas import read_csv, DataFrame
-from os.path import exists
+from pandas import DataFrame
+from os.path import exists, getmtime
 from os.path import join
 from os import getcwd
+from time import time
 from math import ceil, floor, log
 from pydantic import BaseModel, validator
 from typing import Dict, Union, Literal
 
 # Define the allowed execution modes
 ExecutionMode = Literal['simulation', 'interactive', 'yolo']
+# result of kucoinAutoBalance.marketOrder(), pending orders are queued and placed by executeQueuedOrders()
+OrderStatus = Literal['filled', 'pending', 'failed']
 
 class PriceAsset(BaseModel):
     """Model for price_asset2sell and price_asset2buy"""
@@ -32,6 +43,18 @@ class Orders(BaseModel):
     sell: Dict[str, float]  # key: asset, value: amount to rebalance
     buy: Dict[str, float]   # key: asset, value: amount to rebalance
 
+class PairInfo(BaseModel):
+    """Model for an enabled Kucoin trading pair, see kucoinAutoBalance.buildPairIndex"""
+    symbol: str             # e.g. ETH-USDC
+    base: str               # e.g. ETH
+    quote: str              # e.g. USDC
+    base_increment: float
+    quote_increment: float
+    base_precision: int     # decimals allowed for sizes in base currency (SELL)
+    quote_precision: int    # decimals allowed for funds in quote currency (BUY)
+    base_min_size: float
+    price_increment: float = 0  # tick size, used to estimate the spread, see routeEngine
+
 class Error(BaseModel):
     """Model for tracking failed trades"""
     # key: symbol, value: [amount, currency, type]
@@ -75,6 +98,17 @@ class kucoinAutoBalance:
         # Remove the logic that reads from settings and validates here
         # It's now handled by the caller (calculateWalletValue)
         # --- End Execution Mode Logic ---
+
+        # yolo and simulation orders are queued and executed together by orderEngine, see executeQueuedOrders()
+        # interactive orders are placed one by one, after user confirmation
+        self.engine: orderEngine | None = None
+        if self.execution_mode in ['yolo', 'simulation']:
+            kc_limiter = self.kc.http.limiters.get('kc')
+            self.engine = orderEngine(
+                place_order=self.placeMarketOrder,
+                max_parallel=self.settings.get('kucoin_max_parallel_orders', 4),
+                acquire=(lambda: kc_limiter.acquire(float('inf'))) if kc_limiter is not None else None
+            )
         
         ########################################################################
         # Every data structures that are part of the class are defined down here
@@ -94,6 +128,15 @@ class kucoinAutoBalance:
         #               e.g. USDC, USDT, BTC ecc
         #     )
         self.kc_info = lib.loadJsonFile('kc_info.json')
+
+        # Kucoin symbols, loaded once, see retrieveKCSymbol()
+        self.kc_symbols: DataFrame | None = None
+        self.kc_symbols_updated = False # True if symbols were downloaded during this run
+        # built from self.kc_symbols, see buildPairIndex()
+        self.pair_index: Dict[str, Dict[str, PairInfo]] = {} # key: base currency, value: {quote currency: PairInfo}
+        self.pair_by_symbol: Dict[str, PairInfo] = {} # key: pair e.g. ETH-USDC
+        # multi-hop routes for assets without a direct pair, see getRouteEngine()
+        self.route_engine: routeEngine | None = None
         
         # key: symbol to trade, but not tradable for every reason
         # value: amount to trade, currency, type ['buy' or 'sell']
@@ -116,6 +159,10 @@ class kucoinAutoBalance:
             # value: asset price pulled from KuCoin api
         self.price_asset2sell = PriceAsset(data={})
         self.price_asset2buy = PriceAsset(data={})
+        # Kucoin prices of every asset the plan touches, retrieved with one request
+        # and shared by every phase, see loadPriceSnapshot() and getSnapshotPrice()
+        self.price_snapshot = PriceAsset(data={})
+        self.price_snapshot_time = 0.0
         
         self.buy_power = BuyPower(
             normal={
@@ -132,66 +179,53 @@ class kucoinAutoBalance:
         self.getActualPct()
 
     # get actual wallet asset percentage
+    # targets, actual values and weights are kept aligned in self.core, see rebalanceCore
     def getActualPct(self):
-        for symb, value in self.wallet['asset'].items():
+        excluded = [x for x in set(self.wallet['asset']) | set(self.portfolio_pct_target)
+                    if x.lower() in self.config['supportedStablecoin'] or x.upper() in self.kc_info['symbol_blacklist']]
+        self.core = rebalanceCore(self.wallet['asset'], self.portfolio_pct_target, self.wallet['total_crypto_stable'], excluded)
+        for symb in self.wallet['asset']:
             # calc each asset weight in the portfolio
-            self.portfolio_pct_wallet[symb] = round(value / self.wallet['total_crypto_stable'] * 100, 4) / 100
+            self.portfolio_pct_wallet[symb] = float(self.core.actual_pct[self.core.index[symb]])
 
     # get target wallet asset value
     def getExpextedValues(self) -> dict:
-        expected_value = dict()
-        for symbol, value in self.portfolio_pct_target.items():
-            expected_value[symbol] = value/100 * self.wallet['total_crypto_stable']
-
-        return expected_value
+        expected_value = self.core.expectedValues()
+        return {symbol: float(expected_value[self.core.index[symbol]]) for symbol in self.portfolio_pct_target}
 
+    # sell/buy every tradable asset whose drift from its target is at least min_rebalance_pct of the wallet
+    # assets in portfolio_pct.json but not in wallet are bought, assets in wallet but not in portfolio_pct.json are sold
     def loadOrders(self):
-        wallet_expected_value = self.getExpextedValues()
-        
-        # Find coins that are in wallet_expected_value but not in current wallet
-        new_coins = set(wallet_expected_value.keys()) - set(self.wallet['asset'].keys())
-        
-        # Process new coins first
-        for symb in new_coins:
-            # Skip stablecoins and blacklisted symbols
-            if symb.lower() in self.config['supportedStablecoin'] or \
-               symb.upper() in self.kc_info['symbol_blacklist']: 
-                continue
-            
-            buy_size = wallet_expected_value[symb]
-            buy_size_pct = round(buy_size / self.wallet["total_crypto_stable"] * 100, 10)
-            
-            # if order size percentage > minimum rebalance percentage
-            if abs(buy_size_pct) >= abs(self.min_rebalance_pct):
-                self.orders.buy[symb] = buy_size
-                self.orders.tot_buy_size += buy_size
-
-        # Process existing assets in the wallet
-        for symb in self.wallet['asset'].keys():
-            # Skip stablecoins and blacklisted symbols
-            if symb.lower() in self.config['supportedStablecoin'] or \
-               symb.upper() in self.kc_info['symbol_blacklist']: 
-                continue
-
-            if symb in wallet_expected_value:
-                expected_value = wallet_expected_value[symb]
-            else:
-                expected_value = 0
-            
-            actual_value = self.portfolio_pct_wallet[symb]*self.wallet["total_crypto_stable"]
-            # buy_size is the amount to be sold/bought to rebalance the portfolio
-            buy_size = round(expected_value-actual_value, 10)
-            buy_size_pct = round(buy_size / self.wallet["total_crypto_stable"] * 100, 10) # buy_size in percentage
-
-            # if order size percentage > minimum rebalance percentage
-            if abs(buy_size_pct) >= abs(self.min_rebalance_pct):
-                buy_size = abs(buy_size)
-                if buy_size_pct < 0:
-                    self.orders.sell[symb] = buy_size
-                    self.orders.tot_buy_size -= buy_size
-                else:
-                    self.orders.buy[symb] = buy_size
-                    self.orders.tot_buy_size += buy_size
+        self.orders.sell, self.orders.buy = self.core.orders(self.min_rebalance_pct)
+        self.orders.tot_buy_size = sum(self.orders.buy.values()) - sum(self.orders.sell.values())
+
+    # retrieve with a single request the prices of the assets to sell/buy and of the whitelisted quote assets
+    def loadPriceSnapshot(self):
+        assets = set(x.upper() for x in self.kc_info['tradable_counterpart_whitelist'])
+        assets.update(x.upper() for x in list(self.orders.sell.keys()) + list(self.orders.buy.keys()))
+        self.price_snapshot = PriceAsset(data=self.kc.getFiatPrice(list(assets)) if len(assets) > 0 else {})
+        self.price_snapshot_time = time()
+
+    # retrieve again the snapshot prices if older than kucoin_price_max_age seconds (settings.json, default 30)
+    # update also price_asset2sell and price_asset2buy, used to calc orders size
+    def refreshPriceSnapshot(self):
+        if time() - self.price_snapshot_time <= self.settings.get('kucoin_price_max_age', 30) or len(self.price_snapshot.data) == 0:
+            return
+        self.price_snapshot.data.update(self.kc.getFiatPrice(list(self.price_snapshot.data.keys())))
+        self.price_snapshot_time = time()
+        for prices in [self.price_asset2sell.data, self.price_asset2buy.data]:
+            for symbol in prices:
+                if symbol in self.price_snapshot.data:
+                    prices[symbol] = self.price_snapshot.data[symbol]
+
+    # return Kucoin prices of assets denominated in self.wallet['currency'], from the price snapshot
+    # assets not in the snapshot are retrieved together with one request and added to it
+    def getSnapshotPrice(self, assets: list[str]) -> Dict[str, float]:
+        assets = set(x.upper() for x in assets)
+        missing = [x for x in assets if x not in self.price_snapshot.data]
+        if len(missing) > 0:
+            self.price_snapshot.data.update(self.kc.getFiatPrice(missing))
+        return {x: self.price_snapshot.data[x] for x in assets if x in self.price_snapshot.data}
 
     # calc buy power take into account:
     #   - availlable liquidity on kc (e.g. usdc, usdt)
@@ -219,7 +253,7 @@ class kucoinAutoBalance:
             #       add it to buy power
             symbol = symbol.lower()
             if symbol in self.wallet['kucoin_asset']:
-                asset_price = self.kc.getFiatPrice([symbol])[symbol.upper()] 
+                asset_price = self.getSnapshotPrice([symbol])[symbol.upper()] 
                 self.price_asset2sell.data[symbol.upper()] = asset_price
                 available_value = self.wallet['kucoin_asset'][symbol] * asset_price
                 diff = round(available_value, 10) - round(amount, 10)
@@ -262,7 +296,7 @@ class kucoinAutoBalance:
             return
 
         # tradable asset is the available asset on Kucoin balance that are also in 'tradable_counterpart_whitelist'
-        tradable_asset_kc_price = self.kc.getFiatPrice(list(tradable_asset))
+        tradable_asset_kc_price = self.getSnapshotPrice(list(tradable_asset))
         # calc the actual buy power on kucoin denominated in self.wallet['currency']
         isAdded = []
         for symbol, price in tradable_asset_kc_price.items():
@@ -279,59 +313,149 @@ class kucoinAutoBalance:
         if self.debug_mode: print('calcBuyPower: total buy size:', self.orders.tot_buy_size, self.orders.currency) 
         if self.debug_mode: print('calcBuyPower: buy power', self.buy_power)
 
+    # return Kucoin symbols, kept in memory for the life of the rebalancer
+    # they are downloaded again only if force_update or older than kucoin_symbol_ttl seconds (settings.json, default 1 day)
     def retrieveKCSymbol(self, force_update: bool = False):
-        filename = join(getcwd(), 'cache','kucoin_symbol.csv')
-        if not exists(filename) or force_update:
+        if self.kc_symbols is not None and not force_update:
+            return self.kc_symbols
+
+        filename = self.kc.symbol_path
+        ttl = self.settings.get('kucoin_symbol_ttl', 86400)
+        if not exists(filename) or force_update or time() - getmtime(filename) > ttl:
             if not self.kc.getSymbols():
                 lib.printFail('Error on retrieving Kucoin symbols...')
                 exit()
+            self.kc_symbols_updated = True
         
-        return read_csv(filename)
+        self.kc_symbols = self.kc.loadSymbols()
+        self.buildPairIndex(self.kc_symbols)
+        return self.kc_symbols
+
+    # return the number of decimals allowed by an increment, e.g. 0.001 -> 3
+    def getIncrementPrecision(self, increment: float) -> int:
+        if increment <= 0 or increment >= 1:
+            return 0
+        return abs(floor(log(increment, 10)))
+
+    # index enabled trading pairs by base currency, with increments, precisions and min size already parsed
+    # so pair selection and precision lookup do not scan every Kucoin symbol for each order
+    def buildPairIndex(self, kucoin_symbol_df: DataFrame):
+        self.pair_index = {}
+        self.pair_by_symbol = {}
+        self.route_engine = None # built again on the new pairs
+        columns = ['symbol', 'baseCurrency', 'quoteCurrency', 'baseIncrement', 'quoteIncrement', 'baseMinSize', 'enableTrading']
+        # symbols cached before priceIncrement was saved do not have it
+        df = kucoin_symbol_df if 'priceIncrement' in kucoin_symbol_df.columns else kucoin_symbol_df.assign(priceIncrement=0)
+        for symbol, base, quote, base_increment, quote_increment, base_min_size, enable_trading, price_increment in df[columns + ['priceIncrement']].itertuples(index=False):
+            if enable_trading != True: continue
+            pair = PairInfo(
+                symbol=symbol, base=base, quote=quote,
+                base_increment=float(base_increment), quote_increment=float(quote_increment),
+                base_precision=self.getIncrementPrecision(float(base_increment)),
+                quote_precision=self.getIncrementPrecision(float(quote_increment)),
+                base_min_size=float(base_min_size),
+                price_increment=float(price_increment)
+            )
+            self.pair_index.setdefault(base, {})[quote] = pair
+            self.pair_by_symbol[symbol] = pair
+
+    # return the routeEngine over every enabled pair, built once per pair index
+    # edges are priced with a single request of every Kucoin fiat price
+    # fee: kucoin_taker_fee (settings.json, default 0.001), max hops: kucoin_max_route_hops (default 3)
+    def getRouteEngine(self) -> routeEngine:
+        self.retrieveKCSymbol()
+        if self.route_engine is None:
+            prices = self.kc.getFiatPrice([])
+            self.price_snapshot.data.update({k: v for k, v in prices.items() if k not in self.price_snapshot.data})
+            self.route_engine = routeEngine(
+                pairs=[(p.symbol, p.base, p.quote, p.price_increment) for p in self.pair_by_symbol.values()],
+                prices=prices,
+                fee=self.settings.get('kucoin_taker_fee', 0.001),
+                max_hops=self.settings.get('kucoin_max_route_hops', 3),
+                ttl=self.settings.get('kucoin_symbol_ttl', 86400)
+            )
+        return self.route_engine
+
+    # buy symbol through the cheapest route from the whitelisted assets with enough buy power
+    # e.g. USDT -> BTC -> XYZ when XYZ is quoted only in BTC
+    # sizes are estimated from the price snapshot, each hop loses kucoin_taker_fee
+    # amount is taken from the buy power of the source once its leg is placed, so the next routes do not spend it again
+    # @return True if every leg of the route has been placed or queued, see OrderStatus
+    def routeBuyOrder(self, symbol: str, amount: float) -> bool:
+        sources = [asset for asset, value in self.buy_power.normal.items() if value >= amount]
+        if len(sources) == 0:
+            return False
+        engine = self.getRouteEngine()
+        legs: list[RouteLeg] = engine.getRoute(sources, symbol)
+        if len(legs) == 0:
+            return False
+
+        prices = self.getSnapshotPrice([leg.spends for leg in legs] + [symbol])
+        if any(leg.spends not in prices for leg in legs):
+            return False
+        lib.printWarn(f'PREPARE_BUY: {symbol.upper()} has no direct pair, route: {" -> ".join([legs[0].spends] + [leg.receives for leg in legs])}')
+
+        # buy power keys are not always uppercase, the route ones are
+        source = next(asset for asset in sources if asset.upper() == legs[0].spends)
+        value = amount # denominated in self.wallet['currency']
+        for i, leg in enumerate(legs):
+            pair = self.pair_by_symbol[leg.pair]
+            if leg.side == self.BUY:
+                # funds in quote currency
+                size = round(value / prices[leg.spends], pair.quote_precision)
+            else:
+                # size in base currency
+                size = floor(value / prices[leg.spends] * 10**pair.base_precision) / 10**pair.base_precision
+                if size < pair.base_min_size:
+                    lib.printFail(f'PREPARE_BUY: route leg {leg.pair} size {size} is below minimum size {pair.base_min_size}')
+                    return False
+            if size <= 0 or self.marketOrder(leg.pair, leg.side, size) == 'failed':
+                return False
+            if i == 0:
+                self.buy_power.normal[source] -= amount
+                self.buy_power.tot_buy_power -= amount
+            value *= 1 - engine.fee
+        return True
 
     # return a list with the best trading pair for each crypto based on side (buy or sell)
     # and eventually a list with missing ones
     def searchBestTradingPairs(self, side): # rewrite to automate everything
-        def getIsSell(side: str) -> bool:
-            return True if side==self.SELL else False
+        # pair precision is given by baseIncrement for sell orders, quoteIncrement for buy orders
+        def getPairPrecision(pair: PairInfo, side: str) -> int:
+            return pair.base_precision if side == self.SELL else pair.quote_precision
 
-        # this function return the pair precision using the order of magnitude of subset['baseMinSize']
-        def getPairPrecision(subset: DataFrame, side: str):
-            if getIsSell(side):
-                increment = subset['baseIncrement'].iloc[0]
-            else:
-                increment = subset['quoteIncrement'].iloc[0]
-            
-            from math import log, floor
-            return abs(floor(log(increment, 10)))
+        # enabled pairs of symbol quoted in an asset with buy power
+        def getPairs(symbol: str, quotes: set) -> list[PairInfo]:
+            return [pair for quote, pair in self.pair_index.get(symbol, {}).items() if quote in quotes]
 
         if side not in [self.BUY, self.SELL]:
             return [], []
         
         return_dict = dict()
         missing_list = []
-        kucoin_symbol_df = self.retrieveKCSymbol(force_update=True)
+        self.retrieveKCSymbol() # load symbols and self.pair_index
         orders = self.orders.buy if side == self.BUY else self.orders.sell
+        quotes = set(x.upper() for x in self.buy_power.normal.keys())
         for symbol, amount in orders.items():
             if self.debug_mode: print(f'searchBestTradingPairs: searching pairs to {(side+"ing").upper()}', symbol, 'for', self.wallet['currency'], round(amount, 2))
-            temp = [x.upper() for x in self.buy_power.normal.keys()]
-            subset = kucoin_symbol_df[ # in the future, may be it's a good idea to cache this result for every coin
-                (kucoin_symbol_df['baseCurrency'] == symbol.upper())
-                & (kucoin_symbol_df['enableTrading'] == True)
-                & (kucoin_symbol_df['quoteCurrency'].isin(temp))
-            ]
-            
-            if len(subset) == 0: # coin not found, skipping
+            num_symbol = symbol.upper()
+            pairs = getPairs(num_symbol, quotes)
+
+            if len(pairs) == 0 and not self.kc_symbols_updated:
+                # coin not found in cached symbols, it may have been listed recently
+                self.retrieveKCSymbol(force_update=True)
+                pairs = getPairs(num_symbol, quotes)
+
+            if len(pairs) == 0: # coin not found, skipping
                 missing_list.append(symbol)
                 continue
             
-            num_symbol = symbol.upper()
-            if len(subset) == 1: # 1 coin found
-                pair_precision = getPairPrecision(subset, side)
-                return_dict[symbol] = (f'{num_symbol}-{subset["quoteCurrency"].iloc[0]}', pair_precision)
+            if len(pairs) == 1: # 1 coin found
+                return_dict[symbol] = (pairs[0].symbol, getPairPrecision(pairs[0], side))
                 continue
 
             # calc each price subset market pairs
-            temp = self.kc.getFiatPrice(subset['baseCurrency'].to_list() + subset['quoteCurrency'].to_list())
+            temp = self.getSnapshotPrice([num_symbol] + [pair.quote for pair in pairs])
 
             pair_prices = dict()
             for den_symbol, price in temp.items():
@@ -352,7 +476,7 @@ class kucoinAutoBalance:
             if side == self.SELL: 
                 best_pair = list(pair_prices.keys())[-1]
             
-            pair_precision = getPairPrecision(subset[subset['quoteCurrency'] == best_pair.split('-')[1]], side)
+            pair_precision = getPairPrecision(self.pair_by_symbol[best_pair], side)
             return_dict[symbol] = (best_pair, pair_precision )
 
         return return_dict, missing_list
@@ -390,9 +514,11 @@ class kucoinAutoBalance:
                 lib.printFail(f'PREPARE_BUY: Cannot buy {symbol.upper()} - symbol is blacklisted')
 
         for symbol in not_available:
-            self.error.failed_trades[symbol] = [self.orders.buy[symbol], self.wallet['currency'], self.BUY]
+            if symbol not in self.orders.buy: continue # blacklisted
+            if not self.routeBuyOrder(symbol, self.orders.buy[symbol]):
+                self.error.failed_trades[symbol] = [self.orders.buy[symbol], self.wallet['currency'], self.BUY]
+                lib.printFail(f'PREPARE_BUY: Cannot BUY {symbol.upper()} on Kucoin, no trading pair available!')
             del self.orders.buy[symbol]
-            lib.printFail(f'PREPARE_BUY: Cannot BUY {symbol.upper()} on Kucoin, no trading pair available!')
         
         most_liq_asset = sorted(self.buy_power.normal)
         prepare_order = dict() # this will contain the order that are needed to prepare the final swap
@@ -414,7 +540,7 @@ class kucoinAutoBalance:
                         # need to be tested
                         # take the amout of a token, multiply it by its value
                         # compare it to the value needed (converted back to EUR for comparison)
-                        avail_liquidity_value = self.wallet['kucoin_asset'][avail_asset.lower()] * self.kc.getFiatPrice([avail_asset], self.wallet['currency'], False)[avail_asset]
+                        avail_liquidity_value = self.wallet['kucoin_asset'][avail_asset.lower()] * self.getSnapshotPrice([avail_asset])[avail_asset]
                         amount_quote_asset_needed_eur = amount_quote_asset_needed * self.price_asset2buy.data[quote_asset_needed]
                         if avail_liquidity_value >= amount_quote_asset_needed_eur:
                             quote_asset_available = avail_asset
@@ -428,7 +554,7 @@ class kucoinAutoBalance:
                     
                     # Convert quote asset needed to base asset amount for the swap
                     # amount_quote_asset_needed is already in quote currency, convert to base currency for swap
-                    quote_asset_available_price = self.kc.getFiatPrice([quote_asset_available], self.wallet['currency'], False)[quote_asset_available]
+                    quote_asset_available_price = self.getSnapshotPrice([quote_asset_available])[quote_asset_available]
                     amount = ceil(amount_quote_asset_needed * self.price_asset2buy.data[quote_asset_needed] / quote_asset_available_price) - self.wallet['kucoin_asset'][quote_asset_needed.lower()]
                     pair = f'{quote_asset_available}-{quote_asset_needed}'
                     if pair not in prepare_order:
@@ -440,7 +566,7 @@ class kucoinAutoBalance:
                 del self.orders.buy[symbol]
                 lib.printFail(f'PREPARE_BUY: {symbol} cannot be swapped, needed {amount_quote_asset_needed:.2f} {quote_asset_needed}')
 
-        kucoin_symbol_df = self.retrieveKCSymbol() # Ensure symbols are loaded
+        self.retrieveKCSymbol() # Ensure symbols and self.pair_by_symbol are loaded
         adjusted_prepare_order = {}
         for pair, calculated_amount in prepare_order.items():
             asset_to_sell = self.getBaseCurrency(pair).lower()
@@ -448,31 +574,9 @@ class kucoinAutoBalance:
             available_balance = self.wallet['kucoin_asset'].get(asset_to_sell, 0.0)
 
             # Get precision for the asset being sold (base currency)
-            symbol_info = kucoin_symbol_df[kucoin_symbol_df['symbol'] == pair.upper()]
-            precision = 8 # Default precision if not found
-            if not symbol_info.empty:
-                try:
-                    # Use baseIncrement for SELL orders (selling the base currency)
-                    increment_str = symbol_info['baseIncrement'].iloc[0]
-                    if isinstance(increment_str, str): # Check if it's a string before processing
-                        if '.' in increment_str:
-                            precision = len(increment_str.split('.')[-1].rstrip('0')) # Use rstrip('0') for cases like 0.1000
-                        elif 'e-' in increment_str: # Handle scientific notation like 1e-8
-                            precision = int(increment_str.split('e-')[-1])
-                        elif increment_str == '1': # Handle cases like '1' where precision is 0
-                             precision = 0
-                        # Add more robust parsing if other formats exist
-                    elif isinstance(increment_str, (int, float)): # Handle numeric increments directly if they occur
-                         increment_val = float(increment_str)
-                         if increment_val == 1:
-                              precision = 0
-                         elif increment_val < 1:
-                              precision = abs(floor(log(increment_val, 10))) # Calculate precision from float
-                         # Handle other numeric cases if necessary
-
-                except Exception as e:
-                     lib.printWarn(f"PREPARE_BUY: Could not determine precision for {pair} baseIncrement, using default {precision}. Error: {e}")
-
+            # Use baseIncrement for SELL orders (selling the base currency)
+            pair_info = self.pair_by_symbol.get(pair.upper())
+            precision = pair_info.base_precision if pair_info is not None else 8 # Default precision if not found
 
             adjusted_amount = calculated_amount
             if calculated_amount > available_balance:
@@ -487,12 +591,7 @@ class kucoinAutoBalance:
             adjusted_amount_precise = floor(float(adjusted_amount) * (10**precision)) / (10**precision)
 
             # Check minimum order size (baseMinSize for SELL)
-            min_size = 0.0
-            if not symbol_info.empty:
-                try:
-                    min_size = float(symbol_info['baseMinSize'].iloc[0])
-                except Exception as e:
-                    lib.printWarn(f"PREPARE_BUY: Could not determine baseMinSize for {pair}, using default {min_size}. Error: {e}")
+            min_size = pair_info.base_min_size if pair_info is not None else 0.0
 
             if adjusted_amount_precise >= min_size: # Check if adjusted amount meets minimum size
                 adjusted_prepare_order[pair] = adjusted_amount_precise
@@ -507,11 +606,13 @@ class kucoinAutoBalance:
              # res = self.marketOrder(pair, self.SELL, round(amount, 2))
              # --- Use the precise amount calculated above ---
              # Amount here is already precision-adjusted and checked against min size
-             res = self.marketOrder(pair, self.SELL, amount) 
-             if res:
+             res: OrderStatus = self.marketOrder(pair, self.SELL, amount) 
+             if res == 'filled':
                  available_asset = self.getBaseCurrency(pair)
                  asset_needed = self.getQuoteCurrency(pair)
                  if self.debug_mode: print(f'prepareBuyOrders: swapped {round(amount, 2)} {self.orders.currency} worth of {available_asset} to {asset_needed}')
+             elif res == 'pending':
+                 if self.debug_mode: print(f'prepareBuyOrders: {pair} swap queued, result reported by executeQueuedOrders')
              else:
                  if self.debug_mode: print(f'prepareBuyOrders: {pair} not swapped')
 
@@ -533,8 +634,8 @@ class kucoinAutoBalance:
                 amount_in_quote = round(amount_in_curr/self.price_asset2buy.data[convert2], available_pairs[symbol][1])
                 if self.debug_mode: print('executeBuyOrders:', available_pairs[symbol][0], 'BUYING', amount_in_quote, available_pairs[symbol][0].split('-')[1])
 
-                res: bool = self.marketOrder(available_pairs[symbol][0], self.BUY, amount_in_quote)
-                if not res:
+                res: OrderStatus = self.marketOrder(available_pairs[symbol][0], self.BUY, amount_in_quote)
+                if res == 'failed':
                     self.error.failed_trades[available_pairs[symbol][0]] = [amount, self.wallet['currency'], self.BUY]
             else: 
                 self.error.failed_trades[symbol] = [amount, self.wallet['currency'], self.BUY]
@@ -560,8 +661,8 @@ class kucoinAutoBalance:
                 if amount_in_crypto <= 0: continue
                 if self.debug_mode: print('executeSellOrders:', available_pairs[symbol][0], 'SELLING', amount_in_crypto, symbol) 
                 
-                res = self.marketOrder(available_pairs[symbol][0], self.SELL, amount_in_crypto)
-                if not res:
+                res: OrderStatus = self.marketOrder(available_pairs[symbol][0], self.SELL, amount_in_crypto)
+                if res == 'failed':
                     self.error.failed_trades[available_pairs[symbol][0]] = [amount_in_curr, self.wallet['currency'], self.SELL]
             else: 
                 self.error.failed_trades[symbol] = [amount_in_curr, self.wallet['currency'], self.SELL]
@@ -571,33 +672,44 @@ class kucoinAutoBalance:
     # e.g. pair: SOL-USDC
     # if side == buy , size must be denominated in quotecurrency e.g. USDC
     # if side == sell, size must be denominated in basecurrency e.g. SOL
-    def marketOrder(self, pair, side, size):
+    # in yolo and simulation mode the order is only queued and 'pending' is returned, see executeQueuedOrders()
+    def marketOrder(self, pair, side, size) -> OrderStatus:
         if not self.isPairValid(pair):
             lib.printFail(f"MARKET_ORDER: Invalid pair format '{pair}'")
-            return False
+            return 'failed'
 
         log_prefix = f"[{self.execution_mode.upper()}]"
 
-        # --- Simulation Mode Check (Primary) ---
-        if self.execution_mode == 'simulation':
-            lib.printWelcome(f"{log_prefix} Would place {side.upper()} order for size {size} on {pair}")
-            return True # Return immediately for simulation
-        # --- End Simulation Mode Check ---
+        # --- Yolo and Simulation: queue the order ---
+        if self.engine is not None:
+            leg = self.engine.addLeg(pair, side, size)
+            if self.debug_mode: print(f'marketOrder: queued [{leg.id}] {side.upper()} {size} {pair}{" after " + str(leg.depends_on) if leg.depends_on else ""}')
+            return 'pending'
+        # --- End Queue ---
 
         # --- Interactive Confirmation (Only if interactive mode) ---
-        user_confirmed = True # Default to True (for yolo mode)
         if self.execution_mode == 'interactive':
             lib.printAskUserInput(f"{log_prefix} Confirm {side.upper()} order for size {size} on {pair}? (y/n): ", end='')
             proceed = lib.getUserInput().lower()
             if proceed != 'y':
-                user_confirmed = False
                 lib.printWarn(f"{log_prefix} Skipped {side.upper()} order for {pair} by user.")
-                # Return False if skipped by user in interactive mode
-                return False
+                # Return 'failed' if skipped by user in interactive mode
+                return 'failed'
         # --- End Interactive Confirmation ---
 
-        # Proceed only if in 'yolo' mode OR ('interactive' mode AND user_confirmed is True)
-        # Note: user_confirmed check is implicitly handled by the return False above for interactive skips.
+        return 'filled' if self.placeMarketOrder(pair, side, size) else 'failed'
+
+    # place market order on Kucoin, in simulation mode log it only
+    def placeMarketOrder(self, pair, side, size):
+        log_prefix = f"[{self.execution_mode.upper()}]"
+
+        # --- Simulation Mode Check (Primary) ---
+        if self.execution_mode == 'simulation':
+            lib.printWelcome(f"{log_prefix} Would place {side.upper()} order for size {size} on {pair}")
+            return True # Return immediately for simulation
+        # --- End Simulation Mode Check ---
+
+        # Proceed only if in 'yolo' mode OR ('interactive' mode AND user confirmed)
         try:
             lib.printWelcome(f"{log_prefix} ATTEMPTING: Placing {side.upper()} order for size {size} on {pair}")
             orderid: str = self.kc.placeOrder(pair, side, size)
@@ -612,8 +724,46 @@ class kucoinAutoBalance:
             lib.printFail(f"{log_prefix} ERROR: Exception during {side.upper()} order for {pair}: {e}")
             return False
 
+    # execute orders queued by marketOrder in yolo and simulation mode
+    # sells and swaps that fund a quote asset are placed before the buys that spend it
+    def executeQueuedOrders(self):
+        if self.engine is None:
+            return
+        for leg in self.engine.run():
+            if leg.success:
+                lib.printOk(f'EXECUTE_QUEUED: {leg.side.upper()} {leg.pair} done, spent {leg.size} {leg.spends}')
+                continue
+            # size is denominated in the asset spent, failed_trades amounts in self.wallet['currency']
+            price = self.getSnapshotPrice([leg.spends]).get(leg.spends.upper(), 0)
+            self.error.failed_trades[leg.pair] = [leg.size * price, self.wallet['currency'], leg.side]
+            lib.printFail(f'EXECUTE_QUEUED: {leg.side.upper()} {leg.pair} failed, {leg.size} {leg.spends} not spent')
+
+    # compare the current plan with the netted one, see nettedPlanner
+    # surplus assets are traded directly into deficit assets, the quote asset with more buy power absorbs the rest
+    def printNettedPlan(self):
+        self.retrieveKCSymbol()
+        fee = self.settings.get('kucoin_taker_fee', 0.001)
+        if len(self.buy_power.normal) > 0:
+            quote = max(self.buy_power.normal, key=self.buy_power.normal.get)
+        elif len(self.kc_info['tradable_counterpart_whitelist']) > 0:
+            quote = self.kc_info['tradable_counterpart_whitelist'][0]
+        else:
+            return
+        planner = nettedPlanner(self.orders.sell, self.orders.buy, set(self.pair_by_symbol.keys()), quote, fee)
+        planner.plan()
+
+        current_trades = len(self.orders.sell) + len(self.orders.buy)
+        current_fees = (sum(self.orders.sell.values()) + sum(self.orders.buy.values())) * fee
+        lib.printWarn("Netted Plan:")
+        for leg in planner.legs:
+            through = f'{leg.side.upper()} {leg.pair}' if leg.pair != '' else (f'through {planner.quote}' if leg.trades == 2 else '')
+            lib.printWarn(f"  - {leg.spends} -> {leg.receives} {through} ({leg.value:.2f} {self.orders.currency})")
+        lib.printWarn(f"  current plan: {current_trades} trades, est. fees {current_fees:.2f} {self.orders.currency}")
+        lib.printWarn(f"  netted plan:  {planner.countTrades()} trades, est. fees {planner.estimateFees():.2f} {self.orders.currency}")
+
     def run(self):
         self.loadOrders()
+        self.loadPriceSnapshot()
         self.calcBuyPower()
 
         # --- Display Plan --- 
@@ -643,6 +793,7 @@ class kucoinAutoBalance:
                 amount, currency, trade_type = details
                 lib.printFail(f"  - Cannot {trade_type.upper()} {symbol}: Amount {amount:.2f} {currency} (Reason logged previously)") # Changed to printFail
 
+        self.printNettedPlan()
         lib.printWarn("--- End Plan ---") # Changed to printWarn
 
         # --- Execution Start Message --- 
@@ -654,8 +805,11 @@ class kucoinAutoBalance:
              lib.printWelcome("Proceeding to execute orders automatically (YOLO mode!)...")
         # --- End Execution Start Message ---
 
+        self.refreshPriceSnapshot()
         self.executeSellOrders()
+        self.refreshPriceSnapshot()
         self.executeBuyOrders()
+        self.executeQueuedOrders()
 
         if self.debug_mode: print('ORDERS not executed', self.error.failed_trades)
         # after execute everything
@@ -1,7 +1,7 @@
 from src.lib_tool import lib
+from src.history_store import getHistoryStore
 from matplotlib.pyplot import title, show, subplots, xticks
 from seaborn import set_style
-from json import loads
 from os.path import join
  
 class cryptoBalanceReport:
@@ -27,6 +27,7 @@ class cryptoBalanceReport:
         self.supportedStablecoin = self.config['supportedStablecoin']
         lib.printWelcome(f'Welcome to Crypto Balance Report!')
         self.settings['wallet_path'] = join(self.settings['path'], 'walletValue.json')
+        self.wallet_store = getHistoryStore(self.settings)
         self.cryptos = set()
         self.ticker = []
         self.special_ticker = ['stablecoin']
@@ -54,11 +55,7 @@ class cryptoBalanceReport:
         Adds special #STABLE ticker for aggregated stablecoin view.
         Adds special tickers for staked assets.
         """
-        with open(self.settings['wallet_path'], 'r') as f:
-            for line in f:
-                crypto_list = loads(line)['crypto'][1:]  # skip the first element
-                for sublist in crypto_list:
-                    self.cryptos.add(sublist[0])
+        self.cryptos = self.wallet_store.getTickers()
         
         # Create special tickers for staked assets
         special_tickers = ['#STABLE']  # Start with existing special ticker
@@ -99,6 +96,24 @@ class cryptoBalanceReport:
         #else: self.ticker = [self.cryptos[index-len(self.special_ticker)].lower()]
         self.ticker = self.cryptos[index]
 
+    # symbols recorded in walletValue.json that self.ticker is made of
+    def getTickerSymbols(self) -> list[str]:
+        """Get the recorded symbols needed to build self.ticker history.
+
+        Returns:
+            list[str]: #STABLE -> every stablecoin, #<BASE> -> base asset and its liquid staked derivatives,
+                otherwise the ticker itself
+        """
+        if not self.ticker.startswith('#'):
+            return [self.ticker]
+
+        recorded = self.wallet_store.getTickers()
+        if self.ticker == '#STABLE':
+            return [symbol for symbol in recorded if symbol.lower() in self.supportedStablecoin]
+        base_asset = self.ticker[1:].lower()
+        derivatives = self.liquid_stake_reverse.get(base_asset, [])
+        return [symbol for symbol in recorded if symbol.lower() in derivatives or symbol.lower() == base_asset]
+
     # change the dates between which you view the report
     def chooseDateRange(self):
         """Allow user to select date range for analysis.
@@ -139,89 +154,41 @@ class cryptoBalanceReport:
         For staked assets, handles both base assets and their derivatives.
         """
         lib.printWarn(f'Loading value from {self.settings["wallet_path"]}...')
-        with open(self.settings['wallet_path'], 'r') as file:
-            firstI = True
-            file = list(file)
-            for index, line in enumerate(file):
-                temp = loads(line)
-                temp['date'] = lib.parse_formatDate(temp['date'], format='%d/%m/%Y %H', splitBy=':')
-                crypto_list = temp['crypto'][1:]
-
-                if self.ticker.startswith('#'):
-                    # Handle special tickers (#STABLE or staked assets)
-                    total_amount = 0
-                    total_fiat = 0
-                    
-                    if self.ticker == '#STABLE':
-                        # Handle stablecoins
-                        for item in crypto_list:
-                            if item[0].lower() in self.supportedStablecoin:
-                                total_amount += item[1]
-                                total_fiat += item[2]
-                    else:
-                        # Handle staked assets (e.g., #SOL, #ATOM)
-                        base_asset = self.ticker[1:].lower()  # Remove # and convert to lowercase
-                        if base_asset in self.liquid_stake_reverse:
-                            derivatives = self.liquid_stake_reverse[base_asset]
-                            for item in crypto_list:
-                                if item[0].lower() in derivatives or item[0].lower() == base_asset:
-                                    total_amount += item[1]
-                                    total_fiat += item[2]
-                    
-                    if firstI:
-                        self.data['amount'].append(total_amount)
-                        self.data['fiat'].append(total_fiat)
-                        self.data['date'].append(temp['date'])
-                        firstI = False
-                        continue
+        dates, amounts, fiats = [], [], []
+        fill_gap = [] # False for records where self.ticker is not held, see lib.fillHourlyGaps
+        # load only the assets needed by self.ticker, records in chronological order
+        for date, crypto_list in self.wallet_store.iterAssetHistory(self.getTickerSymbols()):
+            date = lib.parse_formatDate(date, format='%d/%m/%Y %H', splitBy=':')
 
-                    lastDatePlus1h = lib.getNextHour(self.data['date'][-1])
-                    if temp['date'] == lastDatePlus1h:
-                        self.data['amount'].append(total_amount)
-                        self.data['fiat'].append(total_fiat)
-                    else:
-                        self.data['amount'].append(self.data['amount'][-1])
-                        self.data['fiat'].append(self.data['fiat'][-1])
-                        file.insert(int(index)+1, line)
-                    self.data['date'].append(lastDatePlus1h)
-                    continue
+            if self.ticker.startswith('#'):
+                # Handle special tickers (#STABLE or staked assets)
+                # crypto_list contains only stablecoins or base asset and its derivatives
+                dates.append(date)
+                amounts.append(sum(item[1] for item in crypto_list))
+                fiats.append(sum(item[2] for item in crypto_list))
+                fill_gap.append(True)
+                continue
 
-                # Original code for single cryptocurrency
-                isfound = False
-                for item in crypto_list:
-                    if item[0] == self.ticker:
-                        isfound = True
-                        if firstI: # first iteration of external loop
-                            self.data['amount'].append(item[1])
-                            self.data['fiat'].append(item[2])
-                            self.data['date'].append(temp['date'])
-                            firstI = False
-                            continue
-                        
-                        # calculate the last date in self.data['date'] + 1 hour
-                        lastDatePlus1h = lib.getNextHour(self.data['date'][-1])
-                        # check if the new date to add is equal to lastDatePlus1h
-                        if temp['date'] == lastDatePlus1h:
-                            self.data['amount'].append(item[1])
-                            self.data['fiat'].append(item[2])
-                        else: # maybe there will be a bug if temp['date'] < lastDatePlus1h ???
-                            self.data['amount'].append(self.data['amount'][-1])
-                            self.data['fiat'].append(self.data['fiat'][-1])
-                            file.insert( int(index)+1, line) 
-                            # add line again because we added the same amount of the last in list
-                            # otherwise it didn't work properly
-                        self.data['date'].append(lastDatePlus1h)
-                if isfound == False:
-                    if firstI:
-                        # begin to add values from when self.ticker exist in json file
-                        continue
+            # Original code for single cryptocurrency
+            if len(crypto_list) > 0:
+                dates.append(date)
+                amounts.append(crypto_list[0][1])
+                fiats.append(crypto_list[0][2])
+                fill_gap.append(True)
+            elif len(dates) > 0:
+                # begin to add values from when self.ticker exist in json file
+                # if self.ticker is not found and it's not the first record
+                # it means that self.ticker is being sold so amount = 0 and value = 0
+                # the hours missing right before this record are not filled
+                dates.append(date)
+                amounts.append(0)
+                fiats.append(0)
+                fill_gap.append(False)
 
-                    # if self.ticker is not found and it's not the first iteration
-                    # it means that self.ticker is being sold so amount = 0 and value = 0
-                    self.data['amount'].append(0)
-                    self.data['fiat'].append(0)     
-                    self.data['date'].append(temp['date'])
-                    isfound = False
+        # fill missing hours with the previous record's values
+        self.data['date'], columns = lib.fillHourlyGaps(dates, {'amount': amounts, 'fiat': fiats}, fill_gap)
+        self.data['amount'] = columns['amount']
+        self.data['fiat'] = columns['fiat']
 
     def genPlt(self) -> None:
         """Generate and display visualization of crypto data.
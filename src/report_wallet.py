@@ -1,8 +1,11 @@
-from src.api_yahoo_f import yahooGetPriceOf
+from src.api_yahoo_f import yahooFxCache
 from src.lib_tool import lib
+from src.history_store import getHistoryStore
 from matplotlib.pyplot import figure, title, show, plot, xticks
 from seaborn import set_style
 from json import loads
+from os.path import join
+from datetime import datetime
 
 # 
 # See value of your crypto/total wallet over time
@@ -29,8 +32,10 @@ class walletBalanceReport:
         self.version = self.config['version']
         self.supportedFiat = self.config['supportedFiat']
         self.supportedStablecoin = self.config['supportedStablecoin']
-        self.settings['wallet_path'] = self.settings['path']+ '\\walletValue.json'
+        self.settings['wallet_path'] = join(self.settings['path'], 'walletValue.json')
+        self.wallet_store = getHistoryStore(self.settings)
         self.include_total_invested = False 
+        self.fx = yahooFxCache() # historical forex rates, used when a record's currency differs from settings.json
         self.data = {
             'date': [],
             'total_invested': [],
@@ -48,25 +53,23 @@ class walletBalanceReport:
             lib.printFail('Unexpected error, pass the correct argument, run again with option --help')
             exit()
 
-    def getForexRate(self, line: dict):
+    def getForexRate(self, line: dict, date: datetime):
         """Get forex rate for currency conversion.
         
-        Handles EUR/USD conversions using Yahoo Finance rates.
+        Converts line's currency into settings.json currency using the
+        historical daily rate of the record date, see yahooFxCache.
         
         Args:
             line (dict): Data line containing currency information
+            date (datetime): Date of the record
             
         Returns:
-            float: Exchange rate if conversion needed
-            False: If no conversion needed or currencies not supported
+            float: Exchange rate to multiply line's values by
+            False: If currencies not supported or rate not available
         """
-        if self.settings["currency"] == 'EUR' and line['currency'] == 'USD':
-            # get forex rate using yahoo api
-            return yahooGetPriceOf(f'{self.settings["currency"]}{line["currency"]}=X')
-        elif self.settings["currency"] == 'USD' and line['currency'] == 'EUR':
-            return yahooGetPriceOf(f'{line["currency"]}{self.settings["currency"]}=X')
-        else:
+        if line['currency'].lower() not in self.supportedFiat or self.settings['currency'].lower() not in self.supportedFiat:
             return False
+        return self.fx.getRate(line['currency'], self.settings['currency'], date)
 
     def chooseDateRange(self):
         """Allow user to select date range for analysis.
@@ -111,60 +114,44 @@ class walletBalanceReport:
         if input().lower() in ['y', 'yes', 'si', '']:
             self.include_total_invested = True
         
-        with open(self.settings['wallet_path'], 'r') as f:
-            firstI = True # first interaction
-            f = list(f) # each element of 'f' is a line
-            for i, line in enumerate(f):
-                if type(line) != dict:
-                    line = loads(line)
-
-                # check field needed
-                if 'total_crypto_stable' not in line.keys() and self.type == 'crypto':
-                    continue
-                if 'total_value' not in line.keys() and self.type == 'total':
+        dates, total_values, total_invested = [], [], []
+        for i, line in enumerate(self.wallet_store.iterRecords(with_assets=False)): # records in chronological order
+            # check field needed
+            if 'total_crypto_stable' not in line.keys() and self.type == 'crypto':
+                continue
+            if 'total_value' not in line.keys() and self.type == 'total':
+                continue
+            if self.include_total_invested:
+                if 'total_invested' not in line.keys():
                     continue
-                if self.include_total_invested:
-                    if 'total_invested' not in line.keys():
-                        continue
 
-                temp_date = lib.parse_formatDate(line['date'], format='%d/%m/%Y %H', splitBy=':') # parse date format: dd/mm/yyyy hh
-                if self.type == 'total':
-                    total_value = line['total_value']
-                elif self.type == 'crypto':
-                    total_value = line['total_crypto_stable']
-                else: 
-                    lib.printFail('Unexpected error')
-                    exit()
+            temp_date = lib.parse_formatDate(line['date'], format='%d/%m/%Y %H', splitBy=':') # parse date format: dd/mm/yyyy hh
+            if self.type == 'total':
+                total_value = line['total_value']
+            elif self.type == 'crypto':
+                total_value = line['total_crypto_stable']
+            else: 
+                lib.printFail('Unexpected error')
+                exit()
 
-                # if currency of json line is different from settings.json currency
-                if line['currency'] != self.settings['currency']: 
-                    rate = self.getForexRate(line)
-                    if not rate:
-                        lib.printFail(f'Currency not supported, check {self.settings["wallet_path"]} line: {i+1}')
-                        exit()
-                    total_value /= rate # convert value using current forex rate
+            # if currency of json line is different from settings.json currency
+            if line['currency'] != self.settings['currency']: 
+                rate = self.getForexRate(line, temp_date)
+                if not rate:
+                    lib.printFail(f'Currency not supported, check {self.settings["wallet_path"]} line: {i+1}')
+                    exit()
+                total_value *= rate # convert value using the forex rate of the record date
 
-                if firstI:
-                    self.data['date'].append(temp_date)
-                    self.data['total_value'].append(total_value)
-                    if self.include_total_invested: self.data['total_invested'].append(line['total_invested'])
-                    firstI = False
-                    continue
-                
-                # calculate the last date in list + 1 hour
-                lastDatePlus1h = lib.getNextHour(self.data['date'][-1])
-                # check if temp_date (new date to add) is equal to lastDatePlus1h
-                if temp_date == lastDatePlus1h:
-                    self.data['total_value'].append(total_value)
-                    if self.include_total_invested:  self.data['total_invested'].append(line['total_invested'])
-                else: # maybe there will be a bug if temp_date < lastDatePlus1h ???
-                    self.data['total_value'].append(self.data['total_value'][-1])
-                    if self.include_total_invested: self.data['total_invested'].append(self.data['total_invested'][-1])
-                    f.insert(int(i)+1, line)
-                    # add line again because we added the same amount of the last in list
-                    # otherwise it didn't work properly
+            dates.append(temp_date)
+            total_values.append(total_value)
+            if self.include_total_invested: total_invested.append(line['total_invested'])
 
-                self.data['date'].append(lastDatePlus1h)
+        # fill missing hours with the previous record's values
+        columns = {'total_value': total_values}
+        if self.include_total_invested: columns['total_invested'] = total_invested
+        self.data['date'], columns = lib.fillHourlyGaps(dates, columns)
+        self.data['total_value'] = columns['total_value']
+        if self.include_total_invested: self.data['total_invested'] = columns['total_invested']
 
     def __calcTotalVolatility(self):
         """Calculate total portfolio volatility.
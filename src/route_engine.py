@@ -0,0 +1,155 @@
+try:
+    from src.lib_tool import lib
+except:
+    from lib_tool import lib
+from pydantic import BaseModel
+from heapq import heappush, heappop
+from json import loads, dumps, decoder
+from math import log
+from time import time
+from os import getcwd, replace
+from os.path import join, exists
+from typing import Literal
+
+#
+# Multi-hop routing over Kucoin markets, used by kucoinAutoBalance when no direct pair is available
+# every enabled pair BASE-QUOTE is two edges of the graph:
+#   QUOTE -> BASE   buy
+#   BASE  -> QUOTE  sell
+# edge weight: -log((1 - fee) * (1 - spread)), spread estimated as priceIncrement / pair price
+# so the shortest path (Dijkstra over (asset, trades) states) is the conversion that loses less value within max_hops
+# found routes are cached in cache/kucoin_routes.json, see routeEngine.getRoute()
+#
+
+class RouteLeg(BaseModel):
+    """Model for a single trade of a route"""
+    pair: str                       # e.g. ETH-BTC
+    side: Literal['buy', 'sell']
+    spends: str                     # asset spent
+    receives: str                   # asset received
+
+class routeEngine:
+    """Find the cheapest sequence of trades to convert an asset into another.
+
+    Attributes:
+        graph (dict): key: asset, value: list of (weight, next asset, pair, side)
+        routes (dict): Cached routes, key: "<SOURCES>><TARGET>", value: {'legs': [[pair, side], ...], 'time': unix time}
+    """
+
+    def __init__(self, pairs: list[tuple[str, str, str, float]], prices: dict[str, float], fee: float = 0.001, max_hops: int = 3, ttl: float = 86400) -> None:
+        """Build the market graph.
+
+        Args:
+            pairs (list[tuple[str, str, str, float]]): Enabled pairs (symbol, base, quote, priceIncrement)
+            prices (dict[str, float]): Asset -> price in the same currency, from one batched price snapshot
+            fee (float, optional): Taker fee of each trade. Defaults to 0.001.
+            max_hops (int, optional): Maximum trades of a route. Defaults to 3.
+            ttl (float, optional): Seconds a cached route is valid. Defaults to 86400.
+        """
+        self.fee = fee
+        self.max_hops = max_hops
+        self.ttl = ttl
+        self.cache_path = join(getcwd(), 'cache', 'kucoin_routes.json')
+        self.pairs = set()
+        self.graph: dict[str, list[tuple[float, str, str, str]]] = dict()
+        for symbol, base, quote, price_increment in pairs:
+            if base not in prices or quote not in prices or prices[quote] <= 0:
+                continue # unable to price this market
+            self.pairs.add(symbol)
+            pair_price = prices[base] / prices[quote]
+            spread = min(price_increment / pair_price, 0.5) if pair_price > 0 else 0.5
+            weight = -log(1 - fee) - log(1 - spread)
+            self.graph.setdefault(quote, []).append((weight, base, symbol, 'buy'))
+            self.graph.setdefault(base, []).append((weight, quote, symbol, 'sell'))
+        self.routes = self.loadRoutes()
+
+    def loadRoutes(self) -> dict:
+        """Read cached routes, empty if missing or corrupted."""
+        if not exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = loads(f.read())
+            return data if isinstance(data, dict) else {}
+        except (OSError, decoder.JSONDecodeError):
+            return {}
+
+    def saveRoutes(self) -> None:
+        """Write cached routes atomically."""
+        temp_path = f'{self.cache_path}.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(dumps(self.routes))
+            replace(temp_path, self.cache_path)
+        except OSError as e:
+            lib.printFail(f'Failed to update {self.cache_path}, {e}')
+
+    def findRoute(self, sources: list[str], target: str) -> list[RouteLeg]:
+        """Shortest path from any of sources to target within max_hops (Dijkstra).
+
+        Args:
+            sources (list[str]): Assets that can be spent, e.g. ['USDT', 'USDC']
+            target (str): Asset to receive
+
+        Returns:
+            list[RouteLeg]: Trades to execute in order, empty if target is not reachable within max_hops
+        """
+        if target in sources:
+            return []
+        # state is (asset, trades so far): a cheaper route with more trades must not hide
+        # a costlier one that is the only route within max_hops
+        dist = {(source, 0): 0.0 for source in sources}
+        previous: dict[tuple[str, int], tuple[str, str, str]] = dict() # (asset, hops) -> (previous asset, pair, side)
+        heap = [(0.0, 0, source) for source in sources]
+        found = None
+        while len(heap) > 0:
+            cost, hops, asset = heappop(heap)
+            if cost > dist.get((asset, hops), float('inf')):
+                continue
+            if asset == target and hops > 0:
+                found = (asset, hops)
+                break
+            if hops >= self.max_hops:
+                continue
+            for weight, next_asset, pair, side in self.graph.get(asset, []):
+                next_cost = cost + weight
+                if next_cost < dist.get((next_asset, hops + 1), float('inf')):
+                    dist[(next_asset, hops + 1)] = next_cost
+                    previous[(next_asset, hops + 1)] = (asset, pair, side)
+                    heappush(heap, (next_cost, hops + 1, next_asset))
+
+        if found is None:
+            return []
+        legs = []
+        asset, hops = found
+        while hops > 0:
+            prev_asset, pair, side = previous[(asset, hops)]
+            legs.append(RouteLeg(pair=pair, side=side, spends=prev_asset, receives=asset))
+            asset, hops = prev_asset, hops - 1
+        return legs[::-1]
+
+    def getRoute(self, sources: list[str], target: str) -> list[RouteLeg]:
+        """Cached shortest path from any of sources to target, see findRoute().
+
+        A cached route is used if younger than ttl and all its pairs are still tradable.
+
+        Returns:
+            list[RouteLeg]: Trades to execute in order, empty if target is not reachable
+        """
+        sources = sorted(set(x.upper() for x in sources))
+        target = target.upper()
+        key = f'{",".join(sources)}>{target}'
+        cached = self.routes.get(key)
+        if cached is not None and len(cached['legs']) > 0 and time() - cached['time'] <= self.ttl and all(pair in self.pairs for pair, _ in cached['legs']):
+            legs = []
+            for pair, side in cached['legs']:
+                base, quote = pair.split('-')
+                legs.append(RouteLeg(pair=pair, side=side, spends=quote if side == 'buy' else base, receives=base if side == 'buy' else quote))
+            return legs
+
+        legs = self.findRoute(sources, target)
+        if len(legs) == 0:
+            return legs # not cached, a missing price or pair may be back at the next run
+        self.routes[key] = {'legs': [[leg.pair, leg.side] for leg in legs], 'time': time()}
+        self.saveRoutes()
+        return legs
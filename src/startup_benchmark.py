@@ -0,0 +1,69 @@
+from subprocess import run, DEVNULL
+from statistics import median
+from argparse import ArgumentParser
+from os.path import dirname, abspath
+from time import perf_counter
+import sys
+
+#
+# Cold start benchmark of main.py, used as a regression budget
+# each case runs in a fresh interpreter, so nothing is already imported:
+#   --version and --help parse arguments only
+#   every subcommand of main.COMMANDS is imported, without running it (no network, no files written)
+# the median of some runs is compared with BUDGETS (seconds),
+# exits with 1 if a case is over budget
+#
+# run from the repository root:
+#   python src/startup_benchmark.py [--runs 5] [--scale 1.5]
+#
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+# seconds, measured cold start with some headroom
+BUDGETS = {
+    '--version': 0.4,
+    '--help': 0.4,
+    'calc': 1.5,
+    'report': 3.5,
+    'singleCrypto': 3.0,
+    'backtest': 1.2,
+    'sweep': 1.2,
+    'daemon': 1.5,
+    'serve': 1.5,
+    'compact': 1.0,
+}
+
+def getCases() -> dict[str, list[str]]:
+    """Command line of each case."""
+    cases = {flag: [sys.executable, 'main.py', flag] for flag in ('--version', '--help')}
+    for name in BUDGETS:
+        if not name.startswith('--'):
+            cases[name] = [sys.executable, '-c', f'import main; main.loadCommand({name!r})']
+    return cases
+
+def timeCase(cmd: list[str], runs: int) -> float:
+    """Median wall time of cmd over runs fresh processes, in seconds."""
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        run(cmd, cwd=ROOT, stdout=DEVNULL, stderr=DEVNULL, check=True)
+        times.append(perf_counter() - start)
+    return median(times)
+
+def main() -> int:
+    parser = ArgumentParser(description='cold start time of each main.py command')
+    parser.add_argument('--runs', type=int, default=5, help='runs of each case, the median is kept')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget, e.g. on slow machines')
+    option = parser.parse_args()
+
+    over = 0
+    for name, cmd in getCases().items():
+        elapsed = timeCase(cmd, option.runs)
+        budget = BUDGETS[name] * option.scale
+        status = 'ok' if elapsed <= budget else 'OVER BUDGET'
+        over += elapsed > budget
+        print(f'{name:<14} {elapsed * 1000:8.0f} ms  budget {budget * 1000:6.0f} ms  {status}')
+    return 1 if over else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+try:
+    from src.lib_tool import lib
+    from src.valuation_daemon import valuationDaemon
+    from src.rebalance_core import rebalanceCore
+except:
+    from lib_tool import lib
+    from valuation_daemon import valuationDaemon
+    from rebalance_core import rebalanceCore
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+from datetime import datetime
+from threading import Lock, Thread
+from time import monotonic
+from json import dumps
+from os.path import exists
+
+#
+# Local HTTP/JSON API over a warm valuationDaemon, for dashboards and scripts
+#
+#   GET /valuation                  date, totals and currency of the latest valuation, ?refresh=1 to value again
+#   GET /assets                     [{symbol, qta, value, type}] of the latest valuation
+#   GET /history?start=&end=        walletValue.json records, dates as YYYY-MM-DD or YYYY-MM-DDTHH, both optional
+#   GET /history/asset?symbol=BTC,ETH&start=&end=   [{date, assets: [[symbol, qta, value]]}]
+#   GET /rebalance                  sell and buy orders portfolio_pct.json needs, computed like kucoinAutoBalance.loadOrders()
+#                                   liquid staked assets are counted in their base token, see calculateWalletValue.rebalancerData()
+#
+# identical concurrent requests share one computation and its result is reused for api_cache_ttl seconds,
+# see singleFlight, so many consumers cost one provider fetch
+# a valuation runs only when the cached one is older than api_cache_ttl (or on refresh), in memory:
+# the history is appended by the valuationDaemon schedule only (daemon_interval in settings.json),
+# then every cached result is dropped, see singleFlight.invalidate()
+#
+
+DEFAULT_PORT = 8902
+DEFAULT_TTL = 60
+
+class singleFlight:
+    """Share one in-flight call, and its result for ttl seconds, between callers of the same key."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL) -> None:
+        self.ttl = ttl
+        self.lock = Lock()
+        self.calls: dict[Hashable, Future] = {}
+        self.results: dict[Hashable, tuple[float, Any]] = {} # key -> (monotonic time, result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], refresh: bool = False) -> Any:
+        """Return the cached result of key, join the call in flight or run fn.
+
+        Args:
+            key (Hashable): Identity of the request
+            fn (Callable[[], Any]): Computation, run by the first caller only
+            refresh (bool, optional): Ignore the cached result, a call in flight is still joined. Defaults to False.
+
+        Returns:
+            Any: Result of fn, exceptions of fn are raised to every caller
+        """
+        with self.lock:
+            cached = self.results.get(key)
+            if not refresh and cached is not None and monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e: # SystemExit of calculateWalletValue too
+            with self.lock:
+                del self.calls[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.results[key] = (monotonic(), result)
+            del self.calls[key]
+        future.set_result(result)
+        return result
+
+    def invalidate(self) -> None:
+        """Forget every cached result, e.g. after a new valuation."""
+        with self.lock:
+            self.results.clear()
+
+class valuationServer:
+    """Serve valuations, history and rebalance plans as JSON.
+
+    Attributes:
+        daemon (valuationDaemon): Warm valuation state
+        flight (singleFlight): Coalesced and cached computations
+    """
+
+    def __init__(self, type_: str = 'crypto', host: str | None = None, port: int | None = None) -> None:
+        """Build the valuation state once.
+
+        Args:
+            type_ (str, optional): 'crypto' or 'total'. Defaults to 'crypto'.
+            host (str | None, optional): Defaults to api_host in settings.json or 127.0.0.1.
+            port (int | None, optional): Defaults to api_port in settings.json or DEFAULT_PORT.
+        """
+        self.daemon = valuationDaemon(type_)
+        self.settings = self.daemon.calc.settings
+        self.host = host if host is not None else self.settings.get('api_host', '127.0.0.1')
+        self.port = port if port is not None else self.settings.get('api_port', DEFAULT_PORT)
+        self.flight = singleFlight(self.settings.get('api_cache_ttl', DEFAULT_TTL))
+        # a scheduled valuation appends to the history, cached history and valuations are outdated
+        self.daemon.on_persist = self.flight.invalidate
+        self.server: ThreadingHTTPServer | None = None
+
+    def getWallet(self, refresh: bool = False) -> dict:
+        """Latest valuation, valued again in memory if missing, older than the cache ttl or on refresh."""
+        return self.flight.do('valuation', lambda: self.daemon.revalue(persist=False), refresh)
+
+    @staticmethod
+    def parseDate(value: str | None) -> datetime | None:
+        """Parse YYYY-MM-DD or YYYY-MM-DDTHH, None if missing.
+
+        Raises:
+            ValueError: If value is not a date
+        """
+        if value is None or value == '':
+            return None
+        return datetime.strptime(value, '%Y-%m-%dT%H' if 'T' in value else '%Y-%m-%d')
+
+    def getValuation(self, refresh: bool = False) -> dict:
+        """Date, totals and currency of the latest valuation."""
+        wallet = self.getWallet(refresh)
+        keys = ['date', 'currency', 'total_value', 'total_crypto_stable', 'total_invested']
+        return {key: wallet.get(key) for key in keys}
+
+    def getAssets(self) -> list[dict]:
+        """Quantity, value and type of each asset of the latest valuation."""
+        wallet = self.getWallet()
+        return [{'symbol': x.symbol, 'qta': x.qta, 'value': x.value, 'type': x.type} for x in wallet['asset']]
+
+    def getHistory(self, start: datetime | None, end: datetime | None) -> list[dict]:
+        """walletValue.json records within [start, end]."""
+        return self.flight.do(('history', start, end), lambda: list(self.daemon.calc.wallet_store.iterRecords(start, end)))
+
+    def getAssetHistory(self, symbols: tuple[str, ...], start: datetime | None, end: datetime | None) -> list[dict]:
+        """Quantity and value of symbols in each record within [start, end]."""
+        def load() -> list[dict]:
+            store = self.daemon.calc.wallet_store
+            return [{'date': date, 'assets': assets} for date, assets in store.iterAssetHistory(list(symbols), start, end)]
+        return self.flight.do(('asset', symbols, start, end), load)
+
+    def getRebalancePlan(self) -> dict:
+        """Orders that bring the latest valuation to portfolio_pct.json, nothing is executed.
+
+        Returns:
+            dict: min_rebalance, sell and buy (asset -> value in wallet currency)
+        """
+        wallet = self.getWallet()
+        def plan() -> dict:
+            portfolio_pct = lib.loadJsonFile('portfolio_pct.json')
+            targets = {k: v for k, v in portfolio_pct.items() if k != 'min_rebalance'}
+            with self.daemon.lock: # wallet_liquid_stake is replaced by each valuation
+                ls_asset = self.daemon.calc.handleLiquidStake()
+            assets = self.daemon.calc.rebalancerData(wallet['asset'], ls_asset)
+            excluded = [x.upper() for x in self.daemon.calc.supportedStablecoin]
+            if exists('kc_info.json'):
+                excluded.extend(lib.loadJsonFile('kc_info.json').get('symbol_blacklist', []))
+            core = rebalanceCore(assets, targets, wallet['total_crypto_stable'], excluded)
+            sell, buy = core.orders(portfolio_pct['min_rebalance'])
+            return {'date': wallet['date'], 'currency': wallet['currency'], 'min_rebalance': portfolio_pct['min_rebalance'], 'sell': sell, 'buy': buy}
+        return self.flight.do(('rebalance', wallet['date']), plan)
+
+    def handle(self, path: str, query: dict) -> tuple[int, Any]:
+        """Route a GET request.
+
+        Returns:
+            tuple[int, Any]: (http status, response body)
+        """
+        param = lambda name: query.get(name, [None])[0]
+        try:
+            start, end = self.parseDate(param('start')), self.parseDate(param('end'))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        try:
+            if path == '/valuation':
+                return 200, self.getValuation(param('refresh') in ['1', 'true'])
+            if path == '/assets':
+                return 200, self.getAssets()
+            if path == '/history':
+                return 200, self.getHistory(start, end)
+            if path == '/history/asset':
+                symbols = tuple(sorted(x.upper() for x in (param('symbol') or '').split(',') if x != ''))
+                if len(symbols) == 0:
+                    return 400, {'error': 'specify symbol, e.g. ?symbol=BTC,ETH'}
+                return 200, self.getAssetHistory(symbols, start, end)
+            if path == '/rebalance':
+                return 200, self.getRebalancePlan()
+        except (Exception, SystemExit) as e: # calculateWalletValue exits when prices are missing, store errors too
+            return 503, {'error': f'valuation failed, reason: {e}'}
+        return 404, {'error': f'{path} not found'}
+
+    def start(self) -> str:
+        """Serve in background threads.
+
+        Returns:
+            str: Base url
+        """
+        api = self
+
+        class handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, data = api.handle(url.path.rstrip('/') or '/', parse_qs(url.query))
+                payload = dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args): pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        Thread(target=self.server.serve_forever, name='valuation_api', daemon=True).start()
+        return f'http://{self.host}:{self.server.server_address[1]}'
+
+    def stop(self) -> None:
+        """Stop serving and release the valuation state."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.daemon.close()
+
+    def run(self) -> None:
+        """Serve and append a valuation to the history every daemon_interval seconds, until Ctrl+C."""
+        url = self.start()
+        lib.printOk(f'Valuation API listening on {url}, Ctrl+C to stop')
+        try:
+            self.daemon.run()
+        finally:
+            self.stop()
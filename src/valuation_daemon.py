@@ -0,0 +1,120 @@
+try:
+    from src.lib_tool import lib
+    from src.calc_wallet import calculateWalletValue
+    from src.lib_http import getHttpClient
+except:
+    from lib_tool import lib
+    from calc_wallet import calculateWalletValue
+    from lib_http import getHttpClient
+from threading import Event, Lock, current_thread, main_thread
+from typing import Callable
+from copy import deepcopy
+from time import perf_counter, monotonic
+import signal
+
+#
+# Long-running valuation, instead of launching main.py --calc every hour
+# calculateWalletValue is built once: price providers, symbol indexes, the Kucoin client,
+# HTTP connection pools, price cache and history indexes stay loaded between valuations
+# every daemon_interval seconds (settings.json) or on demand the wallet is valued again
+# and the snapshot is appended to the history, see calculateWalletValue.revalue()
+#   on demand: trigger(), or SIGUSR1 where available (kill -USR1 <pid>)
+# no chart is created and the rebalancer does not run
+#
+
+DEFAULT_INTERVAL = 3600
+SIGNAL_POLL = 0.5 # seconds, how often the loop checks for SIGUSR1
+
+class valuationDaemon:
+    """Keep a calculateWalletValue warm and value the wallet on a schedule or on demand.
+
+    Attributes:
+        calc (calculateWalletValue): Warm valuation state
+        interval (float): Seconds between scheduled valuations
+        last (dict | None): Copy of the wallet of the last successful valuation
+        on_persist (Callable[[], None] | None): Called after a valuation is appended to the history
+    """
+
+    def __init__(self, type_: str = 'crypto', interval: float | None = None) -> None:
+        """Build the valuation state once.
+
+        Args:
+            type_ (str, optional): 'crypto' or 'total'. Defaults to 'crypto'.
+            interval (float | None, optional): Seconds between valuations. Defaults to daemon_interval in settings.json or DEFAULT_INTERVAL.
+        """
+        self.calc = calculateWalletValue(type_)
+        self.interval = interval if interval is not None else self.calc.settings.get('daemon_interval', DEFAULT_INTERVAL)
+        self.last: dict | None = None
+        self.last_elapsed = 0.0
+        self.lock = Lock() # one valuation at a time, calculateWalletValue is not thread safe
+        self.wake = Event()
+        self.stopped = Event()
+        self.signaled = False # set by SIGUSR1, see onSignal()
+        self.on_persist: Callable[[], None] | None = None
+
+    def revalue(self, persist: bool = True) -> dict:
+        """Value the wallet now, see calculateWalletValue.revalue().
+
+        Args:
+            persist (bool, optional): Append the snapshot to the history. Defaults to True.
+
+        Returns:
+            dict: Copy of the wallet, safe to read while the next valuation runs
+        """
+        with self.lock:
+            start = perf_counter()
+            wallet = deepcopy(self.calc.revalue(persist))
+            self.last_elapsed = perf_counter() - start
+            self.last = wallet
+        if persist and self.on_persist is not None:
+            self.on_persist()
+        lib.printOk(f'Valuation done in {self.last_elapsed:.2f}s: {wallet["total_crypto_stable"]} {wallet["currency"]} crypto, {wallet["total_value"]} {wallet["currency"]} total')
+        if self.calc.settings.get('http_stats', False):
+            getHttpClient().printStats() # counted since the daemon started
+        return wallet
+
+    def trigger(self) -> None:
+        """Run a valuation as soon as possible instead of waiting the interval."""
+        self.wake.set()
+
+    def onSignal(self, *_) -> None:
+        """SIGUSR1 handler, it runs in the main thread that may hold the lock of self.wake, so it only sets a flag."""
+        self.signaled = True
+
+    def sleep(self, seconds: float) -> None:
+        """Wait seconds, or until trigger(), stop() or SIGUSR1."""
+        end = monotonic() + seconds
+        while not self.signaled and not self.wake.is_set():
+            remaining = end - monotonic()
+            if remaining <= 0:
+                break
+            self.wake.wait(min(remaining, SIGNAL_POLL))
+        self.signaled = False
+        self.wake.clear()
+
+    def stop(self) -> None:
+        """Stop run() after the current valuation."""
+        self.stopped.set()
+        self.wake.set()
+
+    def close(self) -> None:
+        """Wait background price refreshes and release the worker threads."""
+        self.calc.price_cache.join()
+        self.calc.executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self) -> None:
+        """Value the wallet every self.interval seconds until stop() or Ctrl+C."""
+        if hasattr(signal, 'SIGUSR1') and current_thread() is main_thread():
+            signal.signal(signal.SIGUSR1, self.onSignal)
+        lib.printWarn(f'Valuation every {self.interval} seconds, Ctrl+C to stop')
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.revalue()
+                except (Exception, SystemExit) as e: # keep running, the next valuation may succeed
+                    lib.printFail(f'Valuation failed, reason: {e}')
+                self.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
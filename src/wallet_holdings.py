@@ -0,0 +1,105 @@
+from typing import Iterator
+
+#
+# Assets of calculateWalletValue, self.wallet['asset']
+# one slotted assetHolding per symbol, plus the symbols of each type (crypto, stable, fiat)
+# indexed once when the asset is added, so filtered views are iterators and never rebuild lists
+# values of many assets are updated in one pass over the prices, see walletHoldings.updateValues()
+#
+
+ASSET_TYPES = ('crypto', 'stable', 'fiat')
+
+class assetHolding:
+    """Quantity and value in wallet currency of one asset.
+
+    Attributes:
+        symbol (str): Uppercase symbol
+        qta (float): Quantity
+        value (float): Value in wallet currency, 0 until calculated
+        type (str): 'crypto', 'stable' or 'fiat'
+    """
+    __slots__ = ('symbol', 'qta', 'value', 'type')
+
+    def __init__(self, symbol: str, qta: float, value: float, type_: str) -> None:
+        self.symbol = symbol
+        self.qta = qta
+        self.value = value
+        self.type = type_
+
+    def __repr__(self) -> str:
+        return f'assetHolding({self.symbol!r}, {self.qta}, {self.value}, {self.type!r})'
+
+class walletHoldings:
+    """Assets keyed by symbol, in the order they were added, indexed by type.
+
+    Attributes:
+        items (dict[str, assetHolding]): symbol -> holding
+        by_type (dict[str, list[str]]): type -> symbols of that type
+    """
+    __slots__ = ('items', 'by_type')
+
+    def __init__(self) -> None:
+        self.items: dict[str, assetHolding] = {}
+        self.by_type: dict[str, list[str]] = {type_: [] for type_ in ASSET_TYPES}
+
+    def add(self, symbol: str, qta: float, value: float, type_: str) -> assetHolding:
+        """Add qta to symbol, a new symbol is created with value and type_.
+
+        Returns:
+            assetHolding: Holding of symbol
+        """
+        item = self.items.get(symbol)
+        if item is not None:
+            item.qta += qta
+            return item
+        item = self.items[symbol] = assetHolding(symbol, qta, value, type_)
+        self.by_type[type_].append(symbol)
+        return item
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.items
+
+    def __getitem__(self, symbol: str) -> assetHolding:
+        return self.items[symbol]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[assetHolding]:
+        return iter(self.items.values())
+
+    def iterType(self, types: list[str]) -> Iterator[assetHolding]:
+        """Holdings whose type is in types ('all' for every one), in the order they were added."""
+        if 'all' in types:
+            return iter(self.items.values())
+        if len(types) == 1:
+            return (self.items[symbol] for symbol in self.by_type.get(types[0], []))
+        return (item for item in self.items.values() if item.type in types)
+
+    def symbols(self, types: list[str]) -> Iterator[str]:
+        """Symbols whose type is in types."""
+        return (item.symbol for item in self.iterType(types))
+
+    def values(self, types: list[str]) -> Iterator[tuple[str, float]]:
+        """(symbol, value) of the holdings whose type is in types."""
+        return ((item.symbol, item.value) for item in self.iterType(types))
+
+    def totalValue(self, types: list[str]) -> float:
+        """Sum of the values of the holdings whose type is in types."""
+        return sum(item.value for item in self.iterType(types))
+
+    def updateValues(self, prices: dict[str, float]) -> float:
+        """Set value = price * qta, rounded to 2 decimals, of every symbol in prices.
+
+        Args:
+            prices (dict[str, float]): symbol -> price in wallet currency, every symbol must be held
+
+        Returns:
+            float: Sum of the new values
+        """
+        total = 0.0
+        for symbol, price in prices.items():
+            item = self.items[symbol]
+            item.value = round(item.qta * price, 2)
+            total += item.value
+        return total
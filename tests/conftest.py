@@ -0,0 +1,48 @@
+import json
+import shutil
+from os.path import dirname, join
+import pytest
+
+ROOT = dirname(dirname(__file__))
+
+SETTINGS = {
+    'currency': 'EUR', 'provider': 'cg', 'CMC_key': '', 'path': 'out', 'fetch_symb': False,
+    'retrieve_kc_balance': False, 'input_custom': False, 'input_path': '', 'convert_liquid_stake': False,
+    'aggregate_stablecoin': False, 'minimum_pie_slice': 0.02, 'kucoin_enable_autobalance': False,
+    'save_img': False, 'update_report': False,
+}
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty working directory with settings.json and config.json, like main.py.
+
+    The provider id lists are already cached, so no request is sent while building the providers.
+    Returns a function that writes settings.json with the given overrides.
+    """
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(join(ROOT, 'config.json'), tmp_path / 'config.json')
+    (tmp_path / 'cache').mkdir()
+    (tmp_path / 'cache' / 'all_id_CG.json').write_text(json.dumps([{'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin'}]))
+    (tmp_path / 'cache' / 'all_id_CMC.json').write_text(json.dumps({'data': []}))
+
+    def writeSettings(**overrides) -> dict:
+        settings = {**SETTINGS, **overrides}
+        (tmp_path / 'settings.json').write_text(json.dumps(settings))
+        return settings
+
+    writeSettings()
+    return writeSettings
+
+@pytest.fixture
+def prices(monkeypatch):
+    """CoinGecko prices answered without requests, fill the returned dict: symbol (uppercase) -> price.
+
+    Symbols missing from the dict are reported as not found, like cg_api_n.getPriceOf().
+    """
+    from src.api_coin_gecko import cg_api_n
+    res = {}
+    def getPriceOf(self, symbols):
+        found = {s.lower(): res[s.upper()] for s in symbols if s.upper() in res}
+        return found, {s for s in symbols if s.upper() not in res}, set()
+    monkeypatch.setattr(cg_api_n, 'getPriceOf', getPriceOf)
+    return res
@@ -0,0 +1,22 @@
+import pytest
+from src.api_kucoin import parseSymbols, dumpSymbols, readSymbols
+
+SYMBOLS = [{
+    'symbol': 'BTC-USDT', 'name': 'BTC-USDT', 'baseCurrency': 'BTC', 'quoteCurrency': 'USDT', 'feeCurrency': 'USDT',
+    'market': 'USDS', 'baseMinSize': '0.00001', 'quoteMinSize': '0.1', 'baseMaxSize': '10000000000', 'quoteMaxSize': '99999999',
+    'baseIncrement': '0.00000001', 'quoteIncrement': '0.000001', 'priceIncrement': '0.1', 'priceLimitRate': '0.1',
+    'minFunds': '0.1', 'isMarginEnabled': True, 'enableTrading': True,
+}]
+
+@pytest.mark.parametrize('format_', ['pickle', 'feather'])
+def test_symbols_round_trip(tmp_path, format_):
+    if format_ == 'feather':
+        pytest.importorskip('pyarrow') # optional, see KC_SYMBOL_FORMAT
+    path = str(tmp_path / f'kucoin_symbol.{format_}')
+    dumpSymbols(parseSymbols(SYMBOLS), path, format_)
+    df = readSymbols(path, format_)
+    assert df.loc[0, 'baseIncrement'] == 0.00000001
+    assert df.loc[0, 'priceIncrement'] == 0.1
+    assert df.loc[0, 'enableTrading'] == True
+    assert df.loc[0, 'minFunds'] == '0.1' # not used, left as sent
+    assert 'market' not in df.columns
@@ -0,0 +1,18 @@
+from datetime import datetime
+from src.api_yahoo_f import yahooFxCache
+
+def makeCache(tmp_path) -> yahooFxCache:
+    fx = yahooFxCache()
+    fx.cache_dir = str(tmp_path)
+    pair = ('USD', 'EUR')
+    fx.rates[pair] = {'2024-01-05': 0.9}
+    fx.sorted_dates[pair] = ['2024-01-05']
+    fx.covered[pair] = ['2024-01-01', '2024-01-05']
+    fx.failed.add(pair) # recent rates not downloadable
+    return fx
+
+def test_weekend_uses_previous_quote(tmp_path):
+    assert makeCache(tmp_path).getRate('usd', 'eur', datetime(2024, 1, 7)) == 0.9
+
+def test_old_quote_is_not_used(tmp_path):
+    assert makeCache(tmp_path).getRate('usd', 'eur', datetime(2024, 3, 1)) is False
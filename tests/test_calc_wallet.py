@@ -0,0 +1,73 @@
+import pytest
+from time import sleep, time
+from src.calc_wallet import calculateWalletValue
+from src.price_cache import priceCache
+
+def makeCmcWallet(workdir, monkeypatch, prices: dict) -> tuple[calculateWalletValue, list]:
+    """calculateWalletValue with CoinMarketCap answering prices, symbol -> price, without requests.
+
+    Returns the symbols requested at each call too, see cmc_api.getPriceOf() for the returned tuples.
+    """
+    from src.api_coin_market import cmc_api
+    calls = []
+    def getPriceOf(self, symbols):
+        calls.append(list(symbols))
+        found = {s: prices[s] for s in symbols if s in prices}
+        if set(found) != set(symbols):
+            return (found, False, set(symbols) - set(found), {})
+        return (found, True)
+    monkeypatch.setattr(cmc_api, 'isKeyValid', lambda self: True)
+    monkeypatch.setattr(cmc_api, 'getPriceOf', getPriceOf)
+    workdir(provider='cmc', CMC_key='0' * 36)
+    return calculateWalletValue('crypto'), calls
+
+def test_cmc_prices_go_through_price_cache(workdir, monkeypatch):
+    calc, calls = makeCmcWallet(workdir, monkeypatch, {'BTC': 50000.0, 'ETH': 3000.0})
+    assert calc.CMCgetPriceOf(['btc', 'eth']) == {'BTC': 50000.0, 'ETH': 3000.0}
+    # fresh prices are served from cache, CoinMarketCap is not asked again
+    assert calc.CMCgetPriceOf(['BTC', 'ETH']) == {'BTC': 50000.0, 'ETH': 3000.0}
+    assert len(calls) == 1
+    calc.price_cache.join()
+
+def test_cmc_missing_symbols_are_invalid(workdir, monkeypatch):
+    calc, _ = makeCmcWallet(workdir, monkeypatch, {'BTC': 50000.0})
+    assert calc.CMCgetPriceOf(['BTC', 'NOPE']) == {'BTC': 50000.0}
+    assert calc.invalid_sym == ['NOPE']
+    calc.price_cache.join()
+
+def test_cmc_background_refresh_keeps_invalid_symbols(workdir, monkeypatch):
+    calc, _ = makeCmcWallet(workdir, monkeypatch, {'BTC': 50000.0})
+    calc.price_cache.prices[priceCache.toKey('cmc', 'EUR', 'OLD')] = [1.0, time() - 120] # stale
+    assert calc.CMCgetPriceOf(['BTC', 'OLD']) == {'BTC': 50000.0, 'OLD': 1.0}
+    calc.price_cache.join()
+    # OLD is missing from the background refresh, its cached price is still valid
+    assert calc.invalid_sym == []
+
+def makeWallet(workdir, monkeypatch, delay: float = 0, **settings) -> calculateWalletValue:
+    """calculateWalletValue holding 1 BTC and 100 USD, CoinGecko answers after delay seconds."""
+    from src.api_coin_gecko import cg_api_n
+    def getPriceOf(self, symbols):
+        sleep(delay)
+        return {s.upper(): 50000.0 for s in symbols}, set(), set()
+    monkeypatch.setattr(cg_api_n, 'getPriceOf', getPriceOf)
+    workdir(**settings)
+    with open('input.csv', 'w') as f:
+        f.write('symbol,qta,label,liquid_stake\nBTC,1,,\nUSD,100,,\n')
+    calc = calculateWalletValue('crypto')
+    calc.checkInput(calc.loadCSV())
+    return calc
+
+def test_forex_failure_keeps_crypto_prices(workdir, monkeypatch):
+    def yahooDown(symbols):
+        raise ConnectionError('yahoo unreachable')
+    monkeypatch.setattr('src.api_yahoo_f.yahooGetPricesOf', yahooDown)
+    calc = makeWallet(workdir, monkeypatch)
+    prices, rates = calc.fetchPrices()
+    assert prices == {'BTC': 50000.0}
+    assert rates == {'USD': False}
+
+def test_crypto_timeout_raises(workdir, monkeypatch):
+    monkeypatch.setattr('src.api_yahoo_f.yahooGetPricesOf', lambda symbols: {s: 1.1 for s in symbols})
+    calc = makeWallet(workdir, monkeypatch, delay=1, price_deadline=0.2)
+    with pytest.raises(TimeoutError):
+        calc.fetchPrices()
@@ -0,0 +1,61 @@
+from json import dumps, loads
+from threading import Thread
+from src.history_store import jsonHistoryStore
+
+def record(date: str, value: float) -> str:
+    return dumps({'date': date, 'total_value': value})
+
+def readLines(path: str) -> list[str]:
+    with open(path) as f:
+        return f.read().split('\n')
+
+def fillStore(path: str) -> jsonHistoryStore:
+    store = jsonHistoryStore(path)
+    store.updateRecord('02/01/2024 10:00:00', record('02/01/2024 10:00:00', 1))
+    store.updateRecord('01/01/2024 10:00:00', record('01/01/2024 10:00:00', 2)) # past hour, appended
+    store.updateRecord('02/01/2024 10:30:00', record('02/01/2024 10:30:00', 1000.5)) # bigger, old slot blanked
+    return store
+
+def test_open_reads_through_index_without_rewriting(tmp_path):
+    path = str(tmp_path / 'walletValue.json')
+    fillStore(path)
+    before = readLines(path)
+
+    store = jsonHistoryStore(path)
+    assert [x['total_value'] for x in store.iterRecords()] == [2, 1000.5]
+    assert not store.isCompact()
+    assert readLines(path) == before
+
+def test_compact_rewrites_file_in_chronological_order(tmp_path):
+    path = str(tmp_path / 'walletValue.json')
+    assert fillStore(path).compact()
+
+    lines = readLines(path)
+    assert lines[-1] == ''
+    assert [loads(line)['total_value'] for line in lines[:-1]] == [2, 1000.5]
+    store = jsonHistoryStore(path)
+    assert store.isCompact()
+    assert [x['total_value'] for x in store.iterRecords()] == [2, 1000.5]
+
+def test_concurrent_writers_and_readers(tmp_path):
+    path = str(tmp_path / 'walletValue.json')
+    store = jsonHistoryStore(path)
+    errors = []
+
+    def write(day: int):
+        for i in range(50):
+            date = f'{day:02d}/01/2024 10:00:{i % 60:02d}'
+            store.updateRecord(date, record(date, i * 10 ** (i % 5)))
+
+    def read():
+        try:
+            for _ in range(50):
+                list(store.iterRecords())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=write, args=(day,)) for day in range(1, 5)] + [Thread(target=read) for _ in range(2)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert errors == []
+    assert [x['total_value'] for x in jsonHistoryStore(path).iterRecords()] == [49 * 10 ** 4] * 4
@@ -0,0 +1,54 @@
+import pytest
+from time import monotonic
+from requests.exceptions import ConnectionError
+from src.lib_http import httpClient
+
+class failingSession:
+    """Session whose requests never connect."""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, kwargs.get('headers')))
+        raise ConnectionError('unreachable')
+
+def makeClient(**kwargs) -> httpClient:
+    client = httpClient(**kwargs)
+    client.session = failingSession()
+    client.getBackoff = lambda attempt, res: 0.05
+    return client
+
+def test_cap_deadline_stops_retries_early():
+    client = makeClient(deadline=120)
+    start = monotonic()
+    with client.capDeadline(monotonic() + 0.3):
+        with pytest.raises(ConnectionError):
+            client.get('http://example.invalid', provider='kc')
+    assert monotonic() - start < 1
+    assert client.scope.until is None
+
+def test_post_is_not_retried_by_default():
+    client = makeClient()
+    with pytest.raises(ConnectionError):
+        client.post('http://example.invalid', provider='kc')
+    assert [method for method, _ in client.session.calls] == ['POST']
+
+def test_get_is_retried():
+    client = makeClient(deadline=0.5)
+    with pytest.raises(ConnectionError):
+        client.get('http://example.invalid', provider='kc')
+    assert len(client.session.calls) > 1
+
+def test_signed_request_is_signed_at_every_attempt():
+    client = makeClient(deadline=0.5)
+    signatures = iter(range(1000))
+    with pytest.raises(ConnectionError):
+        client.get('http://example.invalid', provider='kc', sign=lambda: {'KC-API-TIMESTAMP': str(next(signatures))})
+    timestamps = [headers['KC-API-TIMESTAMP'] for _, headers in client.session.calls]
+    assert len(timestamps) > 1
+    assert len(set(timestamps)) == len(timestamps)
+
+def test_zero_calls_per_minute_is_rejected():
+    with pytest.raises(ValueError):
+        httpClient(rate_limits={'cg': {'calls_per_minute': 0}})
@@ -0,0 +1,13 @@
+from time import time
+from src.price_cache import priceCache
+
+def test_finished_refreshes_are_pruned(tmp_path):
+    cache = priceCache(60, 600, str(tmp_path / 'price_cache.json'))
+    for _ in range(5):
+        cache.prices[cache.toKey('cg', 'EUR', 'BTC')] = [1.0, time() - 120] # stale
+        assert cache.getPrices('cg', 'EUR', ['BTC'], lambda symbols: {'BTC': 2.0}) == {'BTC': 1.0}
+        cache.refreshing[-1].join()
+    assert len(cache.refreshing) == 1
+    cache.join()
+    assert cache.refreshing == []
+    assert cache.prices[cache.toKey('cg', 'EUR', 'BTC')][0] == 2.0
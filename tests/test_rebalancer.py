@@ -0,0 +1,48 @@
+import json
+from pandas import DataFrame
+from src.lib_http import httpClient
+from src.rebalancer import kucoinAutoBalance
+
+PRICES = {'USDT': 1.0, 'BTC': 50000.0, 'XYZ': 10.0, 'ABC': 10.0}
+PAIRS = [('BTC-USDT', 'BTC', 'USDT'), ('XYZ-BTC', 'XYZ', 'BTC'), ('ABC-BTC', 'ABC', 'BTC')]
+
+class fakeKucoin:
+    """kc_api stand-in: symbols and prices are served from memory, no request is sent."""
+
+    def __init__(self) -> None:
+        self.http = httpClient()
+        self.symbol_path = 'cache/kucoin_symbol.pickle'
+
+    def getSymbols(self) -> bool:
+        open(self.symbol_path, 'w').close()
+        return True
+
+    def loadSymbols(self) -> DataFrame:
+        return DataFrame([{
+            'symbol': symbol, 'baseCurrency': base, 'quoteCurrency': quote, 'baseIncrement': 0.00000001,
+            'quoteIncrement': 0.000001, 'baseMinSize': 0.0, 'enableTrading': True, 'priceIncrement': 0.0001,
+        } for symbol, base, quote in PAIRS])
+
+    def getFiatPrice(self, assets: list[str]) -> dict[str, float]:
+        return {k: v for k, v in PRICES.items() if len(assets) == 0 or k in [x.upper() for x in assets]}
+
+def makeRebalancer(workdir) -> kucoinAutoBalance:
+    workdir()
+    with open('portfolio_pct.json', 'w') as f:
+        json.dump({'min_rebalance': 1, 'BTC': 100}, f)
+    with open('kc_info.json', 'w') as f:
+        json.dump({'key': 'k', 'secret': 's', 'passphrase': 'p', 'symbol_blacklist': [], 'tradable_counterpart_whitelist': ['USDT']}, f)
+    wallet = {'asset': {'BTC': 100.0}, 'total_crypto_stable': 100.0, 'currency': 'EUR', 'kucoin_asset': {}}
+    return kucoinAutoBalance(wallet, fakeKucoin(), 'simulation')
+
+def test_routed_buy_spends_source_buy_power_once(workdir):
+    rebalancer = makeRebalancer(workdir)
+    rebalancer.buy_power.normal['USDT'] = 150.0
+    rebalancer.buy_power.tot_buy_power = 150.0
+
+    assert rebalancer.routeBuyOrder('XYZ', 100.0)
+    assert rebalancer.buy_power.normal['USDT'] == 50.0
+    assert rebalancer.buy_power.tot_buy_power == 50.0
+    # the remaining USDT can not pay a second routed buy of the same size
+    assert not rebalancer.routeBuyOrder('ABC', 100.0)
+    assert [leg.pair for leg in rebalancer.engine.legs] == ['BTC-USDT', 'XYZ-BTC']
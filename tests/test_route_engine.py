@@ -0,0 +1,17 @@
+from src.route_engine import routeEngine
+
+PRICES = {'A': 1, 'X': 1, 'Y': 1, 'T': 1}
+# X-A has a coarse price increment, A -> Y -> X is cheaper than A -> X but takes one more trade
+PAIRS = [('X-A', 'X', 'A', 0.2), ('Y-A', 'Y', 'A', 0.0001), ('X-Y', 'X', 'Y', 0.0001), ('T-X', 'T', 'X', 0.0001)]
+
+def makeEngine(max_hops: int) -> routeEngine:
+    return routeEngine(PAIRS, PRICES, max_hops=max_hops)
+
+def test_cheaper_longer_route_does_not_hide_route_within_max_hops(workdir):
+    assert [leg.pair for leg in makeEngine(2).findRoute(['A'], 'T')] == ['X-A', 'T-X']
+    assert [leg.pair for leg in makeEngine(3).findRoute(['A'], 'T')] == ['Y-A', 'X-Y', 'T-X']
+
+def test_missing_route_is_not_cached(workdir):
+    engine = makeEngine(3)
+    assert engine.getRoute(['A'], 'Z') == []
+    assert engine.routes == {}
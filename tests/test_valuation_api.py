@@ -0,0 +1,55 @@
+import os
+import json
+import pytest
+from src.valuation_api import valuationServer, singleFlight
+
+def makeServer(workdir) -> valuationServer:
+    """valuationServer, not listening, over a walletValue.json corrupted after its index was built."""
+    workdir()
+    os.makedirs('out', exist_ok=True)
+    with open('out/walletValue.json', 'w') as f:
+        f.write('{"date": "01/01/2024 10", "total_value": 1}\n')
+    api = valuationServer('crypto', port=0)
+    with open('out/walletValue.json', 'r+') as f:
+        f.write('x') # same size, the index is still used
+    return api
+
+def test_invalid_date_is_a_bad_request(workdir):
+    status, _ = makeServer(workdir).handle('/history', {'start': ['2024-13-01']})
+    assert status == 400
+
+def test_store_error_is_unavailable(workdir):
+    status, body = makeServer(workdir).handle('/history', {'start': ['2024-01-01']})
+    assert status == 503
+    assert 'Expecting value' in body['error']
+
+def test_rebalance_counts_liquid_stake_in_base_token(workdir, prices):
+    workdir(convert_liquid_stake=True)
+    prices.update({'ETH': 2000.0, 'STETH': 2000.0, 'BTC': 50000.0})
+    with open('input.csv', 'w') as f:
+        f.write('symbol,qta,label,liquid_stake\nbtc,0.1,,\neth,1,,\nsteth,1,,yes\n')
+    with open('cache/cached_liquid_stake.json', 'w') as f:
+        f.write(json.dumps({'asset': ['steth'], 'steth': 'eth'}))
+    with open('portfolio_pct.json', 'w') as f:
+        f.write(json.dumps({'min_rebalance': 1, 'BTC': 50, 'ETH': 50}))
+    api = valuationServer('crypto', port=0)
+    try:
+        plan = api.getRebalancePlan()
+    finally:
+        api.stop()
+    # BTC 5000 against ETH 2000 + STETH 2000
+    assert plan['sell'] == {'BTC': pytest.approx(500.0, abs=0.01)}
+    assert plan['buy'] == {'ETH': pytest.approx(500.0, abs=0.01)}
+
+def test_persisted_valuation_drops_cached_results(workdir, prices):
+    prices['BTC'] = 50000.0
+    with open('input.csv', 'w') as f:
+        f.write('symbol,qta,label,liquid_stake\nBTC,1,,\n')
+    api = valuationServer('crypto', port=0)
+    try:
+        api.getValuation()
+        assert len(api.flight.results) == 1
+        api.daemon.revalue()
+        assert api.flight.results == {}
+    finally:
+        api.stop()
@@ -0,0 +1,47 @@
+import os
+import signal
+from time import monotonic
+import pytest
+from src.valuation_daemon import valuationDaemon
+
+@pytest.fixture
+def daemon(workdir):
+    """valuationDaemon built like main.py --daemon, nothing is valued."""
+    daemon = valuationDaemon('crypto', interval=60)
+    yield daemon
+    daemon.close()
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='SIGUSR1 not available')
+def test_sigusr1_ends_sleep(daemon):
+    previous = signal.signal(signal.SIGUSR1, daemon.onSignal)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        start = monotonic()
+        daemon.sleep(30)
+        assert monotonic() - start < 2
+        assert not daemon.signaled
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+def test_trigger_ends_sleep(daemon):
+    daemon.trigger()
+    start = monotonic()
+    daemon.sleep(30)
+    assert monotonic() - start < 1
+    assert not daemon.wake.is_set()
+
+def test_http_stats_after_valuation(workdir, monkeypatch):
+    from src.api_coin_gecko import cg_api_n
+    from src.lib_http import httpClient
+    monkeypatch.setattr(cg_api_n, 'getPriceOf', lambda self, symbols: ({s.upper(): 50000.0 for s in symbols}, set(), set()))
+    printed = []
+    monkeypatch.setattr(httpClient, 'printStats', lambda self: printed.append(self))
+    workdir(http_stats=True)
+    with open('input.csv', 'w') as f:
+        f.write('symbol,qta,label,liquid_stake\nBTC,1,,\n')
+    daemon = valuationDaemon('crypto', interval=60)
+    try:
+        assert daemon.revalue(persist=False)['total_crypto_stable'] == 50000.0
+    finally:
+        daemon.close()
+    assert len(printed) == 1
@@ -0,0 +1,15 @@
+from random import Random
+from src.wallet_holdings import walletHoldings
+
+def test_values_are_rounded_like_python_round():
+    rng = Random(0)
+    holdings = walletHoldings()
+    prices = {'A': 86.1245}
+    holdings.add('A', 45130, 0, 'crypto')
+    for i in range(20000):
+        symbol = f'S{i}'
+        holdings.add(symbol, round(rng.uniform(0, 1000), 4), 0, 'crypto')
+        prices[symbol] = round(rng.uniform(0, 100000), 4)
+    holdings.updateValues(prices)
+    for symbol, price in prices.items():
+        assert holdings[symbol].value == round(holdings[symbol].qta * price, 2)